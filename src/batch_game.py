@@ -0,0 +1,356 @@
+from utils import read_game_config
+from connectivity import BatchConnectivity
+import directions
+from directions import UP, RIGHT, DOWN, LEFT
+
+from typing import Iterable
+import random
+
+import numpy as np
+
+
+# Direction codes used by BatchGame.step, see directions.py
+NO_ACTION = -1
+DIRECTIONS = np.array(directions.DIRECTIONS)
+_TURNS = np.array(directions.TURNS)
+
+MAX_MOVES_WITHOUT_SCORING = 500
+
+CAUSES_OF_DEATH = (
+    'None',
+    'Hit a wall',
+    'Hit an obstacle',
+    'Hit the body',
+    'Too many moves without scoring',
+    'All possible squares occupied'
+)
+ALIVE, WALL, OBSTACLE, BODY, TOO_MANY_MOVES, ALL_OCCUPIED = range(len(CAUSES_OF_DEATH))
+
+
+class BatchGame:
+    """
+    Headless snake engine that advances n independent boards in lockstep. Each call to step() corresponds to one
+    Game.loop() call in which the controller gave a move, and a board seeded with s plays out exactly like
+    Game(..., seed=s) given the same moves.
+
+    Cells are stored as flat indices cx * n_y + cy on an n_x by n_y grid which includes the walls. The free cells of
+    each board are a swap-remove array plus a position index, updated in the same order as Game's FreeCells so that
+    food and obstacles are sampled identically.
+    """
+    def __init__(self, n: int, num_obstacles=0, start_len: int = 1, seeds: Iterable[int | None] | None = None):
+        self._width, self._height, self._square_size, _ = read_game_config()
+        self._height += 2 * self._square_size
+
+        if (
+            self._width % self._square_size != 0 or self._width < 5 * self._square_size
+            or self._height % self._square_size != 0 or self._height < 5 * self._square_size
+        ):
+            raise ValueError('Invalid values for width, height or square size. Width and height must be multiples of square size, and at least 5 times as large as the square size')
+
+        self._n = n
+        self._num_obstacles = num_obstacles
+        self._start_len = start_len
+
+        self._n_x = self._width // self._square_size
+        self._n_y = self._height // self._square_size - 2
+        self._n_cells = self._n_x * self._n_y
+        self._y_top = 2 * self._square_size
+
+        wall = np.zeros((self._n_x, self._n_y), dtype=bool)
+        wall[[0, -1], :] = True
+        wall[:, [0, -1]] = True
+        self._wall = wall.ravel()
+
+        self._start = self._cell(
+            self._width // self._square_size // 2 * self._square_size,
+            self._height // self._square_size // 2 * self._square_size
+        )
+        self._offsets = DIRECTIONS[:, 0] * self._n_y + DIRECTIONS[:, 1]
+
+        # Board state, allocated once and filled in reset()
+        self._free_cells = np.zeros((n, self._n_cells), dtype=np.int64)
+        self._free_index = np.zeros((n, self._n_cells), dtype=np.int64)  # Position in _free_cells, -1 if not free
+        self._free_count = np.zeros(n, dtype=np.int64)
+        self._obstacles = np.zeros((n, self._n_cells), dtype=bool)
+        self._body = np.zeros((n, self._n_cells), dtype=bool)
+        self._blocks = np.zeros((n, self._n_cells), dtype=np.int64)  # Ring buffer of snake cells, tail first
+        self._tail = np.zeros(n, dtype=np.int64)
+        self._length = np.zeros(n, dtype=np.int64)
+        self._head = np.zeros(n, dtype=np.int64)
+        self._dir = np.zeros(n, dtype=np.int64)
+        self._food = np.zeros(n, dtype=np.int64)
+        self._score = np.zeros(n, dtype=np.int64)
+        self._moves = np.zeros(n, dtype=np.int64)
+        self._moves_since_last_score = np.zeros(n, dtype=np.int64)
+        self._remaining_blocks = np.zeros(n, dtype=np.int64)
+        self._running = np.zeros(n, dtype=bool)
+        self._cause_of_death = np.zeros(n, dtype=np.int64)
+        self._randoms = None
+        self._connectivity = None
+
+        self.reset(seeds)
+
+    def reset(self, seeds: Iterable[int | None] | None = None):
+        if seeds is None:
+            seeds = [None] * self._n
+        seeds = list(seeds)
+        if len(seeds) != self._n:
+            raise ValueError(f'Expected {self._n} seeds, got {len(seeds)}')
+        self._randoms = [random.Random(seed) for seed in seeds]
+
+        interior = np.flatnonzero(~self._wall)
+        self._free_cells[:, :len(interior)] = interior
+        self._free_index[:] = -1
+        self._free_index[:, interior] = np.arange(len(interior))
+        self._free_count[:] = len(interior)
+        self._obstacles[:] = False
+        self._body[:] = False
+
+        everyone = np.arange(self._n)
+        reserved = (self._start, self._start + self._offsets[UP])
+        for cell in reserved:
+            self._discard_free(everyone, np.full(self._n, cell))
+        for _ in range(self._num_obstacles):
+            coords = np.array([self._sample_free(b) for b in range(self._n)])
+            self._obstacles[everyone, coords] = True
+            self._discard_free(everyone, coords)
+        for cell in reserved:
+            self._add_free(everyone, np.full(self._n, cell))
+
+        self._body[:, self._start] = True
+        self._blocks[:, 0] = self._start
+        self._tail[:] = 0
+        self._length[:] = 1
+        self._head[:] = self._start
+        self._dir[:] = NO_ACTION
+        self._score[:] = 0
+        self._moves[:] = 0
+        self._moves_since_last_score[:] = 0
+        self._remaining_blocks[:] = self._start_len - 1
+        self._running[:] = True
+        self._cause_of_death[:] = ALIVE
+        self._connectivity = None
+
+        for b in range(self._n):
+            self._food[b] = self._generate_food(b)
+
+    def step(self, actions) -> np.ndarray:
+        """
+        Advances every running board by one move. actions holds one direction code per board, NO_ACTION keeps the
+        current direction. Returns the boolean mask of boards that are still running.
+        """
+        actions = np.broadcast_to(np.asarray(actions, dtype=np.int64), (self._n,))
+
+        alive = self._running.copy()
+        cut = alive & (self._moves_since_last_score > MAX_MOVES_WITHOUT_SCORING)
+        if cut.any():
+            self._running[cut] = False
+            self._cause_of_death[cut] = TOO_MANY_MOVES
+            self._moves_since_last_score[cut] = 0
+            alive &= ~cut
+
+        new_dir = np.where(actions == NO_ACTION, self._dir, actions)
+        moving = alive & (new_dir != NO_ACTION)
+
+        invalid = moving & ((new_dir < 0) | (new_dir > 3) | ((self._dir != NO_ACTION) & (new_dir == (self._dir + 2) % 4)))
+        if invalid.any():
+            b = np.flatnonzero(invalid)[0]
+            raise ValueError(f'Controller gave invalid move {new_dir[b]} on board {b}, even though the direction of movement was {self._dir[b]}')
+
+        changed = moving & (new_dir != self._dir)
+        self._moves += changed
+        self._moves_since_last_score += changed
+        self._dir[moving] = new_dir[moving]
+
+        boards = np.flatnonzero(moving)
+        head = self._head[boards] + self._offsets[self._dir[boards]]
+        self._head[boards] = head
+        self._discard_free(boards, head)
+        if self._connectivity is not None:
+            self._connectivity.discard(boards, head)
+
+        ate = head == self._food[boards]
+        if ate.any():
+            filled = np.zeros(len(boards), dtype=bool)
+            for i in np.flatnonzero(ate):
+                b = boards[i]
+                self._food[b] = self._generate_food(b)
+                if self._food[b] == -1:
+                    filled[i] = True
+                    self._running[b] = False
+                    self._cause_of_death[b] = ALL_OCCUPIED
+            scored = boards[ate & ~filled]
+            self._score[scored] += 1
+            self._moves_since_last_score[scored] = 0
+            boards, head, ate = boards[~filled], head[~filled], ate[~filled]
+
+        growing = ~ate & (self._remaining_blocks[boards] >= 1)
+        self._remaining_blocks[boards[growing]] -= 1
+
+        shrinking = boards[~ate & ~growing]
+        tail = self._blocks[shrinking, self._tail[shrinking]]
+        # Like GameCore, a head following the tail keeps the cell the tail leaves occupied
+        vacated = tail != head[~ate & ~growing]
+        self._add_free(shrinking[vacated], tail[vacated])
+        if self._connectivity is not None:
+            self._connectivity.add(shrinking[vacated], tail[vacated])
+        self._body[shrinking, tail] = False
+        self._tail[shrinking] = (self._tail[shrinking] + 1) % self._n_cells
+        self._length[shrinking] -= 1
+
+        cause = np.select(
+            [self._wall[head], self._obstacles[boards, head], self._body[boards, head]],
+            [WALL, OBSTACLE, BODY],
+            ALIVE
+        )
+        dead = cause != ALIVE
+        self._running[boards[dead]] = False
+        self._cause_of_death[boards[dead]] = cause[dead]
+
+        boards, head = boards[~dead], head[~dead]
+        self._blocks[boards, (self._tail[boards] + self._length[boards]) % self._n_cells] = head
+        self._length[boards] += 1
+        self._body[boards, head] = True
+
+        return self._running
+
+    def relative_directions(self, actions) -> np.ndarray:
+        """
+        Direction codes for step() that take one relative action per board, STRAIGHT, RIGHT_TURN or LEFT_TURN. Boards
+        that have not moved yet set off upwards, like GameCore.relative_move.
+        """
+        turned = (self._dir + _TURNS[np.asarray(actions)]) % len(DIRECTIONS)
+        return np.where(self._dir == NO_ACTION, UP, turned)
+
+    def run(self, policy, max_steps: int | None = None) -> np.ndarray:
+        """
+        Steps all boards with actions = policy(self) until every board has finished, or for at most max_steps
+        steps. Returns the final scores.
+        """
+        steps = 0
+        while self._running.any() and (max_steps is None or steps < max_steps):
+            self.step(policy(self))
+            steps += 1
+        return self._score
+
+    def is_free(self, cells) -> np.ndarray:
+        """Whether each cell is free, for cells of shape (n, k) holding k flat cell indices per board."""
+        return np.take_along_axis(self._free_index, cells, axis=1) >= 0
+
+    def _generate_food(self, b: int) -> int:
+        if self._free_count[b]:
+            return self._sample_free(b)
+        return -1
+
+    def _sample_free(self, b: int) -> int:
+        return int(self._randoms[b].choice(self._free_cells[b, :self._free_count[b]]))
+
+    def _discard_free(self, boards: np.ndarray, cells: np.ndarray):
+        # At most one cell per board, so the fancy-indexed writes below never collide
+        pos = self._free_index[boards, cells]
+        present = pos >= 0
+        boards, cells, pos = boards[present], cells[present], pos[present]
+
+        last = self._free_cells[boards, self._free_count[boards] - 1]
+        self._free_cells[boards, pos] = last
+        self._free_index[boards, last] = pos
+        self._free_index[boards, cells] = -1
+        self._free_count[boards] -= 1
+
+    def _add_free(self, boards: np.ndarray, cells: np.ndarray):
+        absent = self._free_index[boards, cells] < 0
+        boards, cells = boards[absent], cells[absent]
+
+        pos = self._free_count[boards]
+        self._free_cells[boards, pos] = cells
+        self._free_index[boards, cells] = pos
+        self._free_count[boards] += 1
+
+    def _cell(self, x, y):
+        return x // self._square_size * self._n_y + (y - self._y_top) // self._square_size
+
+    def _to_coords(self, cells):
+        return cells // self._n_y * self._square_size, cells % self._n_y * self._square_size + self._y_top
+
+    @property
+    def n(self):
+        return self._n
+
+    @property
+    def shape(self):
+        return self._n_x, self._n_y
+
+    @property
+    def square_size(self):
+        return self._square_size
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def head(self):
+        return self._head
+
+    @property
+    def direction(self):
+        return self._dir
+
+    @property
+    def food_cell(self):
+        return self._food
+
+    @property
+    def x(self):
+        return self._to_coords(self._head)[0]
+
+    @property
+    def y(self):
+        return self._to_coords(self._head)[1]
+
+    @property
+    def food(self):
+        return np.stack(self._to_coords(self._food), axis=1)
+
+    @property
+    def wall(self):
+        return self._wall.reshape(self._n_x, self._n_y)
+
+    @property
+    def obstacles(self):
+        return self._obstacles.reshape(self._n, self._n_x, self._n_y)
+
+    @property
+    def body(self):
+        return self._body.reshape(self._n, self._n_x, self._n_y)
+
+    @property
+    def connectivity(self) -> BatchConnectivity:
+        # Created on first use, like GameCore.connectivity
+        if self._connectivity is None:
+            self._connectivity = BatchConnectivity(self.empty_squares)
+        return self._connectivity
+
+    @property
+    def free_count(self):
+        return self._free_count
+
+    @property
+    def empty_squares(self):
+        return (self._free_index >= 0).reshape(self._n, self._n_x, self._n_y)
+
+    @property
+    def score(self):
+        return self._score
+
+    @property
+    def moves(self):
+        return self._moves
+
+    @property
+    def moves_since_last_score(self):
+        return self._moves_since_last_score
+
+    @property
+    def cause_of_death(self):
+        return [CAUSES_OF_DEATH[c] for c in self._cause_of_death]
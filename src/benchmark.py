@@ -0,0 +1,226 @@
+from game_core import GameCore
+from batch_game import BatchGame
+from game_controllers.basic_bot_controller import BasicBotController
+from game_controllers.nn_controller import NNController
+from nn_archive import load_neat_config, load_genome
+from sensors import genome_sensors
+from utils import set_game_config_overrides, read_game_config
+import train_ai
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os.path
+import platform
+import re
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+
+ROOT = os.path.join(os.path.dirname(__file__), os.path.pardir)
+
+
+def _timed(fn, min_time):
+    # Calls fn() until at least min_time seconds have passed, fn returns how many operations it performed
+    count = 0
+    start = time.perf_counter()
+    while True:
+        count += fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+
+def bench_game_loop(controller_factory, num_obstacles=0, min_time=1.0, seed=0):
+    game = None
+    seeds = itertools.count(seed)
+
+    def play():
+        nonlocal game
+        if game is None or not game.running:
+            game = GameCore(controller_factory(), num_obstacles=num_obstacles, fps=np.inf, seed=next(seeds))
+        steps = 0
+        while steps < 1000 and game.running:
+            game.loop()
+            steps += 1
+        return steps
+
+    return _timed(play, min_time)
+
+
+def bench_controller(controller, prepare=None, min_time=1.0, seed=0):
+    # Plays a few moves first so that the controller sees a game in progress, then calls it on that fixed state
+    game = GameCore(BasicBotController(), fps=np.inf, seed=seed)
+    for _ in range(20):
+        game.loop()
+
+    def respond():
+        for _ in range(1000):
+            if prepare is not None:
+                prepare(game)
+            controller.get_response(game)
+        return 1000
+
+    return _timed(respond, min_time)
+
+
+def bench_batch_game(n, num_obstacles=0, min_time=1.0, seed=0):
+    batch = BatchGame(n, num_obstacles=num_obstacles, seeds=range(seed, seed + n))
+    rng = np.random.default_rng(seed)
+
+    def policy(batch):
+        # Random turns that never reverse, so every board keeps moving until it dies
+        return batch.relative_directions(rng.integers(0, 3, size=batch.n))
+
+    def steps():
+        if not batch.running.any():
+            batch.reset(seeds=range(seed, seed + n))
+        running = int(batch.running.sum())
+        batch.step(policy(batch))
+        return running
+
+    return _timed(steps, min_time)
+
+
+def bench_training(width, height, num_obstacles, num_workers, generations=2, pop_size=None, episodes=1, seed=0):
+    with tempfile.TemporaryDirectory() as config_dir:
+        with open(os.path.join(ROOT, 'neat_config.txt')) as file:
+            neat_config = file.read()
+        if pop_size is not None:
+            neat_config = re.sub(r'^pop_size\s*=.*$', f'pop_size = {pop_size}', neat_config, flags=re.MULTILINE)
+        with open(os.path.join(config_dir, 'neat_config.txt'), 'w') as file:
+            file.write(neat_config)
+        os.makedirs(os.path.join(config_dir, 'checkpoints'))
+        pop_size = load_neat_config(os.path.join(config_dir, 'neat_config.txt')).pop_size
+
+        _, _, square_size, _ = read_game_config()
+        set_game_config_overrides(width=width * square_size, height=height * square_size)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                train_ai.run(
+                    config_dir,
+                    n=generations,
+                    checkpoint_freq=None,
+                    continue_from_checkpoint=False,
+                    multiprocess=num_workers > 0,
+                    num_obstacles=num_obstacles,
+                    draw=False,
+                    episodes=episodes,
+                    seed=seed,
+                    num_workers=num_workers or None,
+                    output_path=os.path.join(config_dir, 'best_nn.pkl'),
+                    use_curriculum=False
+                )
+            elapsed = time.perf_counter() - start
+        finally:
+            set_game_config_overrides()
+
+    return {
+        'generations_per_second': generations / elapsed,
+        'genomes_per_second': generations * pop_size / elapsed,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(min_time=1.0, board_sizes=((40, 30),), obstacle_counts=(0, 100), worker_counts=(0,), generations=2, pop_size=None, batch_sizes=(500,)):
+    # Played with the sensors it was trained on, like main.get_nn_controller does
+    genome = load_genome(os.path.join(ROOT, 'best_nn.pkl'))
+    sensors = genome_sensors(genome)
+    config = load_neat_config(sensors=sensors)
+
+    results = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'steps_per_second': {},
+        'training': [],
+    }
+    steps = results['steps_per_second']
+
+    for num_obstacles in obstacle_counts:
+        steps[f'game_loop_basic_bot_obstacles_{num_obstacles}'] = bench_game_loop(
+            BasicBotController, num_obstacles=num_obstacles, min_time=min_time
+        )
+        steps[f'game_loop_nn_obstacles_{num_obstacles}'] = bench_game_loop(
+            lambda: NNController(genome, config, training=True, sensors=sensors), num_obstacles=num_obstacles, min_time=min_time
+        )
+        for n in batch_sizes:
+            steps[f'batch_game_{n}_obstacles_{num_obstacles}'] = bench_batch_game(
+                n, num_obstacles=num_obstacles, min_time=min_time
+            )
+
+    steps['nn_controller'] = bench_controller(
+        NNController(genome, config, training=True, sensors=sensors), min_time=min_time
+    )
+    steps['basic_bot_controller'] = bench_controller(BasicBotController(), min_time=min_time)
+    # The only benchmark that needs pygame, for the key codes the player controller reads
+    from game_controllers.player_controller import PlayerController, _KEY_DIRECTIONS
+    keys = itertools.cycle(_KEY_DIRECTIONS)
+    steps['player_controller'] = bench_controller(
+        PlayerController(), prepare=lambda game: game.buffer.append(next(keys)), min_time=min_time
+    )
+
+    for (width, height), num_obstacles, num_workers in itertools.product(board_sizes, obstacle_counts, worker_counts):
+        result = bench_training(width, height, num_obstacles, num_workers, generations=generations, pop_size=pop_size)
+        results['training'].append({
+            'width': width,
+            'height': height,
+            'num_obstacles': num_obstacles,
+            'num_workers': num_workers,
+            'generations': generations,
+            **result
+        })
+
+    return results
+
+
+def _pairs(value):
+    width, height = value.split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure game, controller and training throughput')
+    parser.add_argument('--output', default='bench_output.json', help='JSON file to write the results to')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Seconds to run each step benchmark for')
+    parser.add_argument('--board-sizes', type=_pairs, nargs='+', default=[(40, 30)], help='Board sizes in squares, e.g. 40x30')
+    parser.add_argument('--obstacles', type=int, nargs='+', default=[0, 100])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0], help='0 evaluates genomes in the main process')
+    parser.add_argument('--generations', type=int, default=2)
+    parser.add_argument('--pop-size', type=int, default=None, help='Override pop_size from neat_config.txt')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[500])
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        min_time=args.min_time,
+        board_sizes=args.board_sizes,
+        obstacle_counts=args.obstacles,
+        worker_counts=args.workers,
+        generations=args.generations,
+        pop_size=args.pop_size,
+        batch_sizes=args.batch_sizes
+    )
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+import copy
+import gzip
+import hashlib
+import itertools
+import os
+import os.path
+import pickle
+import queue
+import random
+import threading
+import time
+
+import neat
+from neat.reporting import BaseReporter
+
+
+FORMAT = 'content-addressed-1'
+
+
+class AsyncCheckpointer(BaseReporter):
+    """Drop-in replacement for neat.Checkpointer that stores each genome once and writes in a background thread."""
+    def __init__(self, generation_interval=100, time_interval_seconds=300, filename_prefix='neat-checkpoint-'):
+        self.generation_interval = generation_interval
+        self.time_interval_seconds = time_interval_seconds
+        self.filename_prefix = filename_prefix
+        self.genome_dir = os.path.join(os.path.dirname(filename_prefix), 'genomes')
+
+        self.current_generation = None
+        self.last_generation_checkpoint = -1
+        self.last_time_checkpoint = time.time()
+
+        # Hashes of the genomes pickled at the last checkpoint, keyed by id() with the genome kept alive alongside,
+        # since genomes are never modified once they are in a population
+        self._digests = {}
+        self._queue = queue.Queue()
+        self._error = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def start_generation(self, generation):
+        self.current_generation = generation
+
+    def end_generation(self, config, population, species_set):
+        checkpoint_due = False
+
+        if self.time_interval_seconds is not None:
+            dt = time.time() - self.last_time_checkpoint
+            if dt >= self.time_interval_seconds:
+                checkpoint_due = True
+
+        if not checkpoint_due and self.generation_interval is not None:
+            dg = self.current_generation - self.last_generation_checkpoint
+            if dg >= self.generation_interval:
+                checkpoint_due = True
+
+        if checkpoint_due:
+            self.save_checkpoint(config, population, species_set, self.current_generation)
+            self.last_generation_checkpoint = self.current_generation
+            self.last_time_checkpoint = time.time()
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        self._raise_error()
+        # Named like neat's checkpoints, so that get_checkpoint_name still finds the latest one
+        filename = f'{self.filename_prefix}{generation}'
+        print(f'Saving checkpoint to {filename}')
+
+        # Genomes are stored under the hash of their contents in the genomes directory, and only those not stored yet are
+        # written, so elites and other survivors cost nothing after their first checkpoint. Only pickling and hashing
+        # happen here, compression and writing are left to the writer thread.
+        digests = {}
+        blobs = []
+        representatives = [s.representative for s in species_set.species.values() if s.representative is not None]
+        for genome in itertools.chain(population.values(), representatives):
+            if id(genome) in digests:
+                continue
+            cached = self._digests.get(id(genome))
+            if cached is not None:
+                digests[id(genome)] = cached
+                continue
+
+            # Fitness changes every time a surviving genome is re-evaluated, so it is kept in the manifest instead
+            fitness, genome.fitness = genome.fitness, None
+            try:
+                data = pickle.dumps(genome, protocol=pickle.HIGHEST_PROTOCOL)
+            finally:
+                genome.fitness = fitness
+            digest = hashlib.sha256(data).hexdigest()
+            digests[id(genome)] = (genome, digest)
+            blobs.append((digest, data))
+        self._digests = digests
+
+        def digest_of(genome):
+            return digests[id(genome)][1]
+
+        stored_species_set = copy.copy(species_set)
+        stored_species_set.reporters = None
+        stored_species_set.species = {}
+        for key, s in species_set.species.items():
+            stored = copy.copy(s)
+            stored.members = {genome_key: digest_of(genome) for genome_key, genome in s.members.items()}
+            stored.representative = digest_of(s.representative) if s.representative is not None else None
+            stored_species_set.species[key] = stored
+
+        # The manifest holds everything else, with every genome replaced by its hash
+        manifest = {
+            'format': FORMAT,
+            'generation': generation,
+            'config': config,
+            'population': {key: digest_of(genome) for key, genome in population.items()},
+            'fitness': {key: genome.fitness for key, genome in population.items()},
+            'species_set': stored_species_set,
+            'random_state': random.getstate(),
+        }
+        self._queue.put((filename, blobs, pickle.dumps(manifest, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def flush(self):
+        # Waits for pending writes, like close()
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def restore_checkpoint(filename):
+        return restore_checkpoint(filename)
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    self._write(*item)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, filename, blobs, manifest):
+        # The manifest goes last, so a crash never leaves a checkpoint that points at missing genomes
+        os.makedirs(self.genome_dir, exist_ok=True)
+        for digest, data in blobs:
+            path = os.path.join(self.genome_dir, digest)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+        _write_atomic(filename, manifest)
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('Writing a checkpoint failed') from error
+
+
+def _write_atomic(path, data):
+    # The temporary name starts with a dot, so get_checkpoint_name never sees a half written checkpoint
+    directory, name = os.path.split(path)
+    temporary_path = os.path.join(directory, f'.{name}.tmp')
+    with gzip.open(temporary_path, 'wb', compresslevel=5) as file:
+        file.write(data)
+    os.replace(temporary_path, path)
+
+
+def read_checkpoint(filename):
+    """
+    Loads a checkpoint written by AsyncCheckpointer or by neat.Checkpointer without restoring it, returning
+    (generation, config, population, species_set, random_state).
+    """
+    with gzip.open(filename) as file:
+        data = pickle.load(file)
+
+    if isinstance(data, tuple):
+        return data
+
+    if data.get('format') != FORMAT:
+        raise ValueError(f"Unknown checkpoint format {data.get('format')} in {filename}")
+    genome_dir = os.path.join(os.path.dirname(filename), 'genomes')
+    genomes = {}
+
+    def load(digest):
+        if digest not in genomes:
+            with gzip.open(os.path.join(genome_dir, digest)) as file:
+                genomes[digest] = pickle.load(file)
+        return genomes[digest]
+
+    population = {}
+    for key, digest in data['population'].items():
+        genome = population[key] = load(digest)
+        genome.fitness = data['fitness'][key]
+    species_set = data['species_set']
+    for s in species_set.species.values():
+        s.members = {key: population[key] if key in population else load(digest) for key, digest in s.members.items()}
+        s.representative = load(s.representative) if s.representative is not None else None
+
+    return data['generation'], data['config'], population, species_set, data['random_state']
+
+
+def restore_checkpoint(filename) -> neat.Population:
+    """Restores a checkpoint written by AsyncCheckpointer or by neat.Checkpointer."""
+    generation, config, population, species_set, random_state = read_checkpoint(filename)
+
+    random.setstate(random_state)
+    restored = neat.Population(config, (population, species_set, generation))
+    # Report through the new population's reporters, and keep handing out fresh genome keys after the restored ones
+    restored.species.reporters = restored.reporters
+    restored.reproduction.genome_indexer = itertools.count(max(population, default=0) + 1)
+    return restored
@@ -0,0 +1,411 @@
+from checkpointer import read_checkpoint
+from evaluation import AGGREGATIONS, generation_seeds, episode_fitness, aggregate_fitness
+from sensors import SENSORS, config_sensors, genome_sensors
+from directions import STRAIGHT, RIGHT_TURN, LEFT_TURN
+from utils import get_checkpoint_name, read_game_config, set_game_config_overrides
+import train_ai
+
+from collections import Counter
+import argparse
+import json
+import os
+import os.path
+import re
+import sys
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+RUN_SETTINGS_NAME = 'run.json'
+
+# Settings of train and resume. Resume starts from those saved by the run it continues, so its options only
+# override what they name.
+TRAINING_DEFAULTS = {
+    'config_dir': ROOT,
+    'checkpoint_dir': os.path.join(ROOT, 'checkpoints'),
+    'output': os.path.join(ROOT, 'best_nn.pkl'),
+    'generations': 250,
+    'max_time': None,
+    'workers': None,
+    'chunk_size': None,
+    'episodes': 1,
+    'seed': None,
+    'reseed_interval': 1,
+    'aggregation': 'mean',
+    'quantile': 0.5,
+    'elite_quantile': None,
+    'obstacles': 100,
+    'start_len': 1,
+    'curriculum': False,
+    'sensors': None,
+    'checkpoint_freq': 10,
+    'checkpoint_time': 300,
+    'fitness_cache_size': 10000,
+    'fitness_cache_path': None,
+    'draw': False,
+    'spectate': None,
+    'spectate_fps': 30,
+    'profile': False,
+    'profile_path': None,
+    'episode_store': None,
+    'islands': 1,
+    'migration_interval': 10,
+    'migrants': 2,
+}
+
+_DURATION = re.compile(r'^(\d+(?:\.\d*)?)([smhd]?)$')
+_DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def duration(text) -> float:
+    """Seconds in a duration like 90, 90s, 30m, 12h or 2d."""
+    match = _DURATION.match(text.strip())
+    if match is None:
+        raise argparse.ArgumentTypeError(f'Invalid duration {text}, should be like 90s, 30m, 12h or 2d')
+    return float(match[1]) * _DURATION_UNITS[match[2]]
+
+
+def _board(text):
+    width, height = text.split('x')
+    return int(width), int(height)
+
+
+def _add_training_arguments(parser):
+    paths = parser.add_argument_group('paths')
+    paths.add_argument('--config-dir', help='Directory holding neat_config.txt')
+    paths.add_argument('--checkpoint-dir', help='Where checkpoints and the run settings go, one run per directory')
+    paths.add_argument('--output', help='Where the winning genome is written')
+
+    stopping = parser.add_argument_group('stopping, whichever comes first, or Ctrl+C to stop after a generation')
+    stopping.add_argument('--generations', type=int, help='Generation number to train up to, counted over resumes')
+    stopping.add_argument('--max-time', type=duration, help='Wall time for this session, like 90m or 12h')
+    stopping.add_argument('--forever', action='store_true', help='No generation limit')
+
+    evaluation = parser.add_argument_group('evaluation')
+    evaluation.add_argument('--workers', type=int, help='Evaluation processes, 0 evaluates in this process (default: cores - 1)')
+    evaluation.add_argument('--chunk-size', type=int, help='Genomes per job sent to a worker (default: 4 jobs per worker)')
+    evaluation.add_argument('--episodes', type=int, help='Episodes played by every genome each generation')
+    evaluation.add_argument('--seed', type=int, help='Base seed of the episodes, random episodes if not given')
+    evaluation.add_argument('--reseed-interval', type=int, help='Generations between drawing new episode seeds')
+    evaluation.add_argument('--aggregation', choices=AGGREGATIONS, help='How episode fitnesses combine')
+    evaluation.add_argument('--quantile', type=float, help='Quantile used by --aggregation quantile')
+    evaluation.add_argument('--elite-quantile', type=float, help=(
+        'Abandon genomes that cannot reach this quantile of the previous generation. Needs --aggregation min or '
+        'quantile, since a mean can always be rescued by the episodes still to play'
+    ))
+    evaluation.add_argument('--obstacles', type=int, help='Obstacles, when not following a curriculum')
+    evaluation.add_argument('--start-len', type=int, help='Snake start length, when not following a curriculum')
+    evaluation.add_argument('--curriculum', action=argparse.BooleanOptionalAction, help='Follow the [Curriculum] stages of the config instead of --obstacles and --start-len')
+    evaluation.add_argument('--sensors', nargs='+', choices=tuple(SENSORS), help='Network inputs (default: from the config)')
+    evaluation.add_argument('--fitness-cache-size', type=int, help=(
+        'Fitnesses kept in memory, 0 disables the cache. Only used with --seed, and carried over elites only hit '
+        'with --reseed-interval above 1, since new seeds make every genome play new episodes'
+    ))
+    evaluation.add_argument('--fitness-cache-path', help='SQLite file that keeps cached fitnesses between runs')
+
+    checkpoints = parser.add_argument_group('checkpoints')
+    checkpoints.add_argument('--checkpoint-freq', type=int, help='Generations between checkpoints')
+    checkpoints.add_argument('--checkpoint-time', type=duration, help='Time between checkpoints, like 300 or 10m')
+
+    islands = parser.add_argument_group('islands')
+    islands.add_argument('--islands', type=int, help='Populations trained side by side, exchanging migrants')
+    islands.add_argument('--migration-interval', type=int, help='Generations between migrations')
+    islands.add_argument('--migrants', type=int, help='Genomes each island sends per migration')
+
+    watching = parser.add_argument_group('watching')
+    watching.add_argument('--draw', action=argparse.BooleanOptionalAction, help='Draw every evaluated game, slow')
+    watching.add_argument('--spectate', choices=('best', 'species'), help='Replay the best genomes in a window')
+    watching.add_argument('--spectate-fps', type=int)
+    watching.add_argument('--profile', action=argparse.BooleanOptionalAction, help='Print where each generation spends its time')
+    watching.add_argument('--profile-path', help='Also append the profile as JSON lines to this file')
+    watching.add_argument('--episode-store', help='Directory to store every episode result in')
+
+
+def _given(args) -> dict:
+    given = {key: value for key, value in vars(args).items() if key in TRAINING_DEFAULTS}
+    if getattr(args, 'forever', False):
+        given['generations'] = None
+    return given
+
+
+def _latest_checkpoint_generation(settings):
+    # The highest generation over all islands, or None if the run has no checkpoints yet
+    checkpoint_dir = settings['checkpoint_dir']
+    if settings['islands'] > 1:
+        directories = [os.path.join(checkpoint_dir, f'island-{island}') for island in range(settings['islands'])]
+    else:
+        directories = [checkpoint_dir]
+    generations = [
+        int(name[len('neat-checkpoint-'):])
+        for name in (get_checkpoint_name(directory) for directory in directories if os.path.isdir(directory))
+        if name is not None
+    ]
+    return max(generations, default=None)
+
+
+def _load_settings(checkpoint_dir) -> dict | None:
+    path = os.path.join(checkpoint_dir, RUN_SETTINGS_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def _save_settings(settings):
+    os.makedirs(settings['checkpoint_dir'], exist_ok=True)
+    with open(os.path.join(settings['checkpoint_dir'], RUN_SETTINGS_NAME), 'w') as file:
+        json.dump(settings, file, indent=2)
+
+
+def _check_settings(parser, settings):
+    if settings['elite_quantile'] is not None and settings['aggregation'] == 'mean':
+        parser.error('--elite-quantile needs --aggregation min or quantile, a mean never abandons genomes early')
+
+
+def _train(settings, resume):
+    # Saved with absolute paths, so that the run can be resumed from anywhere
+    for key in ('config_dir', 'checkpoint_dir', 'output', 'fitness_cache_path', 'profile_path', 'episode_store'):
+        if settings[key] is not None:
+            settings[key] = os.path.abspath(settings[key])
+    _save_settings(settings)
+    training = train_ai.TrainingSettings(
+        checkpoint_dir=settings['checkpoint_dir'],
+        continue_from_checkpoint=resume,
+        output_path=settings['output'],
+        until_generation=settings['generations'],
+        max_time=settings['max_time'],
+        checkpoint_freq=settings['checkpoint_freq'],
+        checkpoint_time=settings['checkpoint_time'],
+        multiprocess=settings['workers'] != 0,
+        num_workers=settings['workers'] or None,
+        chunk_size=settings['chunk_size'],
+        episodes=settings['episodes'],
+        seed=settings['seed'],
+        reseed_interval=settings['reseed_interval'],
+        aggregation=settings['aggregation'],
+        quantile=settings['quantile'],
+        elite_quantile=settings['elite_quantile'],
+        num_obstacles=settings['obstacles'],
+        start_len=settings['start_len'],
+        use_curriculum=settings['curriculum'],
+        sensors=tuple(settings['sensors']) if settings['sensors'] is not None else None,
+        fitness_cache_size=settings['fitness_cache_size'],
+        fitness_cache_path=settings['fitness_cache_path'],
+        profile=settings['profile'],
+        profile_path=settings['profile_path'],
+        episode_store_path=settings['episode_store'],
+        draw=settings['draw'],
+        spectate=settings['spectate'],
+        spectate_fps=settings['spectate_fps'],
+    )
+
+    if settings['islands'] > 1:
+        # Imported here, since islands imports this module's dependencies and nothing else needs it
+        from islands import run_islands
+        run_islands(
+            settings['config_dir'],
+            None,
+            num_islands=settings['islands'],
+            migration_interval=settings['migration_interval'],
+            num_migrants=settings['migrants'],
+            checkpoint_root=settings['checkpoint_dir'],
+            leaderboard_path=os.path.join(settings['checkpoint_dir'], 'leaderboard.json'),
+            settings=training
+        )
+        return
+
+    train_ai.run(settings['config_dir'], None, training)
+
+
+def train(parser, args):
+    given = _given(args)
+    settings = {**TRAINING_DEFAULTS, **{key: value for key, value in given.items() if value is not None}}
+    if args.forever:
+        settings['generations'] = None
+    if _latest_checkpoint_generation(settings) is not None and not args.resume:
+        parser.error(
+            f"{settings['checkpoint_dir']} already holds checkpoints. Use resume or train --continue to carry on "
+            f"training, or --checkpoint-dir for a new run."
+        )
+    _check_settings(parser, settings)
+    _train(settings, resume=args.resume)
+
+
+def resume(parser, args):
+    given = _given(args)
+    checkpoint_dir = given.get('checkpoint_dir', TRAINING_DEFAULTS['checkpoint_dir'])
+    saved = _load_settings(checkpoint_dir) or {}
+    settings = {**TRAINING_DEFAULTS, **saved, **given}
+    if _latest_checkpoint_generation(settings) is None:
+        parser.error(f'No checkpoints to resume from in {checkpoint_dir}')
+    _check_settings(parser, settings)
+    _train(settings, resume=True)
+
+
+def play(parser, args):
+    # Imported here so that training never loads pygame
+    from main import run_game, replay_game, get_nn_controller
+    from recording import EpisodeRecorder
+    from game_controllers.player_controller import PlayerController
+    from game_controllers.basic_bot_controller import BasicBotController
+
+    if args.replay is not None:
+        replay_game(args.replay, fps=args.fps)
+        return
+    if args.player:
+        controller = PlayerController()
+    elif args.bot:
+        controller = BasicBotController()
+    else:
+        controller = get_nn_controller(print_steps=args.print_steps, path=os.path.abspath(args.genome))
+    recorder = EpisodeRecorder() if args.record is not None else None
+    run_game(controller, num_obstacles=args.obstacles, start_len=args.start_len, fps=args.fps, seed=args.seed, recorder=recorder)
+    if recorder is not None:
+        recorder.recording().save(args.record)
+        print(f'Recorded the last game to {args.record}')
+
+
+def evaluate(parser, args):
+    from nn_archive import load_genome, load_neat_config, load_network
+    from game_controllers.nn_controller import NNController
+    from recording import EpisodeRecorder
+
+    config_path = os.path.join(args.config_dir, 'neat_config.txt')
+    if args.board is not None:
+        square_size = read_game_config()[2]
+        set_game_config_overrides(width=args.board[0] * square_size, height=args.board[1] * square_size)
+    seeds = generation_seeds(0, args.episodes, args.seed)
+    if args.record is not None:
+        os.makedirs(args.record, exist_ok=True)
+
+    for path in args.genomes:
+        genome = load_genome(path)
+        sensors = genome_sensors(genome)
+        controller = NNController(
+            genome, load_neat_config(config_path, sensors), training=True, sensors=sensors,
+            network=load_network(path, config_path)
+        )
+        games = []
+        for episode, seed in enumerate(seeds):
+            recorder = EpisodeRecorder() if args.record is not None else None
+            games.append(train_ai.play_episode(
+                controller, num_obstacles=args.obstacles, draw=False, start_len=args.start_len, seed=seed,
+                recorder=recorder
+            ))
+            if recorder is not None:
+                name = f'{os.path.splitext(os.path.basename(path))[0]}-{episode}.rec'
+                recorder.recording().save(os.path.join(args.record, name))
+        fitness = aggregate_fitness([episode_fitness(game) for game in games], args.aggregation, args.quantile)
+        scores = [game.score for game in games]
+        causes = Counter(game.cause_of_death for game in games)
+        print(
+            f'{path}: fitness {fitness:.3f}, score mean {sum(scores) / len(scores):.2f} max {max(scores)}, '
+            f'moves mean {sum(game.moves for game in games) / len(games):.1f}, '
+            f'deaths {", ".join(f"{cause} {count}" for cause, count in causes.most_common())}'
+        )
+
+
+def bench(parser, args, extra):
+    import benchmark
+    benchmark.main(extra)
+
+
+def _node_names(sensors):
+    names = {STRAIGHT: 'straight', RIGHT_TURN: 'right', LEFT_TURN: 'left'}
+    key = -1
+    for sensor in sensors:
+        for i in range(SENSORS[sensor]):
+            names[key] = sensor if SENSORS[sensor] == 1 else f'{sensor} {i}'
+            key -= 1
+    return names
+
+
+def visualize(parser, args):
+    from nn_archive import load_genome, load_neat_config
+    import visualize as visualize_module
+
+    if args.checkpoint is not None:
+        generation, config, population, species_set, random_state = read_checkpoint(args.checkpoint)
+        sensors = config_sensors(config)
+        genome = max(
+            (genome for genome in population.values() if genome.fitness is not None),
+            key=lambda genome: genome.fitness
+        )
+    else:
+        genome = load_genome(args.genome)
+        sensors = genome_sensors(genome)
+        config = load_neat_config(os.path.join(args.config_dir, 'neat_config.txt'), sensors)
+    visualize_module.draw_net(
+        config,
+        genome,
+        view=args.view,
+        filename=args.filename,
+        node_names=_node_names(sensors),
+        prune_unused=args.prune_unused,
+        fmt=args.format
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train and play the snake AI')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help='Start a new training run')
+    _add_training_arguments(train_parser)
+    train_parser.add_argument('--continue', dest='resume', action='store_true', help='Resume instead if the checkpoint directory holds a run')
+
+    resume_parser = subparsers.add_parser(
+        'resume', help='Continue the run in a checkpoint directory with its saved settings, overriding those given',
+        argument_default=argparse.SUPPRESS
+    )
+    _add_training_arguments(resume_parser)
+
+    play_parser = subparsers.add_parser('play', help='Watch a network, a bot or yourself play, or replay a recording')
+    play_parser.add_argument('--genome', default=os.path.join(ROOT, 'best_nn.pkl'))
+    controllers = play_parser.add_mutually_exclusive_group()
+    controllers.add_argument('--player', action='store_true', help='Play with the arrow keys')
+    controllers.add_argument('--bot', action='store_true', help='Watch the basic bot')
+    controllers.add_argument('--replay', help='Replay a recording')
+    play_parser.add_argument('--obstacles', type=int, default=0)
+    play_parser.add_argument('--start-len', type=int, default=1)
+    play_parser.add_argument('--fps', type=int, default=10)
+    play_parser.add_argument('--seed', type=int, default=None)
+    play_parser.add_argument('--print-steps', action='store_true', help="Print the network's inputs and outputs")
+    play_parser.add_argument('--record', metavar='PATH', help='Record the last game played to PATH, for --replay')
+
+    evaluate_parser = subparsers.add_parser('evaluate', help='Score genomes over seeded episodes without drawing')
+    evaluate_parser.add_argument('genomes', nargs='*', default=[os.path.join(ROOT, 'best_nn.pkl')])
+    evaluate_parser.add_argument('--config-dir', default=ROOT)
+    evaluate_parser.add_argument('--episodes', type=int, default=10)
+    evaluate_parser.add_argument('--seed', type=int, default=0)
+    evaluate_parser.add_argument('--obstacles', type=int, default=100)
+    evaluate_parser.add_argument('--start-len', type=int, default=1)
+    evaluate_parser.add_argument('--board', type=_board, default=None, help='Board size in squares, e.g. 20x15')
+    evaluate_parser.add_argument('--aggregation', choices=AGGREGATIONS, default='mean')
+    evaluate_parser.add_argument('--quantile', type=float, default=0.5)
+    evaluate_parser.add_argument(
+        '--record', metavar='DIR', help='Record every episode to DIR as <genome>-<episode>.rec, for play --replay'
+    )
+
+    subparsers.add_parser('bench', help='Measure throughput, takes the options of benchmark.py', add_help=False)
+
+    visualize_parser = subparsers.add_parser('visualize', help='Draw the network of a genome with graphviz')
+    sources = visualize_parser.add_mutually_exclusive_group()
+    sources.add_argument('--genome', default=os.path.join(ROOT, 'best_nn.pkl'))
+    sources.add_argument('--checkpoint', help='Draw the fittest evaluated genome of a checkpoint')
+    visualize_parser.add_argument('--config-dir', default=ROOT)
+    visualize_parser.add_argument('--filename', default=None, help='Output file, without the extension')
+    visualize_parser.add_argument('--format', default='svg')
+    visualize_parser.add_argument('--view', action='store_true', help='Open the drawing')
+    visualize_parser.add_argument('--prune-unused', action='store_true', help='Leave out nodes that do not affect the outputs')
+
+    # Everything after bench is handed to benchmark.py
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['bench']:
+        bench(parser, None, argv[1:])
+        return
+    args = parser.parse_args(argv)
+    {'train': train, 'resume': resume, 'play': play, 'evaluate': evaluate, 'visualize': visualize}[args.command](parser, args)
+
+
+if __name__ == '__main__':
+    main()
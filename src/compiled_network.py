@@ -0,0 +1,214 @@
+from typing import Sequence
+
+import numpy as np
+from neat.graphs import feed_forward_layers
+
+
+# NumPy versions of neat's built-in activation functions
+ACTIVATIONS = {
+    'sigmoid': lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+    'tanh': lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    'sin': lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    'gauss': lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2),
+    'relu': lambda z: np.maximum(z, 0.0),
+    'softplus': lambda z: 0.2 * np.log1p(np.exp(np.clip(5.0 * z, -60.0, 60.0))),
+    'identity': lambda z: z,
+    'clamped': lambda z: np.clip(z, -1.0, 1.0),
+    'log': lambda z: np.log(np.maximum(z, 1e-7)),
+    'exp': lambda z: np.exp(np.clip(z, -60.0, 60.0)),
+    'abs': np.abs,
+    'hat': lambda z: np.maximum(0.0, 1 - np.abs(z)),
+    'square': np.square,
+    'cube': lambda z: z ** 3,
+}
+
+
+def _activation(name, config):
+    if name in ACTIVATIONS:
+        return ACTIVATIONS[name]
+    # Custom activations registered on the config fall back to element-wise evaluation
+    return np.vectorize(config.genome_config.activation_defs.get(name), otypes=[float])
+
+
+class CompiledNetwork:
+    """
+    Array-backed equivalent of neat.nn.FeedForwardNetwork. Nodes are assigned slots in a flat value buffer, inputs
+    first and then in topological order. Single activations run a flat program over a preallocated list, which avoids
+    NumPy's per-call overhead on small networks, while batches evaluate each feed-forward layer as one dense matrix
+    product.
+    """
+    def __init__(self, num_inputs: int, output_slots: np.ndarray, layers: list, program: list, num_slots: int):
+        self._num_inputs = num_inputs
+        self._output_slots = output_slots
+        self._output_slot_list = output_slots.tolist()
+        self._layers = layers
+        self._program = program
+        self._num_slots = num_slots
+        self._values = [0.0] * num_slots
+
+    @staticmethod
+    def create(genome, config):
+        genome_config = config.genome_config
+        connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+        layers = feed_forward_layers(genome_config.input_keys, genome_config.output_keys, connections)
+
+        slots = {key: i for i, key in enumerate(genome_config.input_keys)}
+        for layer in layers:
+            for node in sorted(layer):
+                slots[node] = len(slots)
+        # Outputs that are never evaluated read from a slot that always stays at zero, like in activate()
+        zero_slot = len(slots)
+        num_slots = zero_slot + 1
+
+        incoming = {}
+        for key in connections:
+            incoming.setdefault(key[1], []).append(key)
+
+        compiled_layers = []
+        program = []
+        for layer in layers:
+            nodes = sorted(layer)
+            weights = np.zeros((len(nodes), num_slots))
+            node_genes = [genome.nodes[node] for node in nodes]
+            for row, (node, ng) in enumerate(zip(nodes, node_genes)):
+                if ng.aggregation != 'sum':
+                    raise ValueError(f'Only the sum aggregation can be compiled, node {node} uses {ng.aggregation}')
+
+                links = []
+                for conn_key in incoming.get(node, ()):
+                    weight = genome.connections[conn_key].weight
+                    weights[row, slots[conn_key[0]]] += weight
+                    links.append((slots[conn_key[0]], weight))
+
+                program.append((
+                    slots[node],
+                    genome_config.activation_defs.get(ng.activation),
+                    ng.bias,
+                    ng.response,
+                    tuple(links)
+                ))
+
+            activations = {}
+            for row, ng in enumerate(node_genes):
+                activations.setdefault(ng.activation, []).append(row)
+            if len(activations) == 1:
+                activation_groups = [(_activation(node_genes[0].activation, config), slice(None))]
+            else:
+                activation_groups = [(_activation(name, config), np.array(rows)) for name, rows in activations.items()]
+
+            compiled_layers.append((
+                weights,
+                np.array([ng.bias for ng in node_genes]),
+                np.array([ng.response for ng in node_genes]),
+                np.array([slots[node] for node in nodes]),
+                activation_groups
+            ))
+
+        output_slots = np.array([slots.get(key, zero_slot) for key in genome_config.output_keys])
+        return CompiledNetwork(len(genome_config.input_keys), output_slots, compiled_layers, program, num_slots)
+
+    def activate(self, inputs: Sequence[float]) -> list[float]:
+        if len(inputs) != self._num_inputs:
+            raise RuntimeError(f'Expected {self._num_inputs} inputs, got {len(inputs)}')
+
+        values = self._values
+        values[:self._num_inputs] = inputs
+        for target, activation, bias, response, links in self._program:
+            s = 0.0
+            for slot, weight in links:
+                s += values[slot] * weight
+            values[target] = activation(bias + response * s)
+
+        return [values[slot] for slot in self._output_slot_list]
+
+    def activate_batch(self, inputs: np.ndarray) -> np.ndarray:
+        """Evaluates the network on every row of inputs, of shape (m, num_inputs), returning (m, num_outputs)."""
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.ndim != 2 or inputs.shape[1] != self._num_inputs:
+            raise RuntimeError(f'Expected inputs of shape (m, {self._num_inputs}), got {inputs.shape}')
+
+        values = np.zeros((len(inputs), self._num_slots))
+        values[:, :self._num_inputs] = inputs
+        for weights, bias, response, targets, activation_groups in self._layers:
+            z = bias + response * (values @ weights.T)
+            for activation, rows in activation_groups:
+                values[:, targets[rows]] = activation(z[:, rows])
+
+        return values[:, self._output_slots]
+
+    @property
+    def num_inputs(self):
+        return self._num_inputs
+
+    @property
+    def num_outputs(self):
+        return len(self._output_slots)
+
+
+class CompiledNetworkBatch:
+    """
+    Evaluates many compiled networks at once, network g on row g of the inputs. Every network's layers are padded to
+    a common depth, width and slot count so that each layer is a single batched matrix product.
+    """
+    def __init__(self, networks: Sequence[CompiledNetwork]):
+        if not networks:
+            raise ValueError('At least one network is required')
+        num_inputs = {net.num_inputs for net in networks}
+        num_outputs = {net.num_outputs for net in networks}
+        if len(num_inputs) != 1 or len(num_outputs) != 1:
+            raise ValueError('All networks must have the same number of inputs and outputs')
+
+        self._num_inputs = num_inputs.pop()
+        self._n = len(networks)
+        depth = max(len(net._layers) for net in networks)
+        width = max((len(layer[3]) for net in networks for layer in net._layers), default=0)
+
+        # Per network slots are laid out as in CompiledNetwork, followed by a shared zero slot and a scratch slot
+        # that padded rows write into
+        self._num_slots = max(net._num_slots for net in networks) + 1
+        zero_slot = self._num_slots - 2
+        scratch_slot = self._num_slots - 1
+
+        self._output_slots = np.array([
+            np.where(net._output_slots == net._num_slots - 1, zero_slot, net._output_slots) for net in networks
+        ])
+
+        self._weights = np.zeros((depth, self._n, width, self._num_slots))
+        self._bias = np.zeros((depth, self._n, width))
+        self._response = np.zeros((depth, self._n, width))
+        self._targets = np.full((depth, self._n, width), scratch_slot)
+        activation_masks = {}
+
+        for g, net in enumerate(networks):
+            for d, (weights, bias, response, targets, activation_groups) in enumerate(net._layers):
+                k = len(targets)
+                self._weights[d, g, :k, :net._num_slots - 1] = weights[:, :-1]
+                self._bias[d, g, :k] = bias
+                self._response[d, g, :k] = response
+                self._targets[d, g, :k] = targets
+                for activation, rows in activation_groups:
+                    rows = np.arange(k)[rows]
+                    mask = activation_masks.setdefault(activation, np.zeros((depth, self._n, width), dtype=bool))
+                    mask[d, g, rows] = True
+
+        self._activation_masks = list(activation_masks.items())
+        self._rows = np.arange(self._n)[:, None]
+
+    def activate(self, inputs: np.ndarray) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.shape != (self._n, self._num_inputs):
+            raise RuntimeError(f'Expected inputs of shape ({self._n}, {self._num_inputs}), got {inputs.shape}')
+
+        values = np.zeros((self._n, self._num_slots))
+        values[:, :self._num_inputs] = inputs
+        for d in range(len(self._weights)):
+            z = self._bias[d] + self._response[d] * np.einsum('gks,gs->gk', self._weights[d], values)
+            out = np.zeros_like(z)
+            for activation, mask in self._activation_masks:
+                out[mask[d]] = activation(z[mask[d]])
+            values[self._rows, self._targets[d]] = out
+
+        return values[self._rows, self._output_slots]
+
+    def __len__(self):
+        return self._n
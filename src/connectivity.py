@@ -0,0 +1,314 @@
+from directions import RELATIVE_MOVES
+
+from collections import deque
+
+import numpy as np
+
+
+# The 8 cells around a cell in clockwise order starting above it, as (dx, dy) in squares. Even positions are the
+# 4 neighbours a snake can move to.
+_RING = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+
+
+def _ring_runs(mask):
+    # Groups of the free neighbours (even ring positions) that are connected through free cells of the ring itself,
+    # for a mask with bit i set when ring position i is free
+    free = [bool(mask >> i & 1) for i in range(8)]
+    if all(free):
+        return ((0, 2, 4, 6),)
+    start = free.index(False)
+    runs = []
+    current = []
+    for k in range(1, 9):
+        i = (start + k) % 8
+        if free[i]:
+            if i % 2 == 0:
+                current.append(i)
+        elif current:
+            runs.append(tuple(current))
+            current = []
+    if current:
+        runs.append(tuple(current))
+    return tuple(runs)
+
+
+# Filling a cell can only split its region when its free neighbours are not all connected around it, which depends
+# on nothing but the 8 surrounding cells, so the answer for every neighbourhood is worked out once here
+_RUNS = tuple(_ring_runs(mask) for mask in range(256))
+_NUM_RUNS = np.array([len(runs) for runs in _RUNS])
+
+
+class Connectivity:
+    """Regions of free cells of a GameCore, kept up to date as the snake moves, see GameCore.connectivity."""
+    def __init__(self, free_cells, square_size):
+        self._size = square_size
+        # Every free cell carries the label of its region, connected through up, down, left and right moves, so the
+        # size of the space reachable from a cell is a dictionary lookup
+        self._labels = {}
+        self._sizes = {}
+        self._next_label = 0
+        free_cells = set(free_cells)
+        for cell in free_cells:
+            if cell not in self._labels:
+                self._flood(cell, free_cells)
+
+    def region_size(self, cell) -> int:
+        """Number of free cells reachable from a free cell, including itself, or 0 if the cell is not free."""
+        label = self._labels.get(cell)
+        return 0 if label is None else self._sizes[label]
+
+    def reachable(self, cell) -> int:
+        """Number of free cells reachable from an occupied cell such as the head, through its free neighbours."""
+        labels = {self._labels.get(neighbour) for neighbour in self._neighbours(cell)}
+        labels.discard(None)
+        return sum(self._sizes[label] for label in labels)
+
+    def move_regions(self, game) -> tuple[int, int, int]:
+        """region_size of the cells ahead, to the right and to the left of the head of a game that has started moving."""
+        x, y, size = game.x, game.y, self._size
+        return tuple(
+            self.region_size((x + dx * size, y + dy * size))
+            for dx, dy, changed_direction in RELATIVE_MOVES[(game.dx, game.dy)]
+        )
+
+    def same_region(self, a, b) -> bool:
+        label = self._labels.get(a)
+        return label is not None and label == self._labels.get(b)
+
+    def add(self, cell):
+        """Marks a cell as free."""
+        if cell in self._labels:
+            return
+        labels = {self._labels.get(neighbour) for neighbour in self._neighbours(cell)}
+        labels.discard(None)
+        if not labels:
+            self._new_region([cell])
+            return
+
+        # Keep the label of the largest region and relabel the others into it
+        largest = max(labels, key=self._sizes.__getitem__)
+        self._labels[cell] = largest
+        self._sizes[largest] += 1
+        for label in labels:
+            if label == largest:
+                continue
+            for member in self._members(cell, label):
+                self._labels[member] = largest
+            self._sizes[largest] += self._sizes.pop(label)
+
+    def discard(self, cell):
+        """Marks a cell as occupied, if it was free."""
+        label = self._labels.pop(cell, None)
+        if label is None:
+            return
+        self._sizes[label] -= 1
+
+        x, y, size = cell[0], cell[1], self._size
+        mask = 0
+        for i, (dx, dy) in enumerate(_RING):
+            if (x + dx * size, y + dy * size) in self._labels:
+                mask |= 1 << i
+        # Only flooded when the free cells around it are not connected through its 8 neighbours
+        runs = _RUNS[mask]
+        if not runs:
+            del self._sizes[label]
+        elif len(runs) > 1:
+            ring = [(x + dx * size, y + dy * size) for dx, dy in _RING]
+            self._split(label, [ring[run[0]] for run in runs])
+
+    def _split(self, label, starts):
+        # Floods from one cell of each piece in turn, merging floods that meet, until at most one is still growing.
+        # The remaining piece, usually the largest, keeps its label without being visited.
+        owner = {cell: i for i, cell in enumerate(starts)}
+        frontiers = [deque([cell]) for cell in starts]
+        counts = [1] * len(starts)
+        parent = list(range(len(starts)))
+
+        def find(i):
+            while parent[i] != i:
+                i = parent[i]
+            return i
+
+        while True:
+            roots = {find(i) for i in range(len(starts))}
+            growing = [root for root in roots if frontiers[root]]
+            if len(roots) == 1 or len(growing) <= 1:
+                break
+            for root in growing:
+                root = find(root)
+                if not frontiers[root]:
+                    continue
+                for neighbour in self._neighbours(frontiers[root].popleft()):
+                    if neighbour not in self._labels:
+                        continue
+                    other = owner.get(neighbour)
+                    if other is None:
+                        owner[neighbour] = root
+                        counts[root] += 1
+                        frontiers[root].append(neighbour)
+                        continue
+                    other = find(other)
+                    if other != root:
+                        parent[other] = root
+                        counts[root] += counts[other]
+                        frontiers[root].extend(frontiers[other])
+                        frontiers[other] = deque()
+
+        if len(roots) == 1:
+            return
+        # A flood that stopped growing has covered its whole piece. The piece still growing, or the largest if they
+        # all finished together, keeps the old label.
+        keep = growing[0] if growing else max(roots, key=counts.__getitem__)
+        pieces = {root: [] for root in roots if root != keep}
+        for cell, i in owner.items():
+            root = find(i)
+            if root != keep:
+                pieces[root].append(cell)
+        for root, cells in pieces.items():
+            self._sizes[label] -= counts[root]
+            self._new_region(cells)
+
+    def _flood(self, start, free_cells):
+        label = self._new_region([start])
+        queue = deque([start])
+        while queue:
+            for neighbour in self._neighbours(queue.popleft()):
+                if neighbour in free_cells and neighbour not in self._labels:
+                    self._labels[neighbour] = label
+                    self._sizes[label] += 1
+                    queue.append(neighbour)
+
+    def _members(self, start, label):
+        # Cells labelled label that are connected to start, which is next to the region
+        seen = set()
+        queue = deque(neighbour for neighbour in self._neighbours(start) if self._labels.get(neighbour) == label)
+        seen.update(queue)
+        while queue:
+            for neighbour in self._neighbours(queue.popleft()):
+                if neighbour not in seen and self._labels.get(neighbour) == label:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return seen
+
+    def _new_region(self, cells):
+        label = self._next_label
+        self._next_label += 1
+        for cell in cells:
+            self._labels[cell] = label
+        self._sizes[label] = len(cells)
+        return label
+
+    def _neighbours(self, cell):
+        x, y, size = cell[0], cell[1], self._size
+        return (x, y - size), (x + size, y), (x, y + size), (x - size, y)
+
+
+class BatchConnectivity:
+    """Regions of free cells for every board of a BatchGame, like Connectivity, see BatchGame.connectivity."""
+    def __init__(self, free: np.ndarray):
+        n, n_x, n_y = free.shape
+        self._shape = n_x, n_y
+        # The label of each free cell and the number of cells of each label, per board
+        self._labels = np.full((n, n_x * n_y), -1, dtype=np.int64)
+        self._sizes = np.zeros((n, n_x * n_y), dtype=np.int64)
+        self._ring = np.array([dx * n_y + dy for dx, dy in _RING])
+        self._neighbours = self._ring[::2]
+        self._relabel(np.arange(n), free.reshape(n, -1))
+
+    def region_sizes(self, cells: np.ndarray) -> np.ndarray:
+        """Region size of each cell, for cells of shape (n, k) holding k flat cell indices per board, 0 if blocked."""
+        labels = np.take_along_axis(self._labels, cells, axis=1)
+        sizes = np.take_along_axis(self._sizes, np.maximum(labels, 0), axis=1)
+        return np.where(labels >= 0, sizes, 0)
+
+    def add(self, boards: np.ndarray, cells: np.ndarray):
+        """Marks one cell per board as free."""
+        absent = self._labels[boards, cells] < 0
+        boards, cells = boards[absent], cells[absent]
+        if not len(boards):
+            return
+
+        labels = self._labels[boards[:, None], cells[:, None] + self._neighbours]
+        sizes = np.where(labels >= 0, self._sizes[boards[:, None], np.maximum(labels, 0)], -1)
+        largest = labels[np.arange(len(boards)), np.argmax(sizes, axis=1)]
+        for i in np.flatnonzero(largest < 0):
+            largest[i] = self._unused_label(boards[i], cells[i])
+        self._labels[boards, cells] = largest
+        self._sizes[boards, largest] += 1
+
+        # Only boards where the cell joins several regions relabel the smaller ones
+        others = (labels >= 0) & (labels != largest[:, None])
+        for i in np.flatnonzero(others.any(axis=1)):
+            b = boards[i]
+            merged = np.unique(labels[i, others[i]])
+            self._labels[b, np.isin(self._labels[b], merged)] = largest[i]
+            self._sizes[b, largest[i]] += self._sizes[b, merged].sum()
+            self._sizes[b, merged] = 0
+
+    def discard(self, boards: np.ndarray, cells: np.ndarray):
+        """Marks one cell per board as occupied, if it was free."""
+        labels = self._labels[boards, cells]
+        present = labels >= 0
+        boards, cells, labels = boards[present], cells[present], labels[present]
+        if not len(boards):
+            return
+
+        self._labels[boards, cells] = -1
+        self._sizes[boards, labels] -= 1
+        # Free cells are never walls, so the ring around them stays on the board
+        ring = self._labels[boards[:, None], cells[:, None] + self._ring] >= 0
+        masks = ring @ (1 << np.arange(len(_RING)))
+        # Only boards where the region may have split are labelled again from scratch
+        split = boards[_NUM_RUNS[masks] > 1]
+        if len(split):
+            self._relabel(split, self._labels[split] >= 0)
+
+    def _relabel(self, boards, free):
+        n_x, n_y = self._shape
+        n_cells = n_x * n_y
+        labels = region_labels_batch(free.reshape(len(boards), n_x, n_y))
+        index = (np.arange(len(boards))[:, None] * (n_cells + 1) + labels).ravel()
+        counts = np.bincount(index, minlength=len(boards) * (n_cells + 1)).reshape(len(boards), n_cells + 1)
+        self._labels[boards] = np.where(free, labels, -1)
+        self._sizes[boards] = counts[:, :n_cells]
+
+    def _unused_label(self, b, cell):
+        # There are fewer regions than cells, since walls are never free, so some label always has no cells
+        if self._sizes[b, cell] == 0:
+            return cell
+        return int(np.argmin(self._sizes[b]))
+
+
+def region_labels_batch(free: np.ndarray) -> np.ndarray:
+    """Smallest flat index in the region of each free cell, n_x * n_y for blocked cells, of shape (n, n_x * n_y)."""
+    # Every free cell starts labelled with its own index and repeatedly takes the smallest label among its neighbours,
+    # then the label of its label, which converges in a few dozen rounds even on winding regions
+    n, n_x, n_y = free.shape
+    n_cells = n_x * n_y
+    flat = free.reshape(n, n_cells)
+    labels = np.where(flat, np.arange(n_cells), n_cells)
+    while True:
+        grid = labels.reshape(n, n_x, n_y)
+        smallest = grid.copy()
+        np.minimum(smallest[:, 1:], grid[:, :-1], out=smallest[:, 1:])
+        np.minimum(smallest[:, :-1], grid[:, 1:], out=smallest[:, :-1])
+        np.minimum(smallest[:, :, 1:], grid[:, :, :-1], out=smallest[:, :, 1:])
+        np.minimum(smallest[:, :, :-1], grid[:, :, 1:], out=smallest[:, :, :-1])
+        smallest = np.where(flat, smallest.reshape(n, n_cells), n_cells)
+        # Blocked cells point past the end, at a padding column that always holds n_cells
+        padded = np.concatenate([smallest, np.full((n, 1), n_cells)], axis=1)
+        smallest = np.take_along_axis(padded, smallest, axis=1)
+        if np.array_equal(smallest, labels):
+            return labels
+        labels = smallest
+
+
+def region_sizes_batch(free: np.ndarray) -> np.ndarray:
+    """Size of the region around each cell, given free cells of shape (n, n_x, n_y), 0 for blocked cells."""
+    n, n_x, n_y = free.shape
+    n_cells = n_x * n_y
+    flat = free.reshape(n, n_cells)
+    labels = region_labels_batch(free)
+    index = (np.arange(n)[:, None] * (n_cells + 1) + labels).ravel()
+    counts = np.bincount(index, minlength=n * (n_cells + 1))
+    return np.where(flat, counts[index].reshape(n, n_cells), 0).reshape(n, n_x, n_y)
@@ -0,0 +1,152 @@
+from utils import read_game_config, get_game_config_state, set_game_config_overrides
+
+from configparser import ConfigParser
+
+from neat.reporting import BaseReporter
+
+
+class Stage:
+    """Game settings for one step of a curriculum, left once the best fitness reaches promote."""
+    # width and height are the board size in squares, walls included, or None for the size in game_config.yaml. A
+    # stage whose promote is None is never left.
+    def __init__(self, width: int | None = None, height: int | None = None, num_obstacles: int = 0, start_len: int = 1, promote: float | None = None):
+        if (width is None) != (height is None):
+            raise ValueError('A stage sets both the width and height of the board, or neither')
+        self.width = width
+        self.height = height
+        self.num_obstacles = num_obstacles
+        self.start_len = start_len
+        self.promote = promote
+
+    def board(self) -> str:
+        return 'full' if self.width is None else f'{self.width}x{self.height}'
+
+    def eval_kwargs(self) -> dict:
+        return {'num_obstacles': self.num_obstacles, 'start_len': self.start_len}
+
+    def __eq__(self, other):
+        return isinstance(other, Stage) and vars(self) == vars(other)
+
+    def __repr__(self):
+        promote = '' if self.promote is None else f' promote={self.promote:g}'
+        return f'{self.board()} obstacles={self.num_obstacles} start_len={self.start_len}{promote}'
+
+
+def parse_stage(text: str) -> Stage:
+    """Parses a stage written as in the [Curriculum] section, like '12x12 obstacles=0 start_len=1 promote=10'."""
+    board, *options = text.split()
+    kwargs = {}
+    if board != 'full':
+        try:
+            kwargs['width'], kwargs['height'] = (int(size) for size in board.split('x'))
+        except ValueError:
+            raise ValueError(f"Invalid board size {board} in stage '{text}', should be like 12x12 or full") from None
+
+    names = {'obstacles': ('num_obstacles', int), 'start_len': ('start_len', int), 'promote': ('promote', float)}
+    for option in options:
+        name, _, value = option.partition('=')
+        if name not in names:
+            raise ValueError(f"Unknown option {name} in stage '{text}', should be one of {', '.join(names)}")
+        key, parse = names[name]
+        kwargs[key] = parse(value)
+    return Stage(**kwargs)
+
+
+def read_curriculum(config_path, schedule=None) -> 'Curriculum | None':
+    """Reads the curriculum from the [Curriculum] section of a neat config file, or None if it declares no stages."""
+    parser = ConfigParser()
+    parser.read(config_path)
+    if not parser.has_option('Curriculum', 'stages'):
+        return None
+    stages = [parse_stage(line) for line in parser.get('Curriculum', 'stages').splitlines() if line.strip()]
+    if not stages:
+        return None
+    promote_generations = parser.getint('Curriculum', 'promote_generations', fallback=1)
+    return Curriculum(stages, promote_generations=promote_generations, schedule=schedule)
+
+
+class Curriculum(BaseReporter):
+    """Trains on easy settings first and moves the population through harder stages as it improves."""
+    def __init__(self, stages, promote_generations: int = 1, schedule=None):
+        if not stages:
+            raise ValueError('A curriculum needs at least one stage')
+        self.stages = list(stages)
+        self.promote_generations = promote_generations
+        self.schedule = schedule
+        self.stage_index = 0
+        self.streak = 0
+        self.generation = None
+        # (generation, stage index) of every promotion
+        self.history = []
+        self._previous_overrides = None
+
+    @property
+    def stage(self) -> Stage:
+        return self.stages[self.stage_index]
+
+    def resume(self, previous: 'Curriculum | None'):
+        """Continues from the progress of a curriculum restored from a checkpoint, if it declared the same stages."""
+        if previous is None or previous.stages != self.stages:
+            if previous is not None:
+                print('Curriculum: the stages changed since the checkpoint, starting from the first stage')
+            return
+        self.stage_index = previous.stage_index
+        self.streak = previous.streak
+        self.history = list(previous.history)
+
+    def eval_kwargs(self) -> dict:
+        # The evaluation functions and ChunkedParallelEvaluator pick these up every generation
+        return self.stage.eval_kwargs()
+
+    def game_config_overrides(self) -> dict:
+        """Keyword arguments to set_game_config_overrides that apply the stage on top of the previous overrides."""
+        if self._previous_overrides is None:
+            self._previous_overrides = {key.lower(): value for key, value in get_game_config_state()[1].items()}
+        overrides = dict(self._previous_overrides)
+        if self.stage.width is not None:
+            square_size = overrides.get('square_size', read_game_config()[2])
+            overrides['width'] = self.stage.width * square_size
+            overrides['height'] = self.stage.height * square_size
+        return overrides
+
+    def settings(self) -> tuple:
+        return self.stage.board(), self.stage.num_obstacles, self.stage.start_len
+
+    def start_generation(self, generation):
+        self.generation = generation
+        # The board size applies in this process, and is restored by close() or at the end of a with block
+        set_game_config_overrides(**self.game_config_overrides())
+
+    def post_evaluate(self, config, population, species, best_genome):
+        # Promoted once the best fitness of promote_generations generations in a row reaches the stage's promote, and
+        # the next stage applies from the next generation
+        promote = self.stage.promote
+        if promote is None or self.stage_index == len(self.stages) - 1:
+            return
+        self.streak = self.streak + 1 if best_genome.fitness >= promote else 0
+        if self.streak < self.promote_generations:
+            return
+
+        self.stage_index += 1
+        self.streak = 0
+        self.history.append((self.generation, self.stage_index))
+        # The early abandonment threshold was set on the old stage
+        if self.schedule is not None:
+            self.schedule.threshold = None
+        print(f'Curriculum: promoted to stage {self.stage_index + 1}/{len(self.stages)}, {self.stage}')
+
+    def close(self):
+        if self._previous_overrides is not None:
+            set_game_config_overrides(**self._previous_overrides)
+            self._previous_overrides = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        # Kept on the neat config, so that checkpoints record the stages and progress. The config is also sent to
+        # workers, so leave out the schedule and the caller's overrides
+        return {**self.__dict__, 'schedule': None, '_previous_overrides': None}
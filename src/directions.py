@@ -0,0 +1,26 @@
+# Direction codes, in clockwise order so that (d + 1) % 4 is a right turn, (d + 2) % 4 the reverse and (d + 3) % 4 a
+# left turn. BatchGame and recordings use the codes, GameCore and controllers the (dx, dy) vectors.
+UP, RIGHT, DOWN, LEFT = range(4)
+DIRECTIONS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+# Actions relative to the heading, in the order of NNController's outputs, and how much each one turns the heading
+STRAIGHT, RIGHT_TURN, LEFT_TURN = range(3)
+TURNS = (0, 1, 3)
+
+# RELATIVE_MOVES[(dx, dy)][action] is the (dx, dy, changed_direction) response that takes the action while heading
+# (dx, dy), so its dx and dy are also the offset of the cell ahead, to the right or to the left. A snake that has not
+# moved yet sets off upwards whatever the action.
+RELATIVE_MOVES = {
+    DIRECTIONS[heading]: tuple(
+        (*DIRECTIONS[(heading + turn) % 4], action != STRAIGHT) for action, turn in enumerate(TURNS)
+    )
+    for heading in range(4)
+}
+RELATIVE_MOVES[(0, 0)] = ((*DIRECTIONS[UP], True),) * len(TURNS)
+
+# ALLOWED_MOVES[(dx, dy)] holds the directions a snake heading (dx, dy) may move in, which is all but the reverse
+ALLOWED_MOVES = {
+    DIRECTIONS[heading]: frozenset(DIRECTIONS[heading + turn - 4] for turn in TURNS) for heading in range(4)
+}
+ALLOWED_MOVES[(0, 0)] = frozenset(DIRECTIONS)
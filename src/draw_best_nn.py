@@ -1,25 +1,11 @@
-import os.path
-import pickle
-import visualize
-import neat
+import sys
 
 
 def main():
-    config_dir = os.path.join(os.path.dirname(__file__), os.path.pardir)
-    config = neat.Config(
-        neat.DefaultGenome,
-        neat.DefaultReproduction,
-        neat.DefaultSpeciesSet,
-        neat.DefaultStagnation,
-        os.path.join(config_dir, 'neat_config.txt')
-    )
-
-    best_genome_path = os.path.join(os.path.dirname(__file__), os.path.pardir, 'best_nn.pkl')
-    with open(best_genome_path, 'rb') as file:
-        best_genome = pickle.load(file)
-
-    visualize.draw_net(config, best_genome, True)
+    # Same as cli.py visualize, see its --help for choosing the genome and output file
+    import cli
+    cli.main(['visualize', '--view', *sys.argv[1:]])
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
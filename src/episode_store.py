@@ -0,0 +1,177 @@
+from batch_game import CAUSES_OF_DEATH
+
+import json
+import os
+import os.path
+
+import numpy as np
+from neat.reporting import BaseReporter
+
+
+COLUMNS = (
+    ('generation', '<i4'),
+    ('genome_id', '<i8'),
+    ('species', '<i4'),
+    ('score', '<i4'),
+    ('moves', '<i4'),
+    ('cause_of_death', 'u1'),
+    ('fitness', '<f8'),
+    ('wall_time', '<f8'),
+)
+ROW_DTYPE = np.dtype(list(COLUMNS))
+_CAUSE_CODES = {cause: i for i, cause in enumerate(CAUSES_OF_DEATH)}
+
+
+class EpisodeLog:
+    """Buffers one row per played episode, holding the fields that are known where the episode was played."""
+    def __init__(self):
+        self.rows = []
+
+    def add(self, genome_id: int, score: int, moves: int, cause_of_death: str, fitness: float, wall_time: float):
+        self.rows.append((genome_id, score, moves, _CAUSE_CODES[cause_of_death], fitness, wall_time))
+
+    def take(self) -> list[tuple]:
+        rows = self.rows
+        self.rows = []
+        return rows
+
+    def extend(self, rows: list[tuple]):
+        self.rows.extend(rows)
+
+
+# The log that eval_genome adds episodes to, or None when episodes are not being stored. Like profiling.active,
+# worker processes get their own log and ship its rows back with each chunk.
+active = None
+
+
+def enable() -> EpisodeLog:
+    global active
+    if active is None:
+        active = EpisodeLog()
+    return active
+
+
+def disable():
+    global active
+    active = None
+
+
+def is_enabled() -> bool:
+    return active is not None
+
+
+class EpisodeStore:
+    """
+    Append-only columnar store of per-episode results. Each column is a raw little-endian file in the store's
+    directory, so analysis code can memory-map the columns straight into NumPy arrays without copying or parsing.
+
+    Rows are only ever appended, one batch per generation. The number of complete rows is the shortest column, so a
+    crash part way through an append loses at most that batch, and the torn tail is cut off the next time the store
+    is opened for writing. Readers can open a store that is still being written to.
+    """
+    def __init__(self, path, writable=False):
+        self.path = path
+        schema_path = os.path.join(path, 'schema.json')
+        schema = {'columns': [list(column) for column in COLUMNS], 'causes_of_death': list(CAUSES_OF_DEATH)}
+        if os.path.exists(schema_path):
+            with open(schema_path) as file:
+                existing = json.load(file)
+            if existing != schema:
+                raise ValueError(f'Episode store at {path} has a different schema')
+        elif writable:
+            os.makedirs(path, exist_ok=True)
+            with open(schema_path, 'w') as file:
+                json.dump(schema, file)
+        else:
+            raise FileNotFoundError(f'No episode store at {path}')
+
+        if not writable:
+            return
+        length = len(self)
+        for name, dtype in COLUMNS:
+            with open(self._column_path(name), 'ab') as file:
+                file.truncate(length * np.dtype(dtype).itemsize)
+
+    def append(self, rows: np.ndarray):
+        """Appends a structured array with dtype ROW_DTYPE."""
+        for name, dtype in COLUMNS:
+            with open(self._column_path(name), 'ab') as file:
+                file.write(np.ascontiguousarray(rows[name], dtype=dtype).tobytes())
+
+    def column(self, name: str) -> np.ndarray:
+        dtype = np.dtype(dict(COLUMNS)[name])
+        length = len(self)
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(length,))
+
+    def columns(self) -> dict[str, np.ndarray]:
+        return {name: self.column(name) for name, ignored_dtype in COLUMNS}
+
+    def causes_by_generation(self) -> np.ndarray:
+        """Counts of each cause of death per generation, as an array of shape (generations, len(CAUSES_OF_DEATH))."""
+        generation = self.column('generation')
+        if len(generation) == 0:
+            return np.zeros((0, len(CAUSES_OF_DEATH)), dtype=np.int64)
+        num_generations = int(generation.max()) + 1
+        index = generation.astype(np.int64) * len(CAUSES_OF_DEATH) + self.column('cause_of_death')
+        return np.bincount(index, minlength=num_generations * len(CAUSES_OF_DEATH)).reshape(num_generations, -1)
+
+    def mean_by_generation(self, name: str) -> np.ndarray:
+        """Mean of a column per generation, NaN for generations without episodes."""
+        generation = self.column('generation')
+        if len(generation) == 0:
+            return np.zeros(0)
+        counts = np.bincount(generation)
+        sums = np.bincount(generation, weights=self.column(name))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+
+    def __len__(self):
+        return min(
+            os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+            for path, dtype in ((self._column_path(name), dtype) for name, dtype in COLUMNS)
+        )
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f'{name}.bin')
+
+
+class EpisodeStoreReporter(BaseReporter):
+    """
+    Enables the episode log and appends each generation's episodes to an EpisodeStore, adding the generation and
+    the species of each genome. Must be added before a ChunkedParallelEvaluator is created, so that its workers log
+    episodes too, and the log is disabled again by close() or at the end of a with block.
+    """
+    def __init__(self, path):
+        self.log = enable()
+        self.store = EpisodeStore(path, writable=True)
+        self.generation = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.log.take()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        episodes = self.log.take()
+        rows = np.zeros(len(episodes), dtype=ROW_DTYPE)
+        if episodes:
+            genome_id, score, moves, cause_of_death, fitness, wall_time = zip(*episodes)
+            rows['generation'] = self.generation
+            rows['genome_id'] = genome_id
+            rows['species'] = [species.genome_to_species.get(key, -1) for key in genome_id]
+            rows['score'] = score
+            rows['moves'] = moves
+            rows['cause_of_death'] = cause_of_death
+            rows['fitness'] = fitness
+            rows['wall_time'] = wall_time
+        self.store.append(rows)
+
+    def close(self):
+        disable()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,93 @@
+from utils import read_game_config
+
+from typing import Literal, Sequence
+import math
+import random
+
+import numpy as np
+from neat.reporting import BaseReporter
+
+
+Aggregation = Literal['mean', 'min', 'quantile']
+AGGREGATIONS = ('mean', 'min', 'quantile')
+
+
+def episode_fitness(game) -> float:
+    if game.food is None:
+        return game.score
+    return game.score + 0.25 * (1 / max(1, abs(game.x - game.food[0])))
+
+
+def max_episode_fitness() -> float:
+    # Every interior square eaten, plus the largest possible food distance bonus
+    width, height, square_size, _ = read_game_config()
+    return (width // square_size - 2) * (height // square_size - 2) + 0.25
+
+
+def generation_seeds(generation: int, episodes: int, base_seed: int | None) -> list[int | None]:
+    if base_seed is None:
+        return [None] * episodes
+    rng = random.Random(f'{base_seed}:{generation}')
+    return [rng.getrandbits(32) for _ in range(episodes)]
+
+
+def aggregate_fitness(fitnesses: Sequence[float], aggregation: Aggregation = 'mean', quantile: float = 0.5) -> float:
+    if aggregation == 'mean':
+        return float(np.mean(fitnesses))
+    elif aggregation == 'min':
+        return float(np.min(fitnesses))
+    elif aggregation == 'quantile':
+        return float(np.quantile(fitnesses, quantile))
+    raise ValueError(f'Invalid aggregation, should be one of {AGGREGATIONS}, got {aggregation}')
+
+
+def cannot_reach(fitnesses: Sequence[float], episodes: int, threshold: float, aggregation: Aggregation = 'mean', quantile: float = 0.5, max_fitness: float = math.inf) -> bool:
+    """
+    Whether the aggregate over all episodes is guaranteed to stay below threshold, given the fitnesses of the
+    episodes played so far and that no episode can score more than max_fitness.
+    """
+    if aggregation == 'mean':
+        return (sum(fitnesses) + (episodes - len(fitnesses)) * max_fitness) / episodes < threshold
+
+    if aggregation == 'min':
+        quantile = 0.0
+    elif aggregation != 'quantile':
+        raise ValueError(f'Invalid aggregation, should be one of {AGGREGATIONS}, got {aggregation}')
+
+    # np.quantile interpolates between the sorted values at floor(p) and ceil(p), so it stays below threshold
+    # once more than ceil(p) of the values already do
+    upper = math.ceil(quantile * (episodes - 1))
+    return sum(f < threshold for f in fitnesses) > upper
+
+
+class EpisodeSchedule(BaseReporter):
+    """
+    Picks the episode seeds for each generation, shared by every genome so that they all face the same food and
+    obstacle layouts, and the fitness threshold below which genomes may be abandoned early. The threshold is the
+    elite_quantile of the previous generation's fitnesses, and abandonment is disabled when elite_quantile is None.
+    Episodes have no move limit, so the only bound on an episode's fitness is eating the whole board, and with the mean
+    aggregation the episodes left can always lift a genome over the threshold. train_ai.run only takes elite_quantile
+    with the min and quantile aggregations for that reason.
+    New seeds are drawn every reseed_interval generations, keeping them for longer lets a FitnessCache reuse the
+    fitness of surviving genomes in between.
+    """
+    def __init__(self, episodes: int = 1, base_seed: int | None = None, elite_quantile: float | None = None, reseed_interval: int = 1):
+        if episodes < 1:
+            raise ValueError(f'At least one episode per genome is required, got {episodes}')
+        if reseed_interval < 1:
+            raise ValueError(f'reseed_interval should be at least 1, got {reseed_interval}')
+
+        self.episodes = episodes
+        self.base_seed = base_seed
+        self.elite_quantile = elite_quantile
+        self.reseed_interval = reseed_interval
+        self.seeds = generation_seeds(0, episodes, base_seed)
+        self.threshold = None
+
+    def start_generation(self, generation):
+        self.seeds = generation_seeds(generation - generation % self.reseed_interval, self.episodes, self.base_seed)
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.elite_quantile is not None:
+            fitnesses = [genome.fitness for genome in population.values() if genome.fitness is not None]
+            self.threshold = float(np.quantile(fitnesses, self.elite_quantile)) if fitnesses else None
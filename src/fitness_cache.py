@@ -0,0 +1,139 @@
+from utils import read_game_config
+
+from collections import OrderedDict
+import hashlib
+import os.path
+import sqlite3
+
+from neat.reporting import BaseReporter
+
+
+def genome_digest(genome) -> bytes:
+    """Hash of everything that determines a genome's network, so identical genomes under different keys share it."""
+    nodes = sorted(
+        (key, node.bias, node.response, node.activation, node.aggregation) for key, node in genome.nodes.items()
+    )
+    connections = sorted((key, cg.weight) for key, cg in genome.connections.items() if cg.enabled)
+    return hashlib.blake2b(repr((nodes, connections)).encode(), digest_size=16).digest()
+
+
+class FitnessCache(BaseReporter):
+    """Remembers the fitness of genomes evaluated on the schedule's seeds, so they are not simulated again."""
+    def __init__(self, schedule, capacity: int = 10000, disk_path=None, context=()):
+        self.schedule = schedule
+        self.capacity = capacity
+        # Any other evaluation settings, such as the number of obstacles, or a function returning them when they change
+        # during training
+        self.context = context
+        # The capacity most recently used entries
+        self._entries = OrderedDict()
+        # Read on memory misses, and can be shared by runs and islands
+        self._disk = None
+        if disk_path is not None:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, timeout=30)
+            self._disk.execute('CREATE TABLE IF NOT EXISTS fitness (key BLOB PRIMARY KEY, fitness REAL)')
+            self._disk.commit()
+        self.last_stats = None
+        self.history = []
+
+    def wrap(self, fitness_function):
+        # Hits skip simulation and dispatch to workers alike, only the misses reach fitness_function
+        def evaluate(genomes, config):
+            self.evaluate(genomes, config, fitness_function)
+        return evaluate
+
+    def evaluate(self, genomes, config, fitness_function):
+        seeds = self.schedule.seeds
+        # Episodes without a seed are random, so nothing is cached
+        if any(seed is None for seed in seeds):
+            fitness_function(genomes, config)
+            self.last_stats = None
+            return
+
+        context = self.context() if callable(self.context) else self.context
+        prefix = repr((tuple(seeds), read_game_config(), context)).encode()
+        memory_hits = disk_hits = 0
+        misses = []
+        # Genomes identical to a miss of the same generation wait for its fitness instead of being simulated again
+        duplicates = []
+        missed = set()
+        for genome_id, genome in genomes:
+            key = hashlib.blake2b(prefix + genome_digest(genome), digest_size=16).digest()
+            if key in missed:
+                duplicates.append((key, genome))
+                continue
+            fitness = self._entries.get(key)
+            if fitness is not None:
+                self._entries.move_to_end(key)
+                memory_hits += 1
+            elif self._disk is not None:
+                row = self._disk.execute('SELECT fitness FROM fitness WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    fitness = row[0]
+                    self._remember(key, fitness)
+                    disk_hits += 1
+            if fitness is None:
+                misses.append((key, genome_id, genome))
+                missed.add(key)
+            else:
+                genome.fitness = fitness
+
+        if misses:
+            fitness_function([(genome_id, genome) for key, genome_id, genome in misses], config)
+
+        if duplicates:
+            fitnesses = {key: genome.fitness for key, genome_id, genome in misses}
+            for key, genome in duplicates:
+                genome.fitness = fitnesses[key]
+            memory_hits += len(duplicates)
+
+        # A genome abandoned early has a fitness that depends on the threshold, so only genomes that played every
+        # episode are stored
+        threshold = self.schedule.threshold
+        stored = [
+            (key, genome.fitness) for key, genome_id, genome in misses
+            if genome.fitness is not None and (threshold is None or genome.fitness >= threshold)
+        ]
+        for key, fitness in stored:
+            self._remember(key, fitness)
+        if self._disk is not None and stored:
+            self._disk.executemany('INSERT OR REPLACE INTO fitness (key, fitness) VALUES (?, ?)', stored)
+            self._disk.commit()
+
+        self.last_stats = {
+            'genomes': len(genomes),
+            'memory_hits': memory_hits,
+            'disk_hits': disk_hits,
+            'hit_rate': (memory_hits + disk_hits) / len(genomes) if genomes else 0,
+            'entries': len(self._entries),
+        }
+        self.history.append(self.last_stats)
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.last_stats is not None:
+            stats = self.last_stats
+            disk = f", {stats['disk_hits']} from disk" if self._disk is not None else ''
+            print(
+                f"Fitness cache: {stats['memory_hits'] + stats['disk_hits']}/{stats['genomes']} hits "
+                f"({stats['hit_rate']:.1%}){disk}, {stats['entries']} entries in memory"
+            )
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _remember(self, key, fitness):
+        self._entries[key] = fitness
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
@@ -0,0 +1,42 @@
+from typing import Hashable, Iterable
+import random
+
+
+class FreeCells:
+    """
+    Set of cells with O(1) add, remove and uniform random sampling. Cells are kept in a list, with a dict mapping
+    each cell to its position in the list, and removal swaps the last cell into the freed slot.
+    """
+    def __init__(self, cells: Iterable[Hashable] = ()):
+        self._cells = []
+        self._index = {}
+        for cell in cells:
+            self.add(cell)
+
+    def add(self, cell):
+        if cell not in self._index:
+            self._index[cell] = len(self._cells)
+            self._cells.append(cell)
+
+    def remove(self, cell):
+        i = self._index.pop(cell)
+        last = self._cells.pop()
+        if i != len(self._cells):
+            self._cells[i] = last
+            self._index[last] = i
+
+    def discard(self, cell):
+        if cell in self._index:
+            self.remove(cell)
+
+    def choice(self, rng: random.Random = random):
+        return rng.choice(self._cells)
+
+    def __contains__(self, cell):
+        return cell in self._index
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __iter__(self):
+        return iter(self._cells)
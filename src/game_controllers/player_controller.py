@@ -1,33 +1,23 @@
 from .controller import Controller
+from directions import DIRECTIONS, UP, RIGHT, DOWN, LEFT, ALLOWED_MOVES
 
 import pygame
 
 
+_KEY_DIRECTIONS = {
+    pygame.K_UP: DIRECTIONS[UP],
+    pygame.K_RIGHT: DIRECTIONS[RIGHT],
+    pygame.K_DOWN: DIRECTIONS[DOWN],
+    pygame.K_LEFT: DIRECTIONS[LEFT],
+}
+
+
 class PlayerController(Controller):
     def get_response(self, game) -> tuple[int, int, bool]:
-        dx, dy, changed_direction = game.dx, game.dy, False
-
         if game.buffer:
-            key = game.buffer.popleft()
-            if key == pygame.K_LEFT:
-                if game.dx != 1:
-                    dx = -1
-                    dy = 0
-                    changed_direction = True
-            elif key == pygame.K_RIGHT:
-                if game.dx != -1:
-                    dx = 1
-                    dy = 0
-                    changed_direction = True
-            elif key == pygame.K_UP:
-                if game.dy != 1:
-                    dx = 0
-                    dy = -1
-                    changed_direction = True
-            elif key == pygame.K_DOWN:
-                if game.dy != -1:
-                    dx = 0
-                    dy = 1
-                    changed_direction = True
+            direction = _KEY_DIRECTIONS.get(game.buffer.popleft())
+            # Pressing the arrow for the current direction still counts as a change of direction
+            if direction in ALLOWED_MOVES[(game.dx, game.dy)]:
+                return *direction, True
 
-        return dx, dy, changed_direction
\ No newline at end of file
+        return game.dx, game.dy, False
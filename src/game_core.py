@@ -0,0 +1,341 @@
+from snake import Snake
+from free_cells import FreeCells
+from connectivity import Connectivity
+from directions import RELATIVE_MOVES, ALLOWED_MOVES
+from game_controllers.controller import Controller
+from utils import read_game_config
+import profiling
+
+from collections import deque
+from time import perf_counter
+import random
+
+import numpy as np
+
+
+class GameCore:
+    """
+    Pure game logic, with no dependency on pygame. Headless training and evaluation use this directly, while Game
+    wraps it with rendering and keyboard input.
+    """
+    def __init__(self, controller: Controller, num_obstacles=0, start_len: int = 1, fps: int | float = 10, seed: int | None = None, recorder=None):
+        self._width, self._height, self._square_size, self._start_fps = read_game_config()
+        self._height += 2 * self._square_size
+
+        self._controller = controller
+        self._num_obstacles = num_obstacles
+        self._start_len = start_len
+        self._start_fps = fps
+        self._seed = seed
+        self._random = random.Random(seed)
+        self._recorder = recorder
+
+        if (
+            self._width % self._square_size != 0 or self._width < 5 * self._square_size
+            or self._height % self._square_size != 0 or self._height < 5 * self._square_size
+        ):
+            raise ValueError('Invalid values for width, height or square size. Width and height must be multiples of square size, and at least 5 times as large as the square size')
+
+        self._x_left = 0
+        self._x_right = self._width - self._square_size
+        self._y_top = self._square_size * 2
+        self._y_bottom = self._height - self._square_size
+
+        self._running = True
+
+        # Variables to be initialised in the initialise() method
+        self._x = None
+        self._y = None
+        self._dx = None
+        self._dy = None
+        self._snake = None
+        self.buffer = None
+        self._empty_squares = None
+        self._obstacles = None
+        self._game_over = None
+        self._food = None
+        self._score = None
+        self._moves = None
+        self._fps = None
+        self._remaining_blocks = None
+        self._connectivity = None
+
+        # Information attributes
+        self._moves_since_last_score = None
+        self._cause_of_death = None
+
+        self._initialise()
+
+    def _initialise(self):
+        profiler = profiling.active
+        start = perf_counter() if profiler else 0
+
+        self._x, self._y = self._start_coords()
+        self._dx = 0
+        self._dy = 0
+        self._snake = Snake(self._x, self._y)
+        self.buffer = deque()
+
+        self._empty_squares = FreeCells(
+            (x, y)
+            for x in range(self._x_left + self._square_size, self._x_right, self._square_size)
+            for y in range(self._y_top + self._square_size, self._y_bottom, self._square_size)
+        )
+
+        start_coords = self._start_coords()
+        self._empty_squares.remove(start_coords)
+        self._empty_squares.remove((start_coords[0], start_coords[1] - self._square_size))
+
+        self._obstacles = set()
+        for i in range(self._num_obstacles):
+            coords = self._empty_squares.choice(self._random)
+            self._obstacles.add(coords)
+            self._empty_squares.remove(coords)
+
+        self._empty_squares.add(start_coords)
+        self._empty_squares.add((start_coords[0], start_coords[1] - self._square_size))
+
+        self._game_over = False
+        self._food = self.generate_food()
+        self._score = 0
+        self._moves = 0
+        self._fps = self._start_fps
+        self._remaining_blocks = self._start_len - 1
+        self._moves_since_last_score = 0
+        self._cause_of_death = 'None'
+        self._connectivity = None
+
+        if self._recorder is not None:
+            self._recorder.start(self, self._seed)
+
+        if profiler:
+            profiler.add('setup', perf_counter() - start)
+            profiler.count('games')
+
+    def loop(self) -> int:
+        if self._check_moves_without_scoring():
+            return 0
+
+        if self._game_over:
+            self._running = False
+            return 0
+
+        dx, dy, changed_direction = self._get_response()
+        if dx == 0 and dy == 0:
+            return 0
+
+        self._move(dx, dy, changed_direction)
+        return 0
+
+    def _get_response(self):
+        profiler = profiling.active
+        if not profiler:
+            return self._controller.get_response(game=self)
+
+        start = perf_counter()
+        response = self._controller.get_response(game=self)
+        profiler.add('controller', perf_counter() - start)
+        return response
+
+    def _check_moves_without_scoring(self) -> bool:
+        if self._moves_since_last_score > 500:
+            self._game_over = True
+            self._cause_of_death = 'Too many moves without scoring'
+            self._moves_since_last_score = 0
+            return True
+        return False
+
+    def _move(self, dx: int, dy: int, changed_direction: bool):
+        if not self._check_move_validity(dx, dy):
+            raise ValueError(f'Controller gave invalid set of moves: dx={dx}, dy={dy}, even though the direction of movement was dx={self._dx}, dy={self._dy}')
+        if self._recorder is not None:
+            self._recorder.move(dx, dy, changed_direction)
+        self._dx, self._dy = dx, dy
+
+        self._moves += changed_direction
+        self._moves_since_last_score += changed_direction
+
+        profiler = profiling.active
+        if profiler:
+            profiler.count('steps')
+
+        self._x += self._dx * self._square_size
+        self._y += self._dy * self._square_size
+
+        head = (self._x, self._y)
+        self._empty_squares.discard(head)
+        if self._connectivity is not None:
+            self._connectivity.discard(head)
+
+        if head == self._food:
+            start = perf_counter() if profiler else 0
+            self._food = self.generate_food()
+            if profiler:
+                profiler.add('food', perf_counter() - start)
+            if self._recorder is not None:
+                self._recorder.food(self._food)
+
+            if self._food is None:
+                self._game_over = True
+                self._cause_of_death = 'All possible squares occupied'
+                return
+
+            self._score += 1
+            self._moves_since_last_score = 0
+            self._fps = self._calculate_fps()
+        elif self._remaining_blocks >= 1:
+            self._remaining_blocks -= 1
+        else:
+            tail = self._snake.pop()
+            # Following the tail moves the head straight into the cell it leaves, which stays occupied
+            if tail != head:
+                self._empty_squares.add(tail)
+                if self._connectivity is not None:
+                    self._connectivity.add(tail)
+
+        start = perf_counter() if profiler else 0
+        dead = self._check_death(head)
+        if profiler:
+            profiler.add('collision', perf_counter() - start)
+        if dead:
+            self._game_over = True
+            return
+
+        self._snake.move(head)
+
+    def _start_coords(self):
+        return (
+            self._width // self._square_size // 2 * self._square_size,
+            self._height // self._square_size // 2 * self._square_size
+        )
+
+    def _calculate_fps(self):
+        return 0.25 * (0.3 * self._score ** 0.7 + np.log(0.3 * self._score + 1)) + self._start_fps
+
+    def generate_food(self):
+        if self._empty_squares:
+            return self._empty_squares.choice(self._random)
+
+    def relative_move(self, action: int) -> tuple[int, int, bool]:
+        """The response that goes STRAIGHT, makes a RIGHT_TURN or a LEFT_TURN from the current heading."""
+        return RELATIVE_MOVES[(self._dx, self._dy)][action]
+
+    def _check_move_validity(self, dx, dy):
+        return (dx, dy) in ALLOWED_MOVES[(self._dx, self._dy)]
+
+    def _check_death(self, head: tuple[int, int]) -> bool:
+        if head[0] in (self._x_left, self._x_right) or head[1] in (self._y_top, self._y_bottom):
+            self._cause_of_death = 'Hit a wall'
+            return True
+        elif head in self._obstacles:
+            self._cause_of_death = 'Hit an obstacle'
+            return True
+        elif head in self._snake:
+            # The tail has already been popped by this point, so following it into its old cell is allowed
+            self._cause_of_death = 'Hit the body'
+            return True
+
+        return False
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def draw(self):
+        return False
+
+    @property
+    def fps(self):
+        return self._fps
+
+    @property
+    def x(self):
+        return self._x
+
+    @property
+    def y(self):
+        return self._y
+
+    @property
+    def dx(self):
+        return self._dx
+
+    @property
+    def dy(self):
+        return self._dy
+
+    @property
+    def food(self):
+        return self._food
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def x_right(self):
+        return self._x_right
+
+    @property
+    def x_left(self):
+        return self._x_left
+
+    @property
+    def y_top(self):
+        return self._y_top
+
+    @property
+    def y_bottom(self):
+        return self._y_bottom
+
+    @property
+    def start_len(self):
+        return self._start_len
+
+    @property
+    def remaining_blocks(self):
+        return self._remaining_blocks
+
+    @property
+    def square_size(self):
+        return self._square_size
+
+    @property
+    def empty_squares(self):
+        return self._empty_squares
+
+    @property
+    def connectivity(self) -> Connectivity:
+        # Created on first use, so that games whose controllers never ask for it don't pay for keeping it updated
+        if self._connectivity is None:
+            self._connectivity = Connectivity(self._empty_squares, self._square_size)
+        return self._connectivity
+
+    @property
+    def snake(self):
+        return self._snake
+
+    @property
+    def obstacles(self):
+        return self._obstacles
+
+    @property
+    def score(self):
+        return self._score
+
+    @property
+    def moves(self):
+        return self._moves
+
+    @property
+    def moves_since_last_score(self):
+        return self._moves_since_last_score
+
+    @property
+    def cause_of_death(self):
+        return self._cause_of_death
@@ -0,0 +1,486 @@
+from checkpointer import read_checkpoint
+from sensors import config_sensors
+from utils import get_checkpoint_name
+from train_ai import TrainingSettings
+import train_ai
+
+from abc import ABC, abstractmethod
+from dataclasses import replace
+from multiprocessing.connection import Client, Listener
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import os.path
+import pickle
+import queue
+import random
+import signal
+import threading
+import time
+
+from neat.reporting import BaseReporter
+
+
+ROOT = os.path.join(os.path.dirname(__file__), os.path.pardir)
+WINNER_NAME = 'best_nn.pkl'
+
+
+def island_dir(checkpoint_root, island) -> str:
+    return os.path.join(checkpoint_root, f'island-{island}')
+
+
+class MigrationTransport(ABC):
+    """
+    Carries migrant genomes between islands. Islands never wait for each other: receive returns whatever has arrived
+    for an island since its last call, possibly nothing.
+    """
+    @abstractmethod
+    def send(self, source: int, destination: int, genomes: list):
+        pass
+
+    @abstractmethod
+    def receive(self, destination: int) -> list:
+        pass
+
+    def close(self):
+        pass
+
+
+class QueueTransport(MigrationTransport):
+    """One multiprocessing queue per island, for islands started as processes of the same parent."""
+    def __init__(self, num_islands):
+        self._queues = [multiprocessing.Queue() for _ in range(num_islands)]
+
+    def send(self, source, destination, genomes):
+        self._queues[destination].put(genomes)
+
+    def receive(self, destination):
+        migrants = []
+        while True:
+            try:
+                migrants.extend(self._queues[destination].get_nowait())
+            except queue.Empty:
+                return migrants
+
+
+class FileTransport(MigrationTransport):
+    """
+    A directory per island under a shared directory, which can be on a network file system for islands on different
+    nodes. Each batch of migrants is one file, written under a temporary name and renamed into place, and deleted by
+    the island that receives it.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._sequence = itertools.count()
+
+    def send(self, source, destination, genomes):
+        mailbox = os.path.join(self.directory, f'island-{destination}')
+        os.makedirs(mailbox, exist_ok=True)
+        name = f'{time.time_ns()}-{source}-{os.getpid()}-{next(self._sequence)}.pkl'
+        temporary_path = os.path.join(mailbox, f'.{name}.tmp')
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(genomes, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, os.path.join(mailbox, name))
+
+    def receive(self, destination):
+        mailbox = os.path.join(self.directory, f'island-{destination}')
+        if not os.path.isdir(mailbox):
+            return []
+        migrants = []
+        for name in sorted(os.listdir(mailbox)):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(mailbox, name)
+            with open(path, 'rb') as file:
+                migrants.extend(pickle.load(file))
+            os.remove(path)
+        return migrants
+
+
+class MigrationHub:
+    """
+    Holds migrants in memory for islands connecting through SocketTransport, on this machine or across nodes. Messages
+    are pickled, so clients are authenticated with authkey and the hub should only listen on a trusted network.
+    """
+    def __init__(self, address, authkey: bytes):
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        self._mailboxes = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._accept_loop()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _accept_loop(self):
+        while self._listener is not None:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError):
+                if self._listener is None:
+                    return
+                continue
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    return
+                if message[0] == 'send':
+                    command, source, destination, genomes = message
+                    with self._lock:
+                        self._mailboxes.setdefault(destination, []).extend(genomes)
+                elif message[0] == 'receive':
+                    command, destination = message
+                    with self._lock:
+                        migrants = self._mailboxes.pop(destination, [])
+                    connection.send(migrants)
+
+
+class SocketTransport(MigrationTransport):
+    """Sends migrants through a MigrationHub. Connects on first use, so it can be created before the islands start."""
+    def __init__(self, address, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._connection = None
+
+    def send(self, source, destination, genomes):
+        self._connect().send(('send', source, destination, genomes))
+
+    def receive(self, destination):
+        connection = self._connect()
+        connection.send(('receive', destination))
+        return connection.recv()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = Client(self.address, authkey=self.authkey)
+        return self._connection
+
+    def __getstate__(self):
+        return {**self.__dict__, '_connection': None}
+
+
+class Migration(BaseReporter):
+    """
+    Moves genomes between islands in a ring. Every interval generations, an island sends copies of its num_migrants
+    fittest genomes to the next island once they are evaluated. At the start of the generation after that, it takes in
+    the migrants that have arrived, fittest first, in place of randomly chosen offspring that have not been evaluated
+    yet, and speciates again.
+
+    Migrants get fresh genome keys from the receiving population, so they never collide with its own genomes. Node keys
+    are not shared between islands, so the node indexer is moved past the migrants' nodes as well.
+    """
+    def __init__(self, transport: MigrationTransport, island: int, num_islands: int, interval: int = 10, num_migrants: int = 2):
+        self.transport = transport
+        self.island = island
+        self.num_islands = num_islands
+        self.interval = interval
+        self.num_migrants = num_migrants
+        self.population = None
+        self.generation = None
+        self.sent = 0
+        self.received = 0
+
+    def attach(self, population):
+        self.population = population
+
+    def start_generation(self, generation):
+        self.generation = generation
+        if self.num_islands < 2 or generation == 0 or generation % self.interval:
+            return
+        migrants = self.transport.receive(self.island)
+        if migrants:
+            self._accept(migrants)
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.num_islands < 2 or (self.generation + 1) % self.interval:
+            return
+        evaluated = [genome for genome in population.values() if genome.fitness is not None]
+        fittest = sorted(evaluated, key=lambda genome: genome.fitness, reverse=True)[:self.num_migrants]
+        self.transport.send(self.island, (self.island + 1) % self.num_islands, fittest)
+        self.sent += len(fittest)
+
+    def _accept(self, migrants):
+        population = self.population
+        offspring = [key for key, genome in population.population.items() if genome.fitness is None]
+        migrants = sorted(migrants, key=lambda genome: genome.fitness or 0, reverse=True)
+        migrants = migrants[:min(self.num_migrants, len(offspring))]
+        if not migrants:
+            return
+
+        genome_config = population.config.genome_config
+        highest = max(key for genome in migrants for key in genome.nodes)
+        if genome_config.node_indexer is None:
+            highest = max(highest, *(key for genome in population.population.values() for key in genome.nodes))
+            genome_config.node_indexer = itertools.count(highest + 1)
+        else:
+            genome_config.node_indexer = itertools.count(max(next(genome_config.node_indexer), highest + 1))
+
+        for replaced, genome in zip(random.sample(offspring, len(migrants)), migrants):
+            del population.population[replaced]
+            population.reproduction.ancestors.pop(replaced, None)
+            genome.key = next(population.reproduction.genome_indexer)
+            genome.fitness = None
+            population.population[genome.key] = genome
+            population.reproduction.ancestors[genome.key] = ()
+        population.species.speciate(population.config, population.population, self.generation)
+
+        self.received += len(migrants)
+        print(f'Island {self.island}: took in {len(migrants)} migrants')
+
+
+def run_island(island, config_dir, n, transport, num_islands, migration_interval=10, num_migrants=2,
+               checkpoint_root=None, settings: TrainingSettings | None = None, **options):
+    """
+    Trains one island with train_ai.run, checkpointing to its own directory and writing its winner there. options
+    override fields of settings, like in train_ai.run.
+    """
+    settings = replace(settings or TrainingSettings(), **options)
+    if checkpoint_root is None:
+        checkpoint_root = os.path.join(config_dir, 'checkpoints')
+    directory = island_dir(checkpoint_root, island)
+    os.makedirs(directory, exist_ok=True)
+    # Islands started from one parent share its random state, so each reseeds neat's random module. Episode seeds are
+    # left alone, so that fitnesses stay comparable between islands.
+    random.seed(None if settings.seed is None else f'{settings.seed}-island-{island}')
+
+    migration = Migration(transport, island, num_islands, interval=migration_interval, num_migrants=num_migrants)
+    try:
+        train_ai.run(
+            config_dir,
+            n,
+            settings,
+            migration=migration,
+            checkpoint_dir=directory,
+            output_path=os.path.join(directory, WINNER_NAME)
+        )
+    finally:
+        transport.close()
+
+
+def merged_leaderboard(checkpoint_root, num_islands, size=10) -> list[dict]:
+    """
+    The fittest genomes over all islands, from each island's winner and the evaluated genomes of its latest checkpoint,
+    fittest first. Every entry holds the genome along with its island, generation (None for winners), key and fitness.
+    """
+    entries = []
+    for island in range(num_islands):
+        directory = island_dir(checkpoint_root, island)
+        seen = set()
+        winner_path = os.path.join(directory, WINNER_NAME)
+        if os.path.exists(winner_path):
+            with open(winner_path, 'rb') as file:
+                winner = pickle.load(file)
+            entries.append(_entry(island, None, winner))
+            seen.add(winner.key)
+
+        checkpoint_name = get_checkpoint_name(directory) if os.path.isdir(directory) else None
+        if checkpoint_name is not None:
+            generation, config, population, species_set, random_state = read_checkpoint(
+                os.path.join(directory, checkpoint_name)
+            )
+            for genome in population.values():
+                if genome.fitness is not None and genome.key not in seen:
+                    genome.sensors = config_sensors(config)
+                    entries.append(_entry(island, generation, genome))
+
+    entries.sort(key=lambda entry: entry['fitness'], reverse=True)
+    return entries[:size]
+
+
+def _entry(island, generation, genome):
+    return {
+        'island': island,
+        'generation': generation,
+        'key': genome.key,
+        'fitness': genome.fitness,
+        'nodes': len(genome.nodes),
+        'connections': sum(1 for cg in genome.connections.values() if cg.enabled),
+        'genome': genome,
+    }
+
+
+def write_leaderboard(path, entries):
+    with open(path, 'w') as file:
+        json.dump([{k: v for k, v in entry.items() if k != 'genome'} for entry in entries], file, indent=2)
+
+
+def run_islands(config_dir, n, num_islands=4, transport=None, migration_interval=10, num_migrants=2,
+                checkpoint_root=None, leaderboard_path='leaderboard.json', leaderboard_size=10,
+                settings: TrainingSettings | None = None, **options):
+    """
+    Trains num_islands populations in parallel processes on this machine, each with its own pool of num_workers
+    evaluation workers, exchanging migrants through transport (a QueueTransport by default). Afterwards the fittest
+    genome of all islands is written to settings.output_path and the merged leaderboard to leaderboard_path. options
+    override fields of settings, like in train_ai.run.
+
+    Islands on other nodes run run_island directly with a FileTransport on a shared directory or a SocketTransport to
+    a common MigrationHub, see main().
+    """
+    if transport is None:
+        transport = QueueTransport(num_islands)
+    settings = replace(settings or TrainingSettings(), **options)
+    output_path = settings.output_path
+    num_workers = settings.num_workers
+    if num_workers is None:
+        num_workers = max((multiprocessing.cpu_count() - 1) // num_islands, 1)
+    if checkpoint_root is None:
+        checkpoint_root = os.path.join(config_dir, 'checkpoints')
+    settings = replace(settings, num_workers=num_workers, draw=False, spectate=None)
+
+    processes = [
+        multiprocessing.Process(
+            target=run_island,
+            args=(island, config_dir, n, transport, num_islands, migration_interval, num_migrants, checkpoint_root),
+            kwargs={'settings': settings},
+            name=f'island-{island}'
+        )
+        for island in range(num_islands)
+    ]
+    for process in processes:
+        process.start()
+    # Ctrl+C reaches every island, which each finish their generation and checkpoint, so the parent waits for them
+    previous_handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+    entries = merged_leaderboard(checkpoint_root, num_islands, size=leaderboard_size)
+    write_leaderboard(leaderboard_path, entries)
+    if entries:
+        with open(output_path, 'wb') as file:
+            pickle.dump(entries[0]['genome'], file)
+
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed:
+        raise RuntimeError(f'Islands failed: {", ".join(failed)}')
+    return entries
+
+
+def _address(text):
+    host, port = text.rsplit(':', 1)
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train several populations that exchange their fittest genomes')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_training_arguments(subparser):
+        subparser.add_argument('--generations', type=int, default=250)
+        subparser.add_argument('--islands', type=int, default=4)
+        subparser.add_argument('--interval', type=int, default=10, help='Generations between migrations')
+        subparser.add_argument('--migrants', type=int, default=2)
+        subparser.add_argument('--workers', type=int, default=None, help='Evaluation workers per island')
+        subparser.add_argument('--episodes', type=int, default=1)
+        subparser.add_argument('--seed', type=int, default=None)
+        subparser.add_argument('--obstacles', type=int, default=100)
+        subparser.add_argument('--checkpoint-freq', type=int, default=10)
+        subparser.add_argument('--checkpoints', default=os.path.join(ROOT, 'checkpoints'))
+        subparser.add_argument('--fresh', action='store_true', help='Ignore existing checkpoints')
+        subparser.add_argument('--transport', choices=('queue', 'files', 'socket'), default='queue')
+        subparser.add_argument('--migration-dir', default=os.path.join(ROOT, 'migration'))
+        subparser.add_argument('--hub', type=_address, default=None, help='host:port of the migration hub')
+        subparser.add_argument('--authkey', default=os.environ.get('SNAKE_HUB_AUTHKEY', ''))
+
+    add_training_arguments(subparsers.add_parser('local', help='Run every island on this machine'))
+    island_parser = subparsers.add_parser('island', help='Run one island, talking to the others over files or a hub')
+    add_training_arguments(island_parser)
+    island_parser.add_argument('--index', type=int, required=True)
+    hub_parser = subparsers.add_parser('hub', help='Serve migrants to islands using the socket transport')
+    hub_parser.add_argument('--hub', type=_address, default=('0.0.0.0', 6000))
+    hub_parser.add_argument('--authkey', default=os.environ.get('SNAKE_HUB_AUTHKEY', ''))
+    leaderboard_parser = subparsers.add_parser('leaderboard', help='Print the merged leaderboard of existing islands')
+    leaderboard_parser.add_argument('--islands', type=int, default=4)
+    leaderboard_parser.add_argument('--checkpoints', default=os.path.join(ROOT, 'checkpoints'))
+    leaderboard_parser.add_argument('--size', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command in ('hub', 'island') and getattr(args, 'transport', 'socket') == 'socket' and not args.authkey:
+        parser.error('--authkey or SNAKE_HUB_AUTHKEY is required to talk to a hub')
+    if args.command == 'hub':
+        hub = MigrationHub(args.hub, authkey=args.authkey.encode())
+        print(f'Migration hub listening on {hub.address}')
+        hub.serve_forever()
+        return
+    if args.command == 'leaderboard':
+        for entry in merged_leaderboard(args.checkpoints, args.islands, size=args.size):
+            print(f"island {entry['island']}  generation {entry['generation']}  key {entry['key']}  "
+                  f"fitness {entry['fitness']:.3f}  nodes {entry['nodes']}  connections {entry['connections']}")
+        return
+
+    hub = None
+    if args.transport == 'queue':
+        if args.command == 'island':
+            parser.error('The queue transport only connects islands started together with the local command')
+        transport = QueueTransport(args.islands)
+    elif args.transport == 'files':
+        transport = FileTransport(args.migration_dir)
+    else:
+        address = args.hub
+        if address is None:
+            if args.command == 'island':
+                parser.error('--hub is required for an island using the socket transport')
+            authkey = os.urandom(16)
+            hub = MigrationHub(('127.0.0.1', 0), authkey=authkey).start()
+            address = hub.address
+        else:
+            authkey = args.authkey.encode()
+        transport = SocketTransport(address, authkey=authkey)
+
+    settings = TrainingSettings(
+        checkpoint_freq=args.checkpoint_freq,
+        continue_from_checkpoint=not args.fresh,
+        num_obstacles=args.obstacles,
+        episodes=args.episodes,
+        seed=args.seed,
+        num_workers=args.workers,
+        draw=False,
+    )
+    try:
+        if args.command == 'local':
+            run_islands(
+                ROOT, args.generations, num_islands=args.islands, transport=transport, migration_interval=args.interval,
+                num_migrants=args.migrants, checkpoint_root=args.checkpoints, settings=settings
+            )
+        else:
+            run_island(
+                args.index, ROOT, args.generations, transport, args.islands, migration_interval=args.interval,
+                num_migrants=args.migrants, checkpoint_root=args.checkpoints, settings=settings
+            )
+    finally:
+        if hub is not None:
+            hub.close()
+
+
+if __name__ == '__main__':
+    main()
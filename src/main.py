@@ -2,11 +2,14 @@ from game import Game
 from game_controllers.controller import Controller
 from game_controllers.player_controller import PlayerController
 from game_controllers.basic_bot_controller import BasicBotController
-from src.game_controllers.nn_controller import NNController
+from game_controllers.nn_controller import NNController
+from recording import Recording, Replayer
+from renderer import Renderer, wall_squares, WHITE, RED
+from nn_archive import load_genome, load_neat_config, load_network, NEAT_CONFIG_PATH
+from sensors import genome_sensors
 
-import pickle
 import os.path
-import neat
+import sys
 import pygame
 from numpy import inf
 
@@ -16,27 +19,24 @@ def get_nn_controller(print_steps=False, path=None):
         best_genome_path = os.path.join(os.path.dirname(__file__), os.path.pardir, 'best_nn.pkl')
     else:
         best_genome_path = os.path.join(os.path.dirname(__file__), os.path.pardir, path)
-    with open(best_genome_path, 'rb') as file:
-        best_genome = pickle.load(file)
-
-    config_path = os.path.join(os.path.dirname(__file__), os.path.pardir, 'neat_config.txt')
-    config = neat.Config(
-        neat.DefaultGenome,
-        neat.DefaultReproduction,
-        neat.DefaultSpeciesSet,
-        neat.DefaultStagnation,
-        config_path
-    )
 
-    return NNController(best_genome, config, print_steps=print_steps)
+    # Genomes, the config and compiled networks are cached, so playing the same network again loads nothing
+    genome = load_genome(best_genome_path)
+    sensors = genome_sensors(genome)
+    return NNController(
+        genome,
+        load_neat_config(sensors=sensors),
+        print_steps=print_steps,
+        network=load_network(best_genome_path),
+        sensors=sensors
+    )
 
 
-def run_game(controller: Controller, num_obstacles=0):
-    game = Game(controller, num_obstacles=num_obstacles, draw=True, start_len=1, fps=10)
+def run_game(controller: Controller, num_obstacles=0, start_len=1, fps=10, seed=None, recorder=None):
+    game = Game(controller, num_obstacles=num_obstacles, draw=True, start_len=start_len, fps=fps, seed=seed, recorder=recorder)
 
     while game.running:
         game.loop()
-        pygame.display.update()
         if game.fps != inf:
             game.clock.tick(game.fps)
 
@@ -44,10 +44,42 @@ def run_game(controller: Controller, num_obstacles=0):
     pygame.quit()
 
 
-if __name__ == '__main__':
-    # controller = PlayerController()
-    # controller = BasicBotController()
+def _quit_requested():
+    return any(
+        event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q)
+        for event in pygame.event.get()
+    )
+
+
+def replay_game(path, start_step=0, fps=10):
+    replayer = Replayer(Recording.load(path))
+
+    pygame.init()
+    pygame.display.set_caption('Snake Game - replay')
+    window = pygame.display.set_mode((replayer.width, replayer.height))
+    clock = pygame.time.Clock()
+    renderer = Renderer(window, replayer.width, replayer.height, replayer.square_size, replayer.y_top, wall_squares(replayer))
+    renderer.reset(replayer.obstacles)
 
-    controller = get_nn_controller(print_steps=True, path=os.path.join('nn_archive', '3', 'best_nn_500.pkl'))
-    # controller = get_nn_controller(print_steps=True)
-    run_game(controller, num_obstacles=0)
\ No newline at end of file
+    for state in replayer.states(start_step):
+        if _quit_requested():
+            break
+        if state.game_over:
+            renderer.draw_board(state.snake, state.food)
+            renderer.display_text(f'Game over, {state.cause_of_death}!', colour=RED, location='middle')
+        else:
+            renderer.update_board(state.snake, state.food)
+        renderer.draw_hud(f'Step: {state.step}/{len(replayer)}, Score: {state.score}', colour=WHITE)
+        renderer.present()
+        clock.tick(fps)
+    else:
+        while not _quit_requested():
+            clock.tick(fps)
+
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    # Same as cli.py play, see its --help for choosing the controller and genome
+    import cli
+    cli.main(['play', *sys.argv[1:]])
\ No newline at end of file
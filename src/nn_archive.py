@@ -0,0 +1,293 @@
+from compiled_network import CompiledNetwork
+from checkpointer import read_checkpoint
+from game_controllers.nn_controller import NNController
+from sensors import configure_inputs, config_sensors, genome_sensors
+
+from collections import OrderedDict
+import argparse
+import copy
+import json
+import os
+import os.path
+import pickle
+import re
+
+import neat
+
+
+ROOT = os.path.join(os.path.dirname(__file__), os.path.pardir)
+NN_ARCHIVE_PATH = os.path.join(ROOT, 'nn_archive')
+NEAT_CONFIG_PATH = os.path.join(ROOT, 'neat_config.txt')
+INDEX_NAME = 'index.json'
+
+_GENOME_NAME = re.compile(r'^best_nn_(\d+)\.pkl$')
+_CHECKPOINT_NAME = re.compile(r'^neat-checkpoint-(\d+)$')
+
+
+class _MtimeCache:
+    """Values computed from a file, cached until the file's modification time or size changes, at most max_size."""
+    def __init__(self, max_size=64):
+        self._max_size = max_size
+        self._values = OrderedDict()
+
+    def get(self, path, compute, *key):
+        stat = os.stat(path)
+        full_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, *key)
+        if full_key in self._values:
+            self._values.move_to_end(full_key)
+            return self._values[full_key]
+
+        value = self._values[full_key] = compute()
+        if len(self._values) > self._max_size:
+            self._values.popitem(last=False)
+        return value
+
+
+_configs = _MtimeCache()
+_genomes = _MtimeCache()
+_networks = _MtimeCache()
+
+
+def load_neat_config(path=NEAT_CONFIG_PATH, sensors=None) -> neat.Config:
+    """
+    The neat config at path. Cached configs are shared by every caller, so never change one: pass sensors instead to
+    get a copy with its inputs configured for them, which is cached as well.
+    """
+    if sensors is None:
+        return _configs.get(path, lambda: neat.Config(
+            neat.DefaultGenome,
+            neat.DefaultReproduction,
+            neat.DefaultSpeciesSet,
+            neat.DefaultStagnation,
+            path
+        ))
+
+    def configure():
+        config = copy.deepcopy(load_neat_config(path))
+        configure_inputs(config, sensors)
+        return config
+    return _configs.get(path, configure, tuple(sensors))
+
+
+def load_genome(path):
+    def load():
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    return _genomes.get(path, load)
+
+
+def load_network(path, config_path=NEAT_CONFIG_PATH) -> CompiledNetwork:
+    """The compiled network of the genome at path, with the inputs of the sensors it was trained with."""
+    def compile_network():
+        genome = load_genome(path)
+        return CompiledNetwork.create(genome, load_neat_config(config_path, genome_sensors(genome)))
+    return _networks.get(path, compile_network, *_config_key(config_path))
+
+
+def _config_key(config_path):
+    # Compiled networks depend on the activation settings in the config, so they are also cached on its version
+    stat = os.stat(config_path)
+    return os.path.abspath(config_path), stat.st_mtime_ns
+
+
+def _best_genome(population):
+    evaluated = [genome for genome in population.values() if genome.fitness is not None]
+    return max(evaluated, key=lambda genome: genome.fitness) if evaluated else None
+
+
+def _best_checkpoint_genome(path):
+    # Checkpoints record the sensors on their config, so the genome carries them like a saved one does
+    generation, config, population, species_set, random_state = read_checkpoint(path)
+    genome = _best_genome(population)
+    if genome is not None:
+        genome.sensors = config_sensors(config)
+    return genome
+
+
+def _topology(genome):
+    if genome is None:
+        return None, None
+    return len(genome.nodes), sum(1 for cg in genome.connections.values() if cg.enabled)
+
+
+class ArchiveEntry:
+    """
+    One saved network or checkpoint in the archive. For a checkpoint, fitness and topology are those of its fittest
+    evaluated genome, which is what genome() loads. sensors are the network inputs it was trained with.
+    """
+    def __init__(self, archive, path, run, kind, generation, fitness, nodes, connections, sensors):
+        self._archive = archive
+        self.path = path
+        self.run = run
+        self.kind = kind
+        self.generation = generation
+        self.fitness = fitness
+        self.nodes = nodes
+        self.connections = connections
+        self.sensors = tuple(sensors)
+
+    def genome(self):
+        return self._archive.genome(self)
+
+    def network(self) -> CompiledNetwork:
+        return self._archive.network(self)
+
+    def controller(self, **kwargs) -> NNController:
+        return NNController(
+            self.genome(), self._archive.config_for(self), network=self.network(), sensors=self.sensors, **kwargs
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'run': self.run,
+            'kind': self.kind,
+            'generation': self.generation,
+            'fitness': self.fitness,
+            'nodes': self.nodes,
+            'connections': self.connections,
+            'sensors': list(self.sensors),
+        }
+
+    def __repr__(self):
+        return f'ArchiveEntry({self.path!r}, generation={self.generation}, fitness={self.fitness}, nodes={self.nodes}, connections={self.connections})'
+
+
+class NNArchive:
+    """
+    Index over the nn_archive/<run>/ layout of saved best_nn_<generation>.pkl networks and neat-checkpoint-<generation>
+    checkpoints. The generation, fitness and topology size of every file are kept in index.json at the archive root,
+    so listing and picking networks never unpickles anything. Refreshing only stats the files, and reads just the
+    ones that are new or changed since they were indexed. Genomes and compiled networks are loaded on first use and
+    cached until their file changes.
+    """
+    def __init__(self, path=NN_ARCHIVE_PATH, config_path=NEAT_CONFIG_PATH, refresh=True):
+        self.path = path
+        self.config_path = config_path
+        self._entries = {}
+        self._stats = {}
+        self._load_index()
+        if refresh:
+            self.refresh()
+
+    @property
+    def config(self) -> neat.Config:
+        return load_neat_config(self.config_path)
+
+    def config_for(self, entry: ArchiveEntry) -> neat.Config:
+        """The config with the inputs of the sensors entry was trained with."""
+        return load_neat_config(self.config_path, entry.sensors)
+
+    def refresh(self):
+        found = {}
+        for run in sorted(os.listdir(self.path)):
+            run_path = os.path.join(self.path, run)
+            if not os.path.isdir(run_path):
+                continue
+            for name in os.listdir(run_path):
+                if _GENOME_NAME.match(name) or _CHECKPOINT_NAME.match(name):
+                    relative_path = f'{run}/{name}'
+                    stat = os.stat(os.path.join(run_path, name))
+                    found[relative_path] = [stat.st_mtime_ns, stat.st_size]
+
+        changed = found.keys() != self._entries.keys()
+        for relative_path in list(self._entries):
+            if relative_path not in found:
+                del self._entries[relative_path]
+                del self._stats[relative_path]
+        for relative_path, stat in found.items():
+            if self._stats.get(relative_path) != stat:
+                self._entries[relative_path] = self._index_file(relative_path)
+                self._stats[relative_path] = stat
+                changed = True
+
+        if changed:
+            self._save_index()
+
+    def entries(self, run=None, kind=None) -> list[ArchiveEntry]:
+        entries = [
+            entry for entry in self._entries.values()
+            if (run is None or entry.run == str(run)) and (kind is None or entry.kind == kind)
+        ]
+        return sorted(entries, key=lambda entry: (entry.run, entry.kind, entry.generation))
+
+    def best(self, run=None, kind=None) -> ArchiveEntry | None:
+        entries = [entry for entry in self.entries(run=run, kind=kind) if entry.fitness is not None]
+        return max(entries, key=lambda entry: entry.fitness) if entries else None
+
+    def genome(self, entry: ArchiveEntry):
+        path = self._full_path(entry)
+        if entry.kind == 'genome':
+            return load_genome(path)
+        return _genomes.get(path, lambda: _best_checkpoint_genome(path))
+
+    def network(self, entry: ArchiveEntry) -> CompiledNetwork:
+        path = self._full_path(entry)
+        return _networks.get(
+            path, lambda: CompiledNetwork.create(self.genome(entry), self.config_for(entry)), *_config_key(self.config_path)
+        )
+
+    def _index_file(self, relative_path) -> ArchiveEntry:
+        run, name = relative_path.split('/')
+        full_path = os.path.join(self.path, run, name)
+        match = _GENOME_NAME.match(name)
+        if match:
+            kind = 'genome'
+            genome = load_genome(full_path)
+        else:
+            match = _CHECKPOINT_NAME.match(name)
+            kind = 'checkpoint'
+            genome = _best_checkpoint_genome(full_path)
+
+        nodes, connections = _topology(genome)
+        return ArchiveEntry(
+            self, relative_path, run, kind, int(match.group(1)), genome.fitness if genome is not None else None,
+            nodes, connections, genome_sensors(genome)
+        )
+
+    def _full_path(self, entry: ArchiveEntry) -> str:
+        return os.path.join(self.path, *entry.path.split('/'))
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.path, INDEX_NAME)) as file:
+                index = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        for relative_path, item in index.items():
+            # Entries indexed before sensors were recorded are indexed again on refresh
+            if 'sensors' not in item:
+                continue
+            self._stats[relative_path] = item.pop('stat')
+            self._entries[relative_path] = ArchiveEntry(self, relative_path, **item)
+
+    def _save_index(self):
+        index = {
+            relative_path: {**entry.to_dict(), 'stat': self._stats[relative_path]}
+            for relative_path, entry in sorted(self._entries.items())
+        }
+        temporary_path = os.path.join(self.path, f'.{INDEX_NAME}.tmp')
+        with open(temporary_path, 'w') as file:
+            json.dump(index, file, indent=1)
+        os.replace(temporary_path, os.path.join(self.path, INDEX_NAME))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List the networks and checkpoints saved in nn_archive')
+    parser.add_argument('--path', default=NN_ARCHIVE_PATH)
+    parser.add_argument('--run', default=None, help='Only list this run')
+    parser.add_argument('--kind', choices=('genome', 'checkpoint'), default=None)
+    parser.add_argument('--best', action='store_true', help='Only show the fittest entry')
+    args = parser.parse_args()
+
+    archive = NNArchive(args.path)
+    entries = [archive.best(run=args.run, kind=args.kind)] if args.best else archive.entries(run=args.run, kind=args.kind)
+    for entry in entries:
+        if entry is None:
+            continue
+        fitness = f'{entry.fitness:.3f}' if entry.fitness is not None else '-'
+        print(f'{entry.path:<32} generation {entry.generation:>5}  fitness {fitness:>9}  nodes {entry.nodes}  connections {entry.connections}  sensors {" ".join(entry.sensors)}')
+
+
+if __name__ == '__main__':
+    main()
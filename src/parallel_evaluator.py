@@ -0,0 +1,164 @@
+from utils import get_game_config_state, init_game_config, set_game_config_overrides
+import episode_store
+import profiling
+
+import heapq
+import math
+import multiprocessing
+import signal
+import time
+
+from neat.reporting import BaseReporter
+
+
+# Set once in each worker by the pool initializer, so the config and evaluation function are never re-sent
+_worker_config = None
+_worker_eval_function = None
+
+
+def _init_worker(game_config_state, config, eval_function, profile, log_episodes):
+    global _worker_config, _worker_eval_function
+    # Ctrl+C reaches the whole process group, and the main process finishes the generation before stopping
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_game_config(game_config_state)
+    _worker_config = config
+    _worker_eval_function = eval_function
+    if profile:
+        profiling.enable()
+    if log_episodes:
+        episode_store.enable()
+
+
+def _evaluate_chunk(chunk, kwargs, game_config_overrides=None):
+    if game_config_overrides is not None:
+        set_game_config_overrides(**game_config_overrides)
+    start = time.perf_counter()
+    fitnesses = [_worker_eval_function(genome, _worker_config, **kwargs) for genome in chunk]
+    elapsed = time.perf_counter() - start
+
+    # Each chunk ships back only what it profiled itself
+    profile = None
+    if profiling.active:
+        profile = profiling.active.snapshot()
+        profiling.active.reset()
+    episodes = episode_store.active.take() if episode_store.active else None
+    return fitnesses, elapsed, profile, episodes
+
+
+def genome_size(genome):
+    return len(genome.nodes) + sum(1 for cg in genome.connections.values() if cg.enabled)
+
+
+def balanced_chunks(genomes, num_chunks, cost=genome_size):
+    """
+    Splits genomes into at most num_chunks lists of roughly equal total cost, assigning the most expensive genomes
+    first to whichever chunk is currently cheapest. Returns lists of indices into genomes.
+    """
+    num_chunks = max(1, min(num_chunks, len(genomes)))
+    heap = [(0, i) for i in range(num_chunks)]
+    chunks = [[] for _ in range(num_chunks)]
+    for index in sorted(range(len(genomes)), key=lambda i: cost(genomes[i]), reverse=True):
+        total, i = heapq.heappop(heap)
+        chunks[i].append(index)
+        heapq.heappush(heap, (total + cost(genomes[index]), i))
+    return [chunk for chunk in chunks if chunk]
+
+
+class ChunkedParallelEvaluator(BaseReporter):
+    """
+    Evaluates genomes on a pool of workers that lives for the whole run. The neat config, game config and
+    evaluation function are sent once when the workers start, and each generation's genomes are shipped in
+    size-balanced chunks, with only the fitnesses and timings sent back. Chunks carry what changes between
+    generations: the episode seeds and threshold of schedule, and the stage settings of curriculum.
+
+    Also a reporter: when added to the population it prints how each generation's evaluation time splits between
+    compute in the workers and dispatch overhead (pickling, IPC and load imbalance).
+    """
+    def __init__(self, num_workers, eval_function, config, chunk_size=None, chunks_per_worker=4, timeout=None, schedule=None, curriculum=None):
+        self.num_workers = num_workers
+        self.eval_function = eval_function
+        self.chunk_size = chunk_size
+        self.chunks_per_worker = chunks_per_worker
+        self.timeout = timeout
+        self.schedule = schedule
+        self.curriculum = curriculum
+        self.last_stats = None
+        self.history = []
+        self.pool = None
+        self.pool = multiprocessing.Pool(
+            num_workers,
+            initializer=_init_worker,
+            initargs=(get_game_config_state(), config, eval_function, profiling.is_enabled(), episode_store.is_enabled())
+        )
+
+    def evaluate(self, genomes, config):
+        start = time.perf_counter()
+
+        genome_list = [genome for ignored_genome_id, genome in genomes]
+        if self.chunk_size is not None:
+            num_chunks = math.ceil(len(genome_list) / self.chunk_size)
+        else:
+            num_chunks = self.num_workers * self.chunks_per_worker
+        chunks = balanced_chunks(genome_list, num_chunks)
+
+        kwargs = {} if self.schedule is None else {'seeds': self.schedule.seeds, 'threshold': self.schedule.threshold}
+        game_config_overrides = None
+        if self.curriculum is not None:
+            kwargs.update(self.curriculum.eval_kwargs())
+            game_config_overrides = self.curriculum.game_config_overrides()
+        jobs = [
+            self.pool.apply_async(_evaluate_chunk, ([genome_list[i] for i in chunk], kwargs, game_config_overrides))
+            for chunk in chunks
+        ]
+
+        compute_time = 0
+        for job, chunk in zip(jobs, chunks):
+            fitnesses, chunk_time, profile, episodes = job.get(timeout=self.timeout)
+            compute_time += chunk_time
+            if profile is not None and profiling.active:
+                profiling.active.merge(profile)
+            if episodes is not None and episode_store.active:
+                episode_store.active.extend(episodes)
+            for i, fitness in zip(chunk, fitnesses):
+                genome_list[i].fitness = fitness
+
+        wall_time = time.perf_counter() - start
+        ideal_time = compute_time / min(self.num_workers, max(len(chunks), 1))
+        self.last_stats = {
+            'genomes': len(genome_list),
+            'chunks': len(chunks),
+            'wall_time': wall_time,
+            'compute_time': compute_time,
+            'dispatch_overhead': max(wall_time - ideal_time, 0),
+        }
+        self.history.append(self.last_stats)
+        if profiling.active:
+            profiling.active.add('dispatch', self.last_stats['dispatch_overhead'])
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.last_stats is not None:
+            stats = self.last_stats
+            share = stats['dispatch_overhead'] / stats['wall_time'] if stats['wall_time'] else 0
+            print(
+                f"Evaluation: {stats['wall_time']:.3f} sec wall, {stats['compute_time']:.3f} sec compute over "
+                f"{stats['chunks']} chunks, dispatch overhead {stats['dispatch_overhead']:.3f} sec ({share:.1%})"
+            )
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        # Joining can hang during garbage collection or interpreter shutdown, close() is left to the context manager
+        pool = getattr(self, 'pool', None)
+        if pool is not None:
+            pool.terminate()
+            self.pool = None
@@ -0,0 +1,129 @@
+from collections import defaultdict
+import json
+import time
+
+from neat.reporting import BaseReporter
+
+
+class Profiler:
+    """Accumulates time spent in named phases, and plain event counters."""
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    def add(self, phase: str, seconds: float):
+        self.times[phase] += seconds
+        self.calls[phase] += 1
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def snapshot(self) -> dict:
+        return {'times': dict(self.times), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def merge(self, snapshot: dict):
+        for phase, seconds in snapshot['times'].items():
+            self.times[phase] += seconds
+        for phase, calls in snapshot['calls'].items():
+            self.calls[phase] += calls
+        for name, n in snapshot['counters'].items():
+            self.counters[name] += n
+
+    def reset(self):
+        self.times.clear()
+        self.calls.clear()
+        self.counters.clear()
+
+
+# The profiler that instrumented code reports to, or None when profiling is disabled. Call sites check it directly,
+# so that disabled profiling costs a single attribute lookup:
+#     profiler = profiling.active
+#     start = time.perf_counter() if profiler else 0
+#     ...
+#     if profiler: profiler.add('phase', time.perf_counter() - start)
+active = None
+
+
+def enable() -> Profiler:
+    global active
+    if active is None:
+        active = Profiler()
+    return active
+
+
+def disable():
+    global active
+    active = None
+
+
+def is_enabled() -> bool:
+    return active is not None
+
+
+class ProfilingReporter(BaseReporter):
+    """
+    Enables profiling and reports each generation's breakdown: game setup, controller sensing, NN activation,
+    collision checks, food generation, dispatch overhead of parallel evaluation, and NEAT reproduction plus
+    speciation, with speciation also shown on its own when VectorizedSpeciesSet is used. Prints the breakdown, and
+    appends it as one JSON line per generation to dump_path if given. Enabled on creation, so that workers started
+    afterwards profile too, and disabled again by close() or at the end of a with block.
+    """
+    def __init__(self, show=True, dump_path=None):
+        self.profiler = enable()
+        self.show = show
+        self.dump_path = dump_path
+        self.generation = None
+        self.generation_start = None
+        self.evaluation_end = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.generation_start = time.perf_counter()
+        self.profiler.reset()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.evaluation_end = time.perf_counter()
+        self.profiler.add('evaluation', self.evaluation_end - self.generation_start)
+
+    def end_generation(self, config, population, species_set):
+        now = time.perf_counter()
+        if self.evaluation_end is not None:
+            self.profiler.add('reproduction', now - self.evaluation_end)
+
+        breakdown = self.breakdown(now - self.generation_start)
+        if self.show:
+            self._print(breakdown)
+        if self.dump_path is not None:
+            with open(self.dump_path, 'a') as file:
+                file.write(json.dumps(breakdown) + '\n')
+
+    def close(self):
+        disable()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def breakdown(self, wall_time: float) -> dict:
+        snapshot = self.profiler.snapshot()
+        times = snapshot['times']
+        # The controller phase includes the NN activation inside it, so sensing is the remainder
+        if 'controller' in times:
+            times['sensing'] = times['controller'] - times.get('nn_activation', 0)
+        return {'generation': self.generation, 'wall_time': wall_time, **snapshot}
+
+    def _print(self, breakdown: dict):
+        wall_time = breakdown['wall_time']
+        print(f"Profile of generation {breakdown['generation']}, {wall_time:.3f} sec:")
+        for phase in ('evaluation', 'setup', 'genome_setup', 'sensing', 'nn_activation', 'collision', 'food', 'dispatch', 'reproduction', 'speciation'):
+            if phase not in breakdown['times']:
+                continue
+            seconds = breakdown['times'][phase]
+            calls = breakdown['calls'].get(phase)
+            per_call = f', {seconds / calls * 1e6:.2f} us/call over {calls} calls' if calls else ''
+            print(f'    {phase:<14} {seconds:8.3f} sec ({seconds / wall_time:6.1%}){per_call}')
+        if breakdown['counters']:
+            print('    counters: ' + ', '.join(f'{name}={n}' for name, n in sorted(breakdown['counters'].items())))
@@ -0,0 +1,421 @@
+from snake import Snake
+from batch_game import CAUSES_OF_DEATH, ALIVE, WALL, OBSTACLE, BODY, ALL_OCCUPIED
+from directions import DIRECTIONS, DIRECTION_CODES
+
+import struct
+
+import numpy as np
+
+
+# Each move is stored in 2 bits, relative to the direction the snake was heading. A controller can report a direction
+# change while carrying on straight (PlayerController does when the arrow for the current direction is pressed), and
+# that still counts towards the moves, so going forward has two codes. Turns always count as a direction change.
+FORWARD, FORWARD_CHANGED, TURN_RIGHT, TURN_LEFT = range(4)
+_TURNS = {FORWARD: 0, FORWARD_CHANGED: 0, TURN_RIGHT: 1, TURN_LEFT: 3}
+
+MAGIC = b'SNKR'
+VERSION = 1
+NO_CELL = 0xFFFF
+NO_DIRECTION = 0xFF
+
+_HEADER = struct.Struct('<4sBHHHHBQHIBBIII')
+_KEYFRAME = struct.Struct('<BHIIIHIIH')
+
+
+def _check_board(width, height, square_size):
+    # Cells are stored as uint16 indices, with NO_CELL kept free to mark a missing cell
+    cells = (width // square_size) * (height // square_size)
+    if cells >= NO_CELL:
+        raise ValueError(f'Cannot record a board of {cells} cells, recordings hold at most {NO_CELL - 1}')
+
+
+def _check_seed(seed):
+    # Stored as an unsigned 64-bit integer, which covers the seeds episodes are played with
+    if seed is not None and not 0 <= seed < 2 ** 64:
+        raise ValueError(f'Cannot record seed {seed}, recordings hold seeds from 0 to 2**64 - 1')
+
+
+def _pack_codes(codes) -> bytes:
+    codes = np.frombuffer(bytes(codes), dtype=np.uint8)
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    padded = padded.reshape(-1, 4)
+    return (padded[:, 0] | padded[:, 1] << 2 | padded[:, 2] << 4 | padded[:, 3] << 6).astype(np.uint8).tobytes()
+
+
+def _unpack_codes(data: bytes, n: int) -> np.ndarray:
+    packed = np.frombuffer(data, dtype=np.uint8)
+    codes = np.stack([packed & 3, packed >> 2 & 3, packed >> 4 & 3, packed >> 6 & 3], axis=1)
+    return codes.ravel()[:n]
+
+
+class Recording:
+    """
+    A recorded episode: the board config, seed and obstacles, every food position in the order it appeared, and
+    the moves at 2 bits each. Keyframes of the full game state every keyframe_interval moves let a Replayer seek to
+    any step while replaying at most keyframe_interval moves.
+
+    The binary format is a fixed header, followed by the obstacle and food cells as uint16 cell indices, the packed
+    moves, and a table of keyframe offsets followed by the keyframes themselves. A keyframe stores the counters plus
+    the snake as its tail cell and a 2 bit direction per segment. The uint16 cells limit recordings to boards of less
+    than 65535 cells, larger boards raise a ValueError instead of being recorded.
+    """
+    def __init__(self, width, height, square_size, start_len, seed, obstacles, foods, moves, num_moves, first_direction, cause_of_death, keyframe_interval, keyframes):
+        self.width = width
+        self.height = height
+        self.square_size = square_size
+        self.start_len = start_len
+        self.seed = seed
+        self.obstacles = obstacles
+        self.foods = foods
+        self.moves = moves
+        self.num_moves = num_moves
+        self.first_direction = first_direction
+        self.cause_of_death = cause_of_death
+        self.keyframe_interval = keyframe_interval
+        self.keyframes = keyframes
+
+    def to_bytes(self) -> bytes:
+        _check_board(self.width, self.height, self.square_size)
+        _check_seed(self.seed)
+        keyframes = [self._encode_keyframe(keyframe) for keyframe in self.keyframes]
+        offsets = np.cumsum([0] + [len(keyframe) for keyframe in keyframes[:-1]], dtype=np.uint32)
+
+        return b''.join([
+            _HEADER.pack(
+                MAGIC,
+                VERSION,
+                self.width,
+                self.height,
+                self.square_size,
+                self.start_len,
+                self.seed is not None,
+                self.seed or 0,
+                self.keyframe_interval,
+                self.num_moves,
+                self.first_direction,
+                CAUSES_OF_DEATH.index(self.cause_of_death),
+                len(self.obstacles),
+                len(self.foods),
+                len(keyframes)
+            ),
+            np.array([self._cell(point) for point in self.obstacles], dtype='<u2').tobytes(),
+            np.array([self._cell(point) for point in self.foods], dtype='<u2').tobytes(),
+            _pack_codes(self.moves),
+            offsets.astype('<u4').tobytes(),
+            *keyframes
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Recording':
+        (
+            magic, version, width, height, square_size, start_len, has_seed, seed, keyframe_interval, num_moves,
+            first_direction, cause, num_obstacles, num_foods, num_keyframes
+        ) = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('Not a snake episode recording')
+        if version != VERSION:
+            raise ValueError(f'Unsupported recording version {version}, expected {VERSION}')
+
+        recording = cls(
+            width, height, square_size, start_len, seed if has_seed else None, [], [], b'', num_moves,
+            first_direction, CAUSES_OF_DEATH[cause], keyframe_interval, []
+        )
+
+        offset = _HEADER.size
+        cells = np.frombuffer(data, dtype='<u2', count=num_obstacles + num_foods, offset=offset)
+        recording.obstacles = [recording._point(cell) for cell in cells[:num_obstacles]]
+        recording.foods = [recording._point(cell) for cell in cells[num_obstacles:]]
+        offset += 2 * (num_obstacles + num_foods)
+
+        moves_size = -(-num_moves // 4)
+        recording.moves = _unpack_codes(data[offset:offset + moves_size], num_moves).tobytes()
+        offset += moves_size
+
+        offsets = np.frombuffer(data, dtype='<u4', count=num_keyframes, offset=offset)
+        offset += 4 * num_keyframes
+        recording.keyframes = [recording._decode_keyframe(data, offset + int(o)) for o in offsets]
+        return recording
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path) -> 'Recording':
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+    def _cell(self, point) -> int:
+        if point is None:
+            return NO_CELL
+        return point[0] // self.square_size * (self.height // self.square_size) + point[1] // self.square_size
+
+    def _point(self, cell):
+        if cell == NO_CELL:
+            return None
+        n_y = self.height // self.square_size
+        return int(cell) // n_y * self.square_size, int(cell) % n_y * self.square_size
+
+    def _encode_keyframe(self, keyframe) -> bytes:
+        blocks = keyframe['blocks']
+        chain = [
+            DIRECTION_CODES[((b[0] - a[0]) // self.square_size, (b[1] - a[1]) // self.square_size)]
+            for a, b in zip(blocks, blocks[1:])
+        ]
+        return _KEYFRAME.pack(
+            keyframe['direction'],
+            self._cell(keyframe['food']),
+            keyframe['score'],
+            keyframe['moves'],
+            keyframe['moves_since_last_score'],
+            keyframe['remaining_blocks'],
+            keyframe['food_index'],
+            len(blocks),
+            self._cell(blocks[0])
+        ) + _pack_codes(chain)
+
+    def _decode_keyframe(self, data: bytes, offset: int) -> dict:
+        direction, food, score, moves, since, remaining, food_index, length, tail = _KEYFRAME.unpack_from(data, offset)
+        offset += _KEYFRAME.size
+        chain = _unpack_codes(data[offset:offset + -(-(length - 1) // 4)], length - 1)
+
+        blocks = [self._point(tail)]
+        for code in chain:
+            dx, dy = DIRECTIONS[code]
+            blocks.append((blocks[-1][0] + dx * self.square_size, blocks[-1][1] + dy * self.square_size))
+
+        return {
+            'direction': direction,
+            'food': self._point(food),
+            'score': score,
+            'moves': moves,
+            'moves_since_last_score': since,
+            'remaining_blocks': remaining,
+            'food_index': food_index,
+            'blocks': blocks,
+        }
+
+
+class EpisodeRecorder:
+    """
+    Records a GameCore or Game episode when passed to it as recorder. The game reports each move and each new food
+    position, and the recorder keeps a keyframe every keyframe_interval moves. Restarting the game starts a new
+    recording.
+    """
+    def __init__(self, keyframe_interval=256):
+        self.keyframe_interval = keyframe_interval
+        self._game = None
+        self._seed = None
+        self._obstacles = None
+        self._foods = None
+        self._moves = None
+        self._first_direction = None
+        self._keyframes = None
+
+    def start(self, game, seed):
+        _check_board(game.width, game.height, game.square_size)
+        _check_seed(seed)
+        self._game = game
+        self._seed = seed
+        self._obstacles = sorted(game.obstacles)
+        self._foods = []
+        self._moves = bytearray()
+        self._first_direction = None
+        self._keyframes = [self._keyframe()]
+
+    def food(self, food):
+        self._foods.append(food)
+
+    def move(self, dx: int, dy: int, changed_direction: bool):
+        # Called before the game applies the move, so a keyframe holds the state after the moves recorded so far
+        if self._moves and len(self._moves) % self.keyframe_interval == 0:
+            self._keyframes.append(self._keyframe())
+
+        game = self._game
+        direction = DIRECTION_CODES[(dx, dy)]
+        if self._first_direction is None:
+            self._first_direction = direction
+            heading = direction
+        else:
+            heading = DIRECTION_CODES[(game.dx, game.dy)]
+
+        turn = (direction - heading) % 4
+        if turn == 0:
+            self._moves.append(FORWARD_CHANGED if changed_direction else FORWARD)
+        elif turn == 2:
+            raise ValueError(f'Cannot record a reverse move: dx={dx}, dy={dy}, while heading dx={game.dx}, dy={game.dy}')
+        elif not changed_direction:
+            raise ValueError('Cannot record a turn that does not count as a change of direction')
+        else:
+            self._moves.append(TURN_RIGHT if turn == 1 else TURN_LEFT)
+
+    def recording(self) -> Recording:
+        game = self._game
+        return Recording(
+            width=game.width,
+            height=game.height,
+            square_size=game.square_size,
+            start_len=game.start_len,
+            seed=self._seed,
+            obstacles=self._obstacles,
+            foods=list(self._foods),
+            moves=bytes(self._moves),
+            num_moves=len(self._moves),
+            first_direction=self._first_direction if self._first_direction is not None else 0,
+            cause_of_death=game.cause_of_death,
+            keyframe_interval=self.keyframe_interval,
+            keyframes=list(self._keyframes)
+        )
+
+    def _keyframe(self) -> dict:
+        game = self._game
+        return {
+            'direction': DIRECTION_CODES.get((game.dx, game.dy), NO_DIRECTION),
+            'food': game.food,
+            'score': game.score,
+            'moves': game.moves,
+            'moves_since_last_score': game.moves_since_last_score,
+            'remaining_blocks': game.remaining_blocks,
+            'food_index': len(self._foods),
+            'blocks': list(game.snake.blocks),
+        }
+
+
+class ReplayState:
+    """The game state after some number of moves of a replayed episode, with the attributes Renderer draws from."""
+    def __init__(self, step, snake, direction, food, score, moves, moves_since_last_score, remaining_blocks, food_index):
+        self.step = step
+        self.snake = snake
+        self.direction = direction
+        self.food = food
+        self.score = score
+        self.moves = moves
+        self.moves_since_last_score = moves_since_last_score
+        self.remaining_blocks = remaining_blocks
+        self.food_index = food_index
+        self.game_over = False
+        self.cause_of_death = CAUSES_OF_DEATH[ALIVE]
+
+
+class Replayer:
+    """
+    Reconstructs the game state at any step of a Recording from the moves and food positions alone, without the
+    controller or the random number generator. state_at seeks from the nearest earlier keyframe.
+    """
+    def __init__(self, recording: Recording):
+        self.recording = recording
+        self._obstacles = set(recording.obstacles)
+        self._codes = np.frombuffer(recording.moves, dtype=np.uint8)
+
+        square_size = recording.square_size
+        self.x_left = 0
+        self.x_right = recording.width - square_size
+        self.y_top = 2 * square_size
+        self.y_bottom = recording.height - square_size
+
+    def __len__(self):
+        return self.recording.num_moves
+
+    def state_at(self, step: int) -> ReplayState:
+        if not 0 <= step <= len(self):
+            raise IndexError(f'Step {step} out of range for a recording of {len(self)} moves')
+
+        interval = self.recording.keyframe_interval
+        keyframe_index = min(step // interval, len(self.recording.keyframes) - 1)
+        state = self._from_keyframe(keyframe_index)
+        while state.step < step:
+            self._advance(state)
+        return state
+
+    def states(self, start: int = 0):
+        """Yields the state at start and after every following move, updating a single ReplayState in place."""
+        state = self.state_at(start)
+        yield state
+        while state.step < len(self):
+            self._advance(state)
+            yield state
+
+    @property
+    def width(self):
+        return self.recording.width
+
+    @property
+    def height(self):
+        return self.recording.height
+
+    @property
+    def square_size(self):
+        return self.recording.square_size
+
+    @property
+    def obstacles(self):
+        return self._obstacles
+
+    def _from_keyframe(self, index: int) -> ReplayState:
+        keyframe = self.recording.keyframes[index]
+        blocks = keyframe['blocks']
+        snake = Snake(*blocks[0])
+        for block in blocks[1:]:
+            snake.move(block)
+
+        state = ReplayState(
+            step=index * self.recording.keyframe_interval,
+            snake=snake,
+            direction=keyframe['direction'],
+            food=keyframe['food'],
+            score=keyframe['score'],
+            moves=keyframe['moves'],
+            moves_since_last_score=keyframe['moves_since_last_score'],
+            remaining_blocks=keyframe['remaining_blocks'],
+            food_index=keyframe['food_index']
+        )
+        self._finish(state)
+        return state
+
+    def _advance(self, state: ReplayState):
+        # Mirrors GameCore._move
+        code = int(self._codes[state.step])
+        heading = state.direction if state.direction != NO_DIRECTION else self.recording.first_direction
+        state.direction = (heading + _TURNS[code]) % 4
+        changed_direction = code != FORWARD
+        state.moves += changed_direction
+        state.moves_since_last_score += changed_direction
+        state.step += 1
+
+        dx, dy = DIRECTIONS[state.direction]
+        x, y = state.snake.head
+        head = (x + dx * self.square_size, y + dy * self.square_size)
+
+        if head == state.food:
+            state.food = self.recording.foods[state.food_index]
+            state.food_index += 1
+            if state.food is None:
+                self._end(state, ALL_OCCUPIED)
+                return
+            state.score += 1
+            state.moves_since_last_score = 0
+        elif state.remaining_blocks >= 1:
+            state.remaining_blocks -= 1
+        else:
+            state.snake.pop()
+
+        if head[0] in (self.x_left, self.x_right) or head[1] in (self.y_top, self.y_bottom):
+            self._end(state, WALL)
+        elif head in self._obstacles:
+            self._end(state, OBSTACLE)
+        elif head in state.snake:
+            self._end(state, BODY)
+        else:
+            state.snake.move(head)
+            self._finish(state)
+
+    def _finish(self, state: ReplayState):
+        # The game can also end without a move, by going too long without scoring
+        if state.step == len(self) and self.recording.cause_of_death != CAUSES_OF_DEATH[ALIVE]:
+            state.game_over = True
+            state.cause_of_death = self.recording.cause_of_death
+
+    def _end(self, state: ReplayState, cause: int):
+        state.game_over = True
+        state.cause_of_death = CAUSES_OF_DEATH[cause]
@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from typing import Literal, Iterable
+
+import numpy as np
+import pygame
+
+
+BLACK = (0, 0, 0)
+WHITE = np.array([255, 255, 255])
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+BROWN = (140, 70, 20)
+
+
+def _snake_colour(distance_from_head: int) -> tuple[int, int, int]:
+    return tuple(int(c) for c in WHITE * (0.7 * np.exp(-0.1 * distance_from_head) + 0.3))
+
+
+def _snake_colours() -> list[tuple[int, int, int]]:
+    # The gradient fades to a constant colour once the change drops below one colour level, so only the segments
+    # closest to the head ever need redrawing when the snake moves
+    colours = [_snake_colour(0)]
+    while colours[-1] != _snake_colour(10 ** 6):
+        colours.append(_snake_colour(len(colours)))
+    return colours
+
+
+SNAKE_COLOURS = _snake_colours()
+
+
+def wall_squares(game) -> list[tuple[int, int]]:
+    x_edges = list(range(0, game.width, game.square_size))
+    y_edges = list(range(2 * game.square_size, game.height, game.square_size))
+    N_x = len(x_edges)
+    N_y = len(y_edges)
+
+    return list(zip(
+        x_edges + [game.x_right] * N_y + x_edges + [game.x_left] * N_y,
+        [game.y_top] * N_x + y_edges + [game.y_bottom] * N_x + y_edges
+    ))
+
+
+class TextCache:
+    """Rendered text surfaces keyed on (font, size, string, colour), keeping the max_size most recently used."""
+    def __init__(self, font_name='Arial', max_size=256):
+        self._font_name = font_name
+        self._max_size = max_size
+        self._fonts = {}
+        self._surfaces = OrderedDict()
+
+    def font(self, size: int) -> pygame.font.Font:
+        # Looked up once per size, since SysFont scans the system fonts on every call
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.SysFont(self._font_name, size)
+        return font
+
+    def render(self, text: str, size: int, colour) -> pygame.Surface:
+        colour = tuple(int(c) for c in colour)
+        key = (self._font_name, size, text, colour)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+
+        surface = self.font(size).render(text, True, colour)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self._max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def __len__(self):
+        return len(self._surfaces)
+
+
+class Renderer:
+    """Draws the game onto the pygame window, updating only the rectangles that changed on normal frames."""
+    def __init__(self, window: pygame.Surface, width: int, height: int, square_size: int, y_top: int, walls: Iterable[tuple[int, int]], text_cache: TextCache | None = None):
+        self._window = window
+        self._width = width
+        self._height = height
+        self._square_size = square_size
+        self._walls = list(walls)
+        self._hud_rect = pygame.Rect(0, 0, width, y_top)
+        # The score bar is only redrawn when its message changes
+        self._hud_msg = None
+        self._text_cache = text_cache if text_cache is not None else TextCache()
+
+        # Walls and obstacles, baked once per game by reset()
+        self._background = pygame.Surface((width, height))
+        # Rectangles to update on the display, the vacated tail, the food, the head segments whose colour shifts and
+        # the score bar. Frames with text over the board (start, pause and game over screens) flip the whole window.
+        self._dirty = []
+        self._full = True
+        self._valid = False
+        self._tail = None
+        self._food = None
+
+    def reset(self, obstacles: Iterable[tuple[int, int]]):
+        self._background.fill(BLACK)
+        for point in self._walls:
+            self._fill_block(self._background, point, BROWN)
+        for point in obstacles:
+            self._fill_block(self._background, point, BROWN)
+        self._valid = False
+
+    def draw_board(self, snake, food: tuple[int, int] | None):
+        self._window.blit(self._background, (0, 0))
+        if food is not None:
+            self._fill_block(self._window, food, RED)
+
+        colours = SNAKE_COLOURS
+        blocks = snake.blocks
+        for i, point in enumerate(blocks):
+            self._fill_block(self._window, point, colours[min(len(blocks) - 1 - i, len(colours) - 1)])
+
+        self._full = True
+        self._valid = True
+        # A snake that dies at length one has already had its only block popped
+        self._tail = blocks[0] if blocks else None
+        self._food = food
+        # The background blit also covers the score bar
+        self._hud_msg = None
+
+    def update_board(self, snake, food: tuple[int, int] | None):
+        if not self._valid:
+            self.draw_board(snake, food)
+            return
+
+        blocks = snake.blocks
+        if self._tail != blocks[0]:
+            # The old tail cell is still part of the snake if the head has just moved into it
+            if self._tail not in snake:
+                self._restore_block(self._tail)
+            self._tail = blocks[0]
+
+        if food != self._food:
+            if food is not None:
+                self._draw_block(food, RED)
+            self._food = food
+
+        colours = SNAKE_COLOURS
+        for i in range(min(len(blocks), len(colours))):
+            self._draw_block(blocks[-1 - i], colours[i])
+
+    def draw_hud(self, msg: str, colour=WHITE, fontsize=25):
+        hud_msg = (msg, tuple(colour), fontsize)
+        if hud_msg == self._hud_msg:
+            return
+        self._hud_msg = hud_msg
+
+        self._window.fill(BLACK, self._hud_rect)
+        self.display_text(msg, location='top', colour=colour, fontsize=fontsize)
+        self._dirty.append(self._hud_rect)
+
+    def display_text(self, msg: str | Iterable[str], location: Literal['middle', 'top'], colour=WHITE, fontsize=25):
+        if isinstance(msg, str):
+            msg = [msg]
+
+        texts = []
+        max_width = 0
+        max_height = 0
+        total_height = 0
+        for m in msg:
+            m = m.replace('\t', '    ')
+            text = self._text_cache.render(m, fontsize, colour)
+            w, h = text.get_size()
+            max_width = max(max_width, w)
+            max_height = max(max_height, h)
+            total_height += h
+            texts.append(text)
+
+        for i, text in enumerate(texts):
+            if location == 'middle':
+                coords = [self._width // 2 - max_width // 2, self._height // 3 - total_height // 2 + i * max_height]
+            elif location == 'top':
+                coords = [self._width // 2 - max_width // 2, (i + 1) * max_height]
+            else:
+                raise ValueError(f"Invalid value to parameter location, should be 'middle' or 'top', got {location}")
+            self._window.blit(text, dest=coords)
+
+        if location == 'middle':
+            # Text over the board has to be cleared by a full redraw on the next frame
+            self._valid = False
+
+    def present(self):
+        if self._full:
+            pygame.display.flip()
+        elif self._dirty:
+            pygame.display.update(self._dirty)
+        self._dirty = []
+        self._full = False
+
+    def _draw_block(self, point: tuple[int, int], colour):
+        self._dirty.append(self._fill_block(self._window, point, colour))
+
+    def _restore_block(self, point: tuple[int, int]):
+        rect = pygame.Rect(point[0], point[1], self._square_size, self._square_size)
+        self._window.blit(self._background, rect, area=rect)
+        self._dirty.append(rect)
+
+    def _fill_block(self, surface: pygame.Surface, point: tuple[int, int], colour) -> pygame.Rect:
+        return surface.fill(colour, (point[0], point[1], self._square_size, self._square_size))
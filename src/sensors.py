@@ -0,0 +1,194 @@
+from batch_game import NO_ACTION
+from directions import UP, DIRECTIONS, RELATIVE_MOVES
+
+from configparser import ConfigParser
+from typing import Iterable
+
+import numpy as np
+
+
+# Number of network inputs each sensor produces. Everything is measured relative to the direction the snake is
+# heading, with rays in clockwise order starting straight ahead.
+SENSORS = {
+    'adjacent': 3,      # Whether the cell ahead, to the right and to the left is blocked
+    'food_angle': 1,    # Angle to the food relative to the heading, scaled to [-1, 1)
+    'rays': 8,          # 1 / distance to the nearest blocked cell along 8 rays
+    'food_offset': 2,   # Food position ahead and to the right, in squares divided by the larger board side
+    'space': 3,         # Fraction of the free cells reachable after moving ahead, right and left, 0 if blocked
+}
+DEFAULT_SENSORS = ('adjacent', 'food_angle')
+
+# Indexed by arrays of direction codes in the batch sensors
+_DIRECTIONS = np.array(DIRECTIONS)
+
+# (forward, right) components of the 8 rays, clockwise from straight ahead
+_RAYS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+
+
+def num_inputs(sensors: Iterable[str] = DEFAULT_SENSORS) -> int:
+    return sum(SENSORS[name] for name in sensors)
+
+
+def read_sensors(config_path) -> tuple[str, ...]:
+    """Reads the sensor names from the [Sensors] section of a neat config file, which neat itself ignores."""
+    parser = ConfigParser()
+    parser.read(config_path)
+    if not parser.has_option('Sensors', 'sensors'):
+        return DEFAULT_SENSORS
+    return tuple(parser.get('Sensors', 'sensors').split())
+
+
+def configure_inputs(config, sensors: Iterable[str] = DEFAULT_SENSORS):
+    """
+    Sets num_inputs and the input node keys of a neat config to match a sensor set, and keeps the set as
+    config.sensors, so that checkpoints record it.
+    """
+    genome_config = config.genome_config
+    genome_config.num_inputs = num_inputs(sensors)
+    genome_config.input_keys = [-i - 1 for i in range(genome_config.num_inputs)]
+    config.sensors = tuple(sensors)
+
+
+def config_sensors(config) -> tuple[str, ...]:
+    # Configs from before sensors were recorded were always set up for the default ones
+    return getattr(config, 'sensors', DEFAULT_SENSORS)
+
+
+def genome_sensors(genome) -> tuple[str, ...]:
+    """
+    The sensors a saved genome was trained with, recorded on it as genome.sensors when it is written out. Genomes
+    saved before that have none recorded, and were trained on the default sensors.
+    """
+    return tuple(getattr(genome, 'sensors', DEFAULT_SENSORS))
+
+
+def _wrap_and_normalise(angle):
+    return ((angle + np.pi) % (2 * np.pi) - np.pi) / np.pi
+
+
+class SensorSet:
+    """
+    Computes a chosen list of sensors as one input vector, for a GameCore through sense() or for every board of a
+    BatchGame at once through sense_batch(). Blocked cells are the ones missing from the game's free cells, which
+    the game keeps up to date as the head and tail move. Rays march out from the head until they hit a blocked cell,
+    so they cost up to the board's side per ray, with walls bounding every ray. The space sensor reads region sizes
+    from the game's connectivity, which is also kept up to date as the snake moves, but floods the board again
+    whenever the head may have split a region. Every other sensor looks at a few cells around the head.
+    """
+    def __init__(self, sensors: Iterable[str] = DEFAULT_SENSORS):
+        self.names = tuple(sensors)
+        for name in self.names:
+            if name not in SENSORS:
+                raise ValueError(f'Unknown sensor {name}, should be one of {", ".join(SENSORS)}')
+        self.num_inputs = num_inputs(self.names)
+        self._sense = [getattr(self, f'_{name}') for name in self.names]
+        self._sense_batch = [getattr(self, f'_{name}_batch') for name in self.names]
+
+    def sense(self, game) -> list[float]:
+        """The input vector for a game that has started moving."""
+        inputs = []
+        for sense in self._sense:
+            sense(game, inputs)
+        return inputs
+
+    def sense_batch(self, batch) -> np.ndarray:
+        """Input vectors of shape (batch.n, num_inputs). Boards that have not moved yet count as heading up."""
+        direction = np.where(batch.direction == NO_ACTION, UP, batch.direction)
+        forward = _DIRECTIONS[direction]
+        right = _DIRECTIONS[(direction + 1) % len(DIRECTIONS)]
+        return np.concatenate([sense(batch, forward, right) for sense in self._sense_batch], axis=1)
+
+    @staticmethod
+    def _adjacent(game, inputs):
+        x, y, size = game.x, game.y, game.square_size
+        empty_squares = game.empty_squares
+        for dx, dy, changed_direction in RELATIVE_MOVES[(game.dx, game.dy)]:
+            inputs.append(0 if (x + dx * size, y + dy * size) in empty_squares else 1)
+
+    @staticmethod
+    def _food_angle(game, inputs):
+        theta_dir = np.arctan2(game.dx, -game.dy)
+        theta_food = np.arctan2(game.food[0] - game.x, game.y - game.food[1])
+        inputs.append(_wrap_and_normalise(theta_food - theta_dir))
+
+    @staticmethod
+    def _rays(game, inputs):
+        x, y, dx, dy, size = game.x, game.y, game.dx, game.dy, game.square_size
+        empty_squares = game.empty_squares
+        for f, r in _RAYS:
+            step_x = (f * dx - r * dy) * size
+            step_y = (f * dy + r * dx) * size
+            distance = 1
+            cx, cy = x + step_x, y + step_y
+            while (cx, cy) in empty_squares:
+                distance += 1
+                cx += step_x
+                cy += step_y
+            inputs.append(1 / distance)
+
+    @staticmethod
+    def _food_offset(game, inputs):
+        if game.food is None:
+            inputs.extend((0, 0))
+            return
+        size = game.square_size
+        scale = max(game.x_right, game.y_bottom - game.y_top) // size + 1
+        fx, fy = (game.food[0] - game.x) // size, (game.food[1] - game.y) // size
+        inputs.append((fx * game.dx + fy * game.dy) / scale)
+        inputs.append((fy * game.dx - fx * game.dy) / scale)
+
+    @staticmethod
+    def _cells_batch(batch, forward, right, steps):
+        # Flat index of the cell at each (f, r) offset in steps from the head, and whether it is on the board, for
+        # every board: both of shape (n, len(steps))
+        n_x, n_y = batch.shape
+        hx, hy = batch.head // n_y, batch.head % n_y
+        steps = np.asarray(steps)
+        ox = steps[:, 0] * forward[:, [0]] + steps[:, 1] * right[:, [0]]
+        oy = steps[:, 0] * forward[:, [1]] + steps[:, 1] * right[:, [1]]
+        cx, cy = hx[:, None] + ox, hy[:, None] + oy
+        inside = (cx >= 0) & (cx < n_x) & (cy >= 0) & (cy < n_y)
+        return np.where(inside, cx * n_y + cy, 0), inside
+
+    def _blocked_batch(self, batch, forward, right, steps):
+        # Whether the cell at each (f, r) offset in steps is blocked, for every board: shape (n, len(steps))
+        cells, inside = self._cells_batch(batch, forward, right, steps)
+        return ~inside | ~batch.is_free(cells)
+
+    @staticmethod
+    def _space(game, inputs):
+        num_free = max(len(game.empty_squares), 1)
+        inputs.extend(size / num_free for size in game.connectivity.move_regions(game))
+
+    def _adjacent_batch(self, batch, forward, right):
+        return self._blocked_batch(batch, forward, right, ((1, 0), (0, 1), (0, -1))).astype(float)
+
+    @staticmethod
+    def _food_angle_batch(batch, forward, right):
+        theta_dir = np.arctan2(forward[:, 0], -forward[:, 1])
+        food = batch.food
+        theta_food = np.arctan2(food[:, 0] - batch.x, batch.y - food[:, 1])
+        return _wrap_and_normalise(theta_food - theta_dir)[:, None]
+
+    def _rays_batch(self, batch, forward, right):
+        length = max(batch.shape)
+        k = np.arange(1, length + 1)
+        steps = np.concatenate([np.stack([k * f, k * r], axis=1) for f, r in _RAYS])
+        blocked = self._blocked_batch(batch, forward, right, steps).reshape(batch.n, len(_RAYS), length)
+        # Walls surround the board, so every ray is blocked within length steps
+        return 1 / (np.argmax(blocked, axis=2) + 1)
+
+    def _space_batch(self, batch, forward, right):
+        cells, inside = self._cells_batch(batch, forward, right, ((1, 0), (0, 1), (0, -1)))
+        num_free = np.maximum(batch.free_count, 1)
+        return batch.connectivity.region_sizes(cells) / num_free[:, None]
+
+    @staticmethod
+    def _food_offset_batch(batch, forward, right):
+        n_x, n_y = batch.shape
+        food = batch.food_cell
+        fx = food // n_y - batch.head // n_y
+        fy = food % n_y - batch.head % n_y
+        scale = max(n_x, n_y)
+        offset = np.stack([fx * forward[:, 0] + fy * forward[:, 1], fx * right[:, 0] + fy * right[:, 1]], axis=1) / scale
+        return np.where((food >= 0)[:, None], offset, 0)
@@ -4,12 +4,35 @@ from collections import deque
 class Snake:
     def __init__(self, x: int, y: int):
         self.blocks = deque([(x, y)])
+        # Number of blocks on each occupied cell, kept alongside the deque for O(1) body lookups
+        self._occupied = {(x, y): 1}
 
     def move(self, head: tuple[int, int]):
         self.blocks.append(head)
+        self._occupied[head] = self._occupied.get(head, 0) + 1
 
     def pop(self):
-        return self.blocks.popleft()
+        tail = self.blocks.popleft()
+        if self._occupied[tail] == 1:
+            del self._occupied[tail]
+        else:
+            self._occupied[tail] -= 1
+        return tail
+
+    @property
+    def head(self):
+        return self.blocks[-1]
+
+    @property
+    def tail(self):
+        return self.blocks[0]
+
+    @property
+    def occupied(self):
+        return self._occupied.keys()
+
+    def __contains__(self, block: tuple[int, int]):
+        return block in self._occupied
 
     def __len__(self):
-        return len(self.blocks)
\ No newline at end of file
+        return len(self.blocks)
@@ -0,0 +1,329 @@
+import profiling
+
+from operator import attrgetter
+from time import perf_counter
+
+import numpy as np
+from neat.species import DefaultSpeciesSet, Species
+from neat.six_util import iterkeys
+
+
+class _Columns(dict):
+    """Innovation columns of gene keys, handing out the next column to keys seen for the first time."""
+    def __missing__(self, key):
+        column = self[key] = len(self)
+        return column
+
+
+_bias = attrgetter('bias')
+_response = attrgetter('response')
+_activation = attrgetter('activation')
+_aggregation = attrgetter('aggregation')
+_weight = attrgetter('weight')
+_enabled = attrgetter('enabled')
+
+
+class _Genes:
+    """The genes of one genome as flat lists, with every node and connection key replaced by its innovation column."""
+    # Plain lists are cheaper to build than small arrays, and are packed into arrays for the whole population at once
+    def __init__(self, genome, node_columns: _Columns, connection_columns: _Columns, functions: _Columns):
+        nodes = genome.nodes.values()
+        self.node_columns = list(map(node_columns.__getitem__, genome.nodes))
+        self.biases = list(map(_bias, nodes))
+        self.responses = list(map(_response, nodes))
+        self.activations = [functions[activation] for activation in map(_activation, nodes)]
+        self.aggregations = [functions[aggregation] for aggregation in map(_aggregation, nodes)]
+
+        connections = genome.connections.values()
+        self.connection_columns = list(map(connection_columns.__getitem__, genome.connections))
+        self.weights = list(map(_weight, connections))
+        self.enabled = list(map(_enabled, connections))
+
+
+class _PackedGenes:
+    """The genes of a list of genomes concatenated into flat arrays, with the row of the genome each gene belongs to."""
+    def __init__(self, genes: list[_Genes]):
+        self.n = len(genes)
+        self.num_nodes = np.fromiter((len(g.node_columns) for g in genes), dtype=np.int64, count=self.n)
+        self.num_connections = np.fromiter((len(g.connection_columns) for g in genes), dtype=np.int64, count=self.n)
+        self.node_rows = np.repeat(np.arange(self.n), self.num_nodes)
+        self.connection_rows = np.repeat(np.arange(self.n), self.num_connections)
+        self.node_columns = _pack(genes, 'node_columns', np.int64)
+        self.biases = _pack(genes, 'biases', float)
+        self.responses = _pack(genes, 'responses', float)
+        self.activations = _pack(genes, 'activations', np.int64)
+        self.aggregations = _pack(genes, 'aggregations', np.int64)
+        self.connection_columns = _pack(genes, 'connection_columns', np.int64)
+        self.weights = _pack(genes, 'weights', float)
+        self.enabled = _pack(genes, 'enabled', bool)
+
+
+_NO_KEYS = np.zeros(0, dtype=np.int64)
+_NO_DISTANCES = np.zeros(0)
+
+
+def _pack(genes, name, dtype) -> np.ndarray:
+    values = []
+    for g in genes:
+        values.extend(getattr(g, name))
+    return np.array(values, dtype=dtype)
+
+
+class VectorizedSpeciesSet(DefaultSpeciesSet):
+    """DefaultSpeciesSet with the genome distances computed in batch with NumPy, see use_vectorized_speciation()."""
+    def __init__(self, config, reporters):
+        super().__init__(config, reporters)
+        self._init_caches()
+
+    def _init_caches(self):
+        # Genomes never change once they are in a population, so their genes are read once
+        self._node_columns = _Columns()
+        self._connection_columns = _Columns()
+        self._functions = _Columns()
+        self._genes = {}
+        # Distances from each representative, kept between generations. Elites survive with their keys and usually stay
+        # representatives, since nothing is closer to them than themselves, so only new offspring need computing.
+        self._distances = {}
+
+    @classmethod
+    def adopt(cls, species_set: DefaultSpeciesSet) -> 'VectorizedSpeciesSet':
+        """Takes over the species, indexer and reporters of another species set, such as one from a checkpoint."""
+        if isinstance(species_set, cls):
+            return species_set
+        adopted = cls.__new__(cls)
+        adopted.__dict__.update(species_set.__dict__)
+        adopted._init_caches()
+        return adopted
+
+    def __getstate__(self):
+        # The caches can be rebuilt, and would make every checkpoint much larger
+        state = self.__dict__.copy()
+        for name in ('_node_columns', '_connection_columns', '_functions', '_genes', '_distances'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_caches()
+
+    def speciate(self, config, population, generation):
+        profiler = profiling.active
+        start = perf_counter() if profiler else 0
+
+        # Same formula and coefficients as DefaultGenome.distance, and species are assigned in exactly the order
+        # DefaultSpeciesSet.speciate does, so the species only differ when rounding moves a distance across
+        # compatibility_threshold or changes which of two equally close species wins
+        compatibility_threshold = self.species_set_config.compatibility_threshold
+        genome_config = config.genome_config
+
+        # Built and changed exactly like the set in DefaultSpeciesSet.speciate, so that genomes come out of it in the
+        # same order. A set built straight from a dict is sized differently, and iterates in a different order.
+        unspeciated = set(iterkeys(population))
+        keys = list(unspeciated)
+        key_array = np.array(keys, dtype=np.int64)
+        rows = {key: row for row, key in enumerate(keys)}
+        packed = _PackedGenes([self._genes_of(population[key]) for key in keys])
+        used_distances = []
+
+        # Each existing species is represented by the genome closest to its old representative, the first one in the
+        # set's order on a tie. Removing from a set never reorders what is left in it.
+        new_representatives = {}
+        new_members = {}
+        available = np.ones(len(keys), dtype=bool)
+        for sid, s in self.species.items():
+            distances = self._cached_distances(s.representative, key_array, packed, genome_config)
+            used_distances.append(distances[available])
+            new_row = int(np.argmin(np.where(available, distances, np.inf)))
+            new_rid = keys[new_row]
+            new_representatives[sid] = new_rid
+            new_members[sid] = [new_rid]
+            unspeciated.remove(new_rid)
+            available[new_row] = False
+
+        # Then every other genome, in the order DefaultSpeciesSet pops them, joins the closest species within the
+        # compatibility threshold, the earliest on a tie. The closest species so far is kept for every genome, so a
+        # genome that fits none founds a new species, and only its distances to the genomes after it are needed.
+        order = []
+        while unspeciated:
+            order.append(rows[unspeciated.pop()])
+        order = np.array(order, dtype=np.int64)
+        sids = list(new_representatives)
+        closest = np.full(len(order), -1)
+        closest_distance = np.full(len(order), np.inf)
+        needed = np.zeros(len(keys), dtype=bool)
+        needed[order] = True
+        for column, rid in enumerate(new_representatives.values()):
+            if not len(order):
+                break
+            distances = self._cached_distances(population[rid], key_array, packed, genome_config, needed)[order]
+            used_distances.append(distances)
+            self._consider(column, distances, closest, closest_distance, compatibility_threshold)
+
+        position = 0
+        while True:
+            misfits = np.flatnonzero(closest[position:] < 0)
+            if not len(misfits):
+                break
+            founder = position + int(misfits[0])
+            gid = keys[order[founder]]
+            sid = next(self.indexer)
+            new_representatives[sid] = gid
+            sids.append(sid)
+            closest[founder] = len(sids) - 1
+            closest_distance[founder] = 0.0
+
+            later = order[founder + 1:]
+            if len(later):
+                needed = np.zeros(len(keys), dtype=bool)
+                needed[later] = True
+                distances = self._cached_distances(population[gid], key_array, packed, genome_config, needed)[later]
+                used_distances.append(distances)
+                self._consider(
+                    len(sids) - 1, distances, closest[founder + 1:], closest_distance[founder + 1:],
+                    compatibility_threshold
+                )
+            position = founder + 1
+
+        for sid in sids[len(new_members):]:
+            new_members[sid] = []
+        for row, column in zip(order.tolist(), closest.tolist()):
+            new_members[sids[column]].append(keys[row])
+
+        self.genome_to_species = {}
+        for sid, rid in new_representatives.items():
+            s = self.species.get(sid)
+            if s is None:
+                s = Species(sid, generation)
+                self.species[sid] = s
+
+            members = new_members[sid]
+            for gid in members:
+                self.genome_to_species[gid] = sid
+            s.update(population[rid], {gid: population[gid] for gid in members})
+
+        self._prune(population)
+        if profiler:
+            profiler.add('speciation', perf_counter() - start)
+
+        used_distances = np.concatenate(used_distances) if used_distances else np.zeros(0)
+        if len(used_distances):
+            self.reporters.info(
+                f'Mean genetic distance {used_distances.mean():.3f}, standard deviation {used_distances.std():.3f}'
+            )
+
+    @staticmethod
+    def _consider(column, distances, closest, closest_distance, compatibility_threshold):
+        # Moves genomes over to the species in column where it is strictly closer and within the threshold, so that
+        # earlier species win ties. closest and closest_distance are updated in place.
+        better = (distances < compatibility_threshold) & (distances < closest_distance)
+        closest[better] = column
+        closest_distance[better] = distances[better]
+
+    def _genes_of(self, genome) -> _Genes:
+        genes = self._genes.get(genome.key)
+        if genes is None:
+            genes = self._genes[genome.key] = _Genes(genome, self._node_columns, self._connection_columns, self._functions)
+        return genes
+
+    def _cached_distances(self, representative, key_array, packed, genome_config, needed=None) -> np.ndarray:
+        # Distances from the representative to the genomes with keys key_array, only computing the ones that are not
+        # cached yet and are at rows in the boolean mask needed, all rows by default. Others are NaN.
+        distances = np.full(len(key_array), np.nan)
+        cached_keys, cached_distances = self._distances.get(representative.key, (_NO_KEYS, _NO_DISTANCES))
+        if len(cached_keys):
+            index = np.minimum(np.searchsorted(cached_keys, key_array), len(cached_keys) - 1)
+            found = cached_keys[index] == key_array
+            distances[found] = cached_distances[index[found]]
+
+        missing = np.isnan(distances)
+        if needed is not None:
+            missing &= needed
+        if missing.any():
+            rows = None if missing.all() else missing
+            computed = self._distances_to(self._genes_of(representative), packed, rows, genome_config)[missing]
+            distances[missing] = computed
+            merged_keys = np.concatenate([cached_keys, key_array[missing]])
+            merged_distances = np.concatenate([cached_distances, computed])
+            by_key = np.argsort(merged_keys, kind='stable')
+            self._distances[representative.key] = (merged_keys[by_key], merged_distances[by_key])
+        return distances
+
+    def _distances_to(self, rep: _Genes, packed: _PackedGenes, rows, genome_config) -> np.ndarray:
+        # DefaultGenome.distance from rep to every genome of packed at the rows selected by the boolean mask rows,
+        # or all of them if rows is None. Values at other rows are meaningless.
+        node_sum, node_count = self._homologous(
+            packed.node_rows, packed.node_columns, len(self._node_columns), rep.node_columns, rows, packed.n,
+            (packed.biases, rep.biases, True), (packed.responses, rep.responses, True),
+            (packed.activations, rep.activations, False), (packed.aggregations, rep.aggregations, False)
+        )
+        connection_sum, connection_count = self._homologous(
+            packed.connection_rows, packed.connection_columns, len(self._connection_columns), rep.connection_columns,
+            rows, packed.n, (packed.weights, rep.weights, True), (packed.enabled, rep.enabled, False)
+        )
+
+        disjoint_coefficient = genome_config.compatibility_disjoint_coefficient
+        weight_coefficient = genome_config.compatibility_weight_coefficient
+        return (
+            _part(node_sum, node_count, packed.num_nodes, len(rep.node_columns), weight_coefficient, disjoint_coefficient)
+            + _part(
+                connection_sum, connection_count, packed.num_connections, len(rep.connection_columns),
+                weight_coefficient, disjoint_coefficient
+            )
+        )
+
+    @staticmethod
+    def _homologous(gene_rows, gene_columns, num_columns, rep_columns, rows, n, *attributes):
+        # Per genome, the summed attribute differences over the genes it shares with rep, and how many it shares.
+        # Each attribute is (values of packed, values of rep, numeric), where numeric ones add their absolute
+        # difference and the others add 1 when they differ.
+        slots = np.full(num_columns, -1, dtype=np.int64)
+        slots[rep_columns] = np.arange(len(rep_columns))
+        slot = slots[gene_columns]
+        shared = slot >= 0
+        if rows is not None:
+            shared &= rows[gene_rows]
+        shared = np.flatnonzero(shared)
+        slot = slot[shared]
+
+        total = np.zeros(len(shared))
+        for values, rep_values, numeric in attributes:
+            rep_values = np.asarray(rep_values, dtype=values.dtype)[slot]
+            if numeric:
+                total += np.abs(values[shared] - rep_values)
+            else:
+                total += values[shared] != rep_values
+        shared_rows = gene_rows[shared]
+        return np.bincount(shared_rows, weights=total, minlength=n), np.bincount(shared_rows, minlength=n)
+
+    def _prune(self, population):
+        # Keep array forms and cached distances only for genomes that can still be compared: the population, which
+        # holds the elites of the next generation, and the representatives
+        representatives = {s.representative.key for s in self.species.values()}
+        live = set(population) | representatives
+        self._genes = {key: genes for key, genes in self._genes.items() if key in live}
+        live_keys = np.fromiter(live, dtype=np.int64, count=len(live))
+        pruned = {}
+        for key, (cached_keys, cached_distances) in self._distances.items():
+            if key in representatives:
+                kept = np.isin(cached_keys, live_keys)
+                pruned[key] = (cached_keys[kept], cached_distances[kept])
+        self._distances = pruned
+
+
+def _part(homologous_sum, homologous_count, num_genes, rep_num_genes, weight_coefficient, disjoint_coefficient):
+    # (weighted sum of homologous gene distances + disjoint_coefficient * disjoint genes) / larger gene count, or 0
+    # when neither genome has any genes of this kind
+    disjoint = num_genes + rep_num_genes - 2 * homologous_count
+    larger = np.maximum(num_genes, rep_num_genes)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(
+            larger > 0, (homologous_sum * weight_coefficient + disjoint_coefficient * disjoint) / larger, 0.0
+        )
+
+
+def use_vectorized_speciation(config):
+    """Switches a config loaded with DefaultSpeciesSet over to VectorizedSpeciesSet, keeping its species options."""
+    # neat reads the species set's options from a section named after its class, so this keeps the [DefaultSpeciesSet]
+    # section of neat_config.txt working unchanged
+    config.species_set_type = VectorizedSpeciesSet
+    return config
@@ -0,0 +1,160 @@
+from utils import get_game_config_state, init_game_config, set_game_config_overrides
+from sensors import DEFAULT_SENSORS
+
+from typing import Literal
+import multiprocessing
+import queue
+import signal
+
+from neat.reporting import BaseReporter
+
+
+SpectateMode = Literal['best', 'species']
+
+
+def _latest(jobs, timeout=None):
+    # Drains the queue, so that a spectator that fell behind skips straight to the newest generation
+    try:
+        message = jobs.get(timeout=timeout) if timeout is not None else jobs.get_nowait()
+    except queue.Empty:
+        return None
+    while True:
+        try:
+            newer = jobs.get_nowait()
+        except queue.Empty:
+            return message
+        # Never drop a request to close
+        message = newer if message != 'close' else message
+
+
+def _spectate(jobs, game_config_state, config, num_obstacles, start_len, fps, steps_per_frame, sensors):
+    # Runs in its own process, so pygame is only ever loaded here and rendering never holds up training. Training
+    # closes it when it stops, so Ctrl+C is left to the main process. Plays steps_per_frame moves per frame at fps.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_game_config(game_config_state)
+
+    from game_core import GameCore
+    from game_controllers.nn_controller import NNController
+    from renderer import Renderer, wall_squares, WHITE
+    import pygame
+
+    window = None
+    pending = None
+    while True:
+        message = pending if pending is not None else _latest(jobs, timeout=0.1)
+        pending = None
+        if message is None:
+            # Keep the window responsive while waiting for the next generation to finish
+            if window is not None and _quit_requested(pygame):
+                break
+            continue
+        if message == 'close':
+            break
+
+        generation, episodes, settings = message
+        if settings is not None:
+            game_config_overrides, num_obstacles, start_len = settings
+            set_game_config_overrides(**game_config_overrides)
+        for label, genome, seed in episodes:
+            game = GameCore(NNController(genome, config, training=True, sensors=sensors), num_obstacles=num_obstacles, start_len=start_len, seed=seed)
+            # The board size changes when a curriculum moves on to the next stage
+            if window is None or window.get_size() != (game.width, game.height):
+                if window is None:
+                    pygame.init()
+                    pygame.display.set_caption('Snake Game - watching training')
+                    clock = pygame.time.Clock()
+                window = pygame.display.set_mode((game.width, game.height))
+                renderer = Renderer(window, game.width, game.height, game.square_size, game.y_top, wall_squares(game))
+            renderer.reset(game.obstacles)
+            renderer.draw_board(game.snake, game.food)
+
+            while game.running and pending != 'close':
+                for _ in range(steps_per_frame):
+                    game.loop()
+                    if not game.running:
+                        break
+
+                # Incremental updates assume one move per frame, skipped frames need a full redraw
+                if steps_per_frame == 1:
+                    renderer.update_board(game.snake, game.food)
+                else:
+                    renderer.draw_board(game.snake, game.food)
+                renderer.draw_hud(f'Generation: {generation}, {label}, Score: {game.score}', colour=WHITE)
+                renderer.present()
+
+                if _quit_requested(pygame):
+                    pending = 'close'
+                    break
+                newer = _latest(jobs)
+                if newer is not None and pending != 'close':
+                    pending = newer
+                clock.tick(fps)
+
+            if pending == 'close':
+                break
+
+    if window is not None:
+        pygame.quit()
+
+
+def _quit_requested(pygame):
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q):
+            return True
+    return False
+
+
+class Spectator(BaseReporter):
+    """Replays the best genome, or the best of every species, of each generation in a window of its own."""
+    def __init__(self, config, num_obstacles=0, start_len=1, mode: SpectateMode = 'best', fps=30, steps_per_frame=1, schedule=None, sensors=DEFAULT_SENSORS, curriculum=None):
+        if mode not in ('best', 'species'):
+            raise ValueError(f"Invalid value to parameter mode, should be 'best' or 'species', got {mode}")
+
+        self.mode = mode
+        self.schedule = schedule
+        self.curriculum = curriculum
+        self.generation = None
+        self.settings = None
+        self.jobs = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_spectate,
+            args=(self.jobs, get_game_config_state(), config, num_obstacles, start_len, fps, steps_per_frame, tuple(sensors)),
+            daemon=True
+        )
+        self.process.start()
+
+    def start_generation(self, generation):
+        self.generation = generation
+        # Replays use the settings of the stage the generation is evaluated on
+        if self.curriculum is not None:
+            stage = self.curriculum.stage
+            self.settings = (self.curriculum.game_config_overrides(), stage.num_obstacles, stage.start_len)
+
+    def post_evaluate(self, config, population, species, best_genome):
+        # Gone once the window is closed or Q is pressed, which stops spectating without stopping training
+        if self.process is None or not self.process.is_alive():
+            return
+
+        # Replays the first of the episodes the genomes were scored on
+        seed = self.schedule.seeds[0] if self.schedule is not None else None
+        if self.mode == 'best':
+            episodes = [(f'best genome {best_genome.key}', best_genome, seed)]
+        else:
+            episodes = []
+            for species_id, s in sorted(species.species.items()):
+                genome = max(s.members.values(), key=lambda g: g.fitness if g.fitness is not None else float('-inf'))
+                episodes.append((f'species {species_id}, genome {genome.key}', genome, seed))
+        self.jobs.put((self.generation, episodes, self.settings))
+
+    def close(self):
+        if self.process is not None:
+            if self.process.is_alive():
+                self.jobs.put('close')
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,53 @@
+import signal
+import threading
+import time
+
+from neat.reporting import BaseReporter
+
+
+class TrainingStopped(Exception):
+    pass
+
+
+class StopTraining(BaseReporter):
+    """
+    Ends training at the end of a generation, once max_time seconds have passed since it was entered as a context
+    manager, or once SIGINT (Ctrl+C) was received. The population is then reproduced and speciated, the same state
+    that checkpoints hold, and end_generation raises TrainingStopped for the caller to save a final checkpoint.
+    Add it after the checkpointer, so that a checkpoint due in the same generation is written first.
+
+    SIGINT is handled only while entered, and only from the main thread. A second SIGINT stops immediately.
+    """
+    def __init__(self, max_time: float | None = None, handle_sigint: bool = True):
+        self.max_time = max_time
+        self.handle_sigint = handle_sigint
+        self.reason = None
+        self._start = None
+        self._previous_handler = None
+
+    def request_stop(self, reason='stop requested'):
+        if self.reason is None:
+            self.reason = reason
+
+    def end_generation(self, config, population, species_set):
+        if self.reason is None and self.max_time is not None and time.monotonic() - self._start >= self.max_time:
+            self.reason = f'time limit of {self.max_time:g} sec reached'
+        if self.reason is not None:
+            raise TrainingStopped(self.reason)
+
+    def _on_sigint(self, signum, frame):
+        if self.reason == 'interrupted':
+            raise KeyboardInterrupt
+        self.request_stop('interrupted')
+        print('Interrupted, stopping after this generation. Press Ctrl+C again to stop immediately.')
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        if self.handle_sigint and threading.current_thread() is threading.main_thread():
+            self._previous_handler = signal.signal(signal.SIGINT, self._on_sigint)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._previous_handler is not None:
+            signal.signal(signal.SIGINT, self._previous_handler)
+            self._previous_handler = None
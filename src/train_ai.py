@@ -1,25 +1,43 @@
 from game_controllers.nn_controller import NNController
-from game import Game
+from game_core import GameCore
 from utils import get_checkpoint_name
+from evaluation import EpisodeSchedule, episode_fitness, max_episode_fitness, aggregate_fitness, cannot_reach
+from parallel_evaluator import ChunkedParallelEvaluator
+from profiling import ProfilingReporter
+from spectator import Spectator
+from episode_store import EpisodeStoreReporter
+from checkpointer import AsyncCheckpointer, restore_checkpoint
+from sensors import DEFAULT_SENSORS, read_sensors, configure_inputs, config_sensors
+from speciation import VectorizedSpeciesSet, use_vectorized_speciation
+from fitness_cache import FitnessCache
+from curriculum import read_curriculum
+from stopping import StopTraining, TrainingStopped
+import episode_store
+import profiling
 
+from dataclasses import dataclass, replace
+import contextlib
 import os.path
 import pickle
+import sys
 from functools import partial
 from collections import defaultdict
 import multiprocessing
+import time
 
 import neat
-import pygame
 from numpy import inf
 
 causes_of_death = defaultdict(int)
 
 
-def eval_genome(genome, config, i, num_obstacles, draw, start_len, verbose):
-    controller = NNController(genome, config, training=True)
-    game = Game(controller=controller, num_obstacles=num_obstacles, draw=draw, start_len=start_len, fps=inf)
-
-    genome.fitness = 0
+def play_episode(controller, num_obstacles, draw, start_len, seed=None, recorder=None):
+    if draw:
+        # Imported here so that headless runs and worker processes never load pygame
+        from game import Game
+        game = Game(controller=controller, num_obstacles=num_obstacles, draw=draw, start_len=start_len, fps=inf, seed=seed, recorder=recorder)
+    else:
+        game = GameCore(controller=controller, num_obstacles=num_obstacles, start_len=start_len, fps=inf, seed=seed, recorder=recorder)
 
     while game.running:
         status_code = game.loop()
@@ -27,52 +45,153 @@ def eval_genome(genome, config, i, num_obstacles, draw, start_len, verbose):
         if status_code == 1:
             exit('Force quit')
 
-        if game.draw:
-            pygame.display.update()
-            if game.fps != inf:
-                game.clock.tick(game.fps)
+        if game.draw and game.fps != inf:
+            game.clock.tick(game.fps)
 
-    genome.fitness += game.score + 0.25 * (1 / max(1, abs(game.x - game.food[0])))
+    return game
 
-    if verbose:
-        causes_of_death[game.cause_of_death] += 1
-        print(f'genome: {i}, score={game.score}, fitness={genome.fitness:.2f}, cause of death={game.cause_of_death}, death_cause_counts={dict(causes_of_death)}')
 
-    if game.draw:
-        pygame.quit()
+def eval_genome(genome, config, i, num_obstacles, draw, start_len, verbose, seeds=(None,), aggregation='mean', quantile=0.5, threshold=None, sensors=DEFAULT_SENSORS):
+    profiler = profiling.active
+    start = time.perf_counter() if profiler else 0
+    controller = NNController(genome, config, training=True, sensors=sensors)
+    if profiler:
+        profiler.add('genome_setup', time.perf_counter() - start)
+        profiler.count('genomes')
+
+    episode_log = episode_store.active
+    fitnesses = []
+    for seed in seeds:
+        episode_start = time.perf_counter() if episode_log else 0
+        game = play_episode(controller, num_obstacles=num_obstacles, draw=draw, start_len=start_len, seed=seed)
+        fitnesses.append(episode_fitness(game))
+        if profiler:
+            profiler.count('episodes')
+        if episode_log:
+            episode_log.add(genome.key, game.score, game.moves, game.cause_of_death, fitnesses[-1], time.perf_counter() - episode_start)
+
+        if verbose:
+            causes_of_death[game.cause_of_death] += 1
+
+        # Stop playing once the remaining episodes can no longer lift the genome to the elite threshold
+        if (
+            threshold is not None and len(fitnesses) < len(seeds)
+            and cannot_reach(fitnesses, len(seeds), threshold, aggregation, quantile, max_episode_fitness())
+        ):
+            break
+
+    genome.fitness = aggregate_fitness(fitnesses, aggregation, quantile)
+
+    if verbose:
+        print(f'genome: {i}, score={game.score}, fitness={genome.fitness:.2f}, episodes={len(fitnesses)}/{len(seeds)}, cause of death={game.cause_of_death}, death_cause_counts={dict(causes_of_death)}')
 
     return genome.fitness
 
 
-def eval_genomes(genomes, config, num_obstacles, draw, start_len, verbose):
+def eval_genomes(genomes, config, num_obstacles, draw, start_len, verbose, schedule, aggregation, quantile, sensors=DEFAULT_SENSORS, curriculum=None):
+    if curriculum is not None:
+        num_obstacles, start_len = curriculum.stage.num_obstacles, curriculum.stage.start_len
     for i, (genome_id, genome) in enumerate(genomes):
-        eval_genome(genome, config, i=i, num_obstacles=num_obstacles, draw=draw, start_len=start_len, verbose=verbose)
+        eval_genome(
+            genome,
+            config,
+            i=i,
+            num_obstacles=num_obstacles,
+            draw=draw,
+            start_len=start_len,
+            verbose=verbose,
+            seeds=schedule.seeds,
+            aggregation=aggregation,
+            quantile=quantile,
+            threshold=schedule.threshold,
+            sensors=sensors
+        )
 
 
-def eval_genomes_generator(num_obstacles, draw, start_len, verbose):
-    return partial(eval_genomes, num_obstacles=num_obstacles, draw=draw, start_len=start_len, verbose=verbose)
+def eval_genomes_generator(num_obstacles, draw, start_len, verbose, schedule, aggregation='mean', quantile=0.5, sensors=DEFAULT_SENSORS, curriculum=None):
+    return partial(
+        eval_genomes,
+        num_obstacles=num_obstacles,
+        draw=draw,
+        start_len=start_len,
+        verbose=verbose,
+        schedule=schedule,
+        aggregation=aggregation,
+        quantile=quantile,
+        sensors=sensors,
+        curriculum=curriculum
+    )
 
-def eval_genome_generator(num_obstacles, start_len, verbose):
+def eval_genome_generator(num_obstacles, start_len, verbose, aggregation='mean', quantile=0.5, sensors=DEFAULT_SENSORS):
     return partial(
         eval_genome,
         i=None,
         num_obstacles=num_obstacles,
         draw=False,
         start_len=start_len,
-        verbose=verbose
+        verbose=verbose,
+        aggregation=aggregation,
+        quantile=quantile,
+        sensors=sensors
     )
 
 
-def run(config_dir,
-        n,
-        checkpoint_freq=None,
-        continue_from_checkpoint=True,
-        start_len=1,
-        multiprocess=True,
-        verbose=False,
-        num_obstacles=0,
-        draw=True
-):
+@dataclass
+class TrainingSettings:
+    """Everything about a training run but its config directory and length, see cli.py for what each one does."""
+    # Evaluation
+    num_obstacles: int = 0
+    start_len: int = 1
+    episodes: int = 1
+    seed: int | None = None
+    reseed_interval: int = 1
+    aggregation: str = 'mean'
+    quantile: float = 0.5
+    elite_quantile: float | None = None
+    sensors: tuple[str, ...] | None = None
+    use_curriculum: bool = False
+    fitness_cache_size: int = 10000
+    fitness_cache_path: str | None = None
+    vectorized_speciation: bool = True
+    # Workers
+    multiprocess: bool = True
+    num_workers: int | None = None
+    chunk_size: int | None = None
+    # Checkpoints and output
+    checkpoint_dir: str | None = None
+    continue_from_checkpoint: bool = True
+    checkpoint_freq: int | None = None
+    checkpoint_time: float = 300
+    output_path: str = 'best_nn.pkl'
+    # Stopping
+    until_generation: int | None = None
+    max_time: float | None = None
+    handle_sigint: bool = True
+    # Watching
+    draw: bool = True
+    verbose: bool = False
+    spectate: str | None = None
+    spectate_fps: int = 30
+    spectate_steps_per_frame: int = 1
+    profile: bool = False
+    profile_path: str | None = None
+    episode_store_path: str | None = None
+
+
+def run(config_dir, n, settings: TrainingSettings | None = None, migration=None, **options):
+    """
+    Trains for n generations, or up to settings.until_generation, with the neat config in config_dir. options override
+    fields of settings, so run(config_dir, n, num_obstacles=100) changes one setting of the defaults. migration is an
+    islands.Migration that exchanges genomes with other populations.
+    """
+    settings = replace(settings or TrainingSettings(), **options)
+    if settings.elite_quantile is not None and settings.aggregation == 'mean':
+        raise ValueError('elite_quantile needs the min or quantile aggregation, a mean never abandons genomes early')
+    draw = settings.draw
+    sensors = settings.sensors
+    checkpoint_dir = settings.checkpoint_dir
+    num_workers = settings.num_workers
+
     config = neat.Config(
         neat.DefaultGenome,
         neat.DefaultReproduction,
@@ -80,55 +199,181 @@ def run(config_dir,
         neat.DefaultStagnation,
         os.path.join(config_dir, 'neat_config.txt')
     )
+    # The number of network inputs follows from the sensors, set in the [Sensors] section of the config by default
+    if sensors is None:
+        sensors = read_sensors(os.path.join(config_dir, 'neat_config.txt'))
+    configure_inputs(config, sensors)
+    if settings.vectorized_speciation:
+        use_vectorized_speciation(config)
 
-    if continue_from_checkpoint:
-        checkpoint_name = get_checkpoint_name(os.path.join(config_dir, 'checkpoints'))
+    if checkpoint_dir is None:
+        checkpoint_dir = os.path.join(config_dir, 'checkpoints')
+    if settings.continue_from_checkpoint and os.path.isdir(checkpoint_dir):
+        checkpoint_name = get_checkpoint_name(checkpoint_dir)
     else:
         checkpoint_name = None
 
     if checkpoint_name is not None:
-        population = neat.Checkpointer.restore_checkpoint(os.path.join(config_dir, 'checkpoints', checkpoint_name))
+        population = restore_checkpoint(os.path.join(checkpoint_dir, checkpoint_name))
+        if settings.vectorized_speciation:
+            population.species = VectorizedSpeciesSet.adopt(population.species)
+        # The restored genomes have the inputs of the sensors they were trained with, whatever the config says now
+        config = population.config
+        if config_sensors(config) != tuple(sensors):
+            print(f'Resuming with the sensors of the checkpoint, {" ".join(config_sensors(config))}, instead of {" ".join(sensors)}')
+        sensors = config_sensors(config)
     else:
         population = neat.Population(config)
 
+    # Counts generations over resumes, so that a run restarted from its checkpoints still ends at the same generation
+    if settings.until_generation is not None:
+        n = settings.until_generation - population.generation
+        if n <= 0:
+            print(f'Already trained up to generation {population.generation}, nothing to do')
+            return
+
+    schedule = EpisodeSchedule(
+        episodes=settings.episodes,
+        base_seed=settings.seed,
+        elite_quantile=settings.elite_quantile,
+        reseed_interval=settings.reseed_interval
+    )
+    population.add_reporter(schedule)
+    # A curriculum declared in the [Curriculum] section of the config replaces num_obstacles, start_len and the board
+    # size with those of its current stage
+    curriculum = None
+    if settings.use_curriculum:
+        curriculum = read_curriculum(os.path.join(config_dir, 'neat_config.txt'), schedule)
+    if curriculum is not None:
+        curriculum.resume(getattr(population.config, 'curriculum', None))
+        population.add_reporter(curriculum)
+    # Kept on the config, so that checkpoints record the stages and how far the population got
+    population.config.curriculum = curriculum
     population.add_reporter(neat.StdOutReporter(True))
-    population.add_reporter(neat.Checkpointer(
-        checkpoint_freq,
-        filename_prefix=os.path.join(config_dir, 'checkpoints', 'neat-checkpoint-')
-    ))
+    profiler = None
+    if settings.profile:
+        profiler = ProfilingReporter(dump_path=settings.profile_path)
+        population.add_reporter(profiler)
+    episode_reporter = None
+    if settings.episode_store_path is not None:
+        episode_reporter = EpisodeStoreReporter(settings.episode_store_path)
+        population.add_reporter(episode_reporter)
+    checkpointer = AsyncCheckpointer(
+        settings.checkpoint_freq,
+        time_interval_seconds=settings.checkpoint_time,
+        filename_prefix=os.path.join(checkpoint_dir, 'neat-checkpoint-')
+    )
+    population.add_reporter(checkpointer)
+    # Stops at the end of a generation on Ctrl+C or after max_time seconds, see train() below
+    stopper = StopTraining(max_time=settings.max_time, handle_sigint=settings.handle_sigint)
+    population.add_reporter(stopper)
+    if migration is not None:
+        migration.attach(population)
+        population.add_reporter(migration)
 
-    if not multiprocess:
-        winner = population.run(eval_genomes_generator(num_obstacles=num_obstacles, draw=draw, start_len=start_len, verbose=verbose), n)
-    else:
-        num_workers = max(multiprocessing.cpu_count() - 1, 1)
-        parallel_evaluator = neat.ParallelEvaluator(
-            num_workers,
-            eval_genome_generator(
-                num_obstacles=num_obstacles,
-                start_len=start_len,
-                verbose=verbose
+    # Only used with seeded episodes, since unseeded ones are random and would never hit
+    fitness_cache = None
+    if settings.fitness_cache_size and settings.seed is not None:
+        fitness_cache = FitnessCache(
+            schedule,
+            capacity=settings.fitness_cache_size,
+            disk_path=settings.fitness_cache_path,
+            context=(
+                (settings.num_obstacles, settings.start_len, tuple(sensors), settings.aggregation, settings.quantile)
+                if curriculum is None
+                else lambda: (*curriculum.settings(), tuple(sensors), settings.aggregation, settings.quantile)
             )
         )
-        winner = population.run(parallel_evaluator.evaluate, n)
+        population.add_reporter(fitness_cache)
+
+    spectator = None
+    if settings.spectate is not None:
+        # Watching replaces drawing every evaluated game, which would cap training at the frame rate
+        draw = False
+        spectator = Spectator(
+            config,
+            num_obstacles=settings.num_obstacles,
+            start_len=settings.start_len,
+            mode=settings.spectate,
+            fps=settings.spectate_fps,
+            steps_per_frame=settings.spectate_steps_per_frame,
+            schedule=schedule,
+            sensors=sensors,
+            curriculum=curriculum
+        )
+        population.add_reporter(spectator)
 
-    with open('best_nn.pkl', 'wb') as file:
+    def train(fitness_function):
+        if fitness_cache is not None:
+            fitness_function = fitness_cache.wrap(fitness_function)
+        try:
+            return population.run(fitness_function, n)
+        except TrainingStopped as stop:
+            # Raised from end_generation, so the population is ready for the next generation like in any checkpoint
+            print(f'Training stopped: {stop}')
+            if checkpointer.last_generation_checkpoint != population.generation:
+                checkpointer.save_checkpoint(
+                    population.config, population.population, population.species, population.generation
+                )
+            return population.best_genome
+
+    with contextlib.ExitStack() as resources:
+        for resource in (profiler, episode_reporter, checkpointer, spectator, fitness_cache, curriculum, stopper):
+            if resource is not None:
+                resources.enter_context(resource)
+
+        if not settings.multiprocess:
+            winner = train(eval_genomes_generator(
+                num_obstacles=settings.num_obstacles,
+                draw=draw,
+                start_len=settings.start_len,
+                verbose=settings.verbose,
+                schedule=schedule,
+                aggregation=settings.aggregation,
+                quantile=settings.quantile,
+                sensors=sensors,
+                curriculum=curriculum
+            ))
+        else:
+            if num_workers is None:
+                num_workers = max(multiprocessing.cpu_count() - 1, 1)
+            parallel_evaluator = ChunkedParallelEvaluator(
+                num_workers,
+                eval_genome_generator(
+                    num_obstacles=settings.num_obstacles,
+                    start_len=settings.start_len,
+                    verbose=settings.verbose,
+                    aggregation=settings.aggregation,
+                    quantile=settings.quantile,
+                    sensors=sensors
+                ),
+                config,
+                chunk_size=settings.chunk_size,
+                schedule=schedule,
+                curriculum=curriculum
+            )
+            population.add_reporter(parallel_evaluator)
+            with parallel_evaluator:
+                winner = train(parallel_evaluator.evaluate)
+
+    # Drawn episodes share one window, closed once training is over
+    pygame = sys.modules.get('pygame')
+    if pygame is not None:
+        pygame.quit()
+
+    if winner is None:
+        print('Training stopped before any generation was evaluated, no winner to save')
+        return
+    # Saved with the sensors it was trained on, so that it is played with them even if the config changes
+    winner.sensors = tuple(sensors)
+    with open(settings.output_path, 'wb') as file:
         pickle.dump(winner, file)
 
 
 def main():
-    config_dir = os.path.join(os.path.dirname(__file__), os.path.pardir)
-    n = 250
-    run(
-        config_dir,
-        n=n,
-        checkpoint_freq=n-1,
-        continue_from_checkpoint=True,
-        start_len=1,
-        multiprocess=True,
-        verbose=False,
-        num_obstacles=100,
-        draw=True
-    )
+    # Same as cli.py train, which resumes the run in the checkpoint directory if there is one. See cli.py --help.
+    import cli
+    cli.main(['train', '--continue', *sys.argv[1:]])
 
 
 if __name__ == '__main__':
@@ -1,40 +1,113 @@
 import yaml
+import os
 import os.path
 
 
+GAME_CONFIG_PATH = os.path.join(os.path.dirname(__file__), os.path.pardir, 'game_config.yaml')
+SAVED_DATA_PATH = os.path.join(os.path.dirname(__file__), os.path.pardir, 'saved_data.yaml')
+
+
+class CachedYamlFile:
+    """
+    Parses a YAML file once and serves the cached contents until the file's modification time changes. Once pinned,
+    the file is no longer checked at all, which is how worker processes use a config shared at pool start.
+    """
+    def __init__(self, path: str, default=None):
+        self._path = path
+        self._default = default
+        self._mtime = None
+        self._data = None
+        self._pinned = False
+
+    def load(self):
+        if self._pinned:
+            return self._data
+
+        try:
+            mtime = os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            if self._default is None:
+                raise
+            mtime = None
+            self._data = self._default
+
+        if mtime is not None and (self._data is None or mtime != self._mtime):
+            with open(self._path, 'r') as file:
+                self._data = yaml.safe_load(file)
+        self._mtime = mtime
+        return self._data
+
+    def dump(self, data):
+        with open(self._path, 'w') as file:
+            yaml.dump(data, file)
+        self._data = data
+        self._mtime = os.stat(self._path).st_mtime_ns
+
+    def pin(self, data):
+        self._data = data
+        self._pinned = True
+
+    def unpin(self):
+        self._pinned = False
+        self._data = None
+
+
+_game_config_file = CachedYamlFile(GAME_CONFIG_PATH)
+_saved_data_file = CachedYamlFile(SAVED_DATA_PATH, default={})
+_game_config_overrides = {}
+
+
 def read_game_config():
-    game_config_file_name = 'game_config.yaml'
-    with open(
-        os.path.join(
-            os.path.dirname(__file__),
-            os.path.pardir,
-            game_config_file_name
-        ),
-        'r'
-    ) as file:
-        game_config = yaml.safe_load(file)
-        for key in ('WIDTH', 'HEIGHT', 'SQUARE_SIZE', 'START_FPS'):
-            if key not in game_config:
-                raise ValueError(f'{game_config_file_name} file format wrong. Missing key {key}')
-
-        WIDTH = game_config['WIDTH']
-        HEIGHT = game_config['HEIGHT']
-        SQUARE_SIZE = game_config['SQUARE_SIZE']
-        START_FPS = game_config['START_FPS']
-
-        return WIDTH, HEIGHT, SQUARE_SIZE, START_FPS
+    game_config_file_name = os.path.basename(GAME_CONFIG_PATH)
+    game_config = _game_config_file.load()
+    for key in ('WIDTH', 'HEIGHT', 'SQUARE_SIZE', 'START_FPS'):
+        if key not in game_config:
+            raise ValueError(f'{game_config_file_name} file format wrong. Missing key {key}')
+
+    WIDTH = _game_config_overrides.get('WIDTH', game_config['WIDTH'])
+    HEIGHT = _game_config_overrides.get('HEIGHT', game_config['HEIGHT'])
+    SQUARE_SIZE = _game_config_overrides.get('SQUARE_SIZE', game_config['SQUARE_SIZE'])
+    START_FPS = _game_config_overrides.get('START_FPS', game_config['START_FPS'])
+
+    return WIDTH, HEIGHT, SQUARE_SIZE, START_FPS
+
+def set_game_config_overrides(width=None, height=None, square_size=None, start_fps=None):
+    _game_config_overrides.clear()
+    for key, value in (('WIDTH', width), ('HEIGHT', height), ('SQUARE_SIZE', square_size), ('START_FPS', start_fps)):
+        if value is not None:
+            _game_config_overrides[key] = value
+
+def get_game_config_state():
+    return dict(_game_config_file.load()), dict(_game_config_overrides)
+
+def init_game_config(state):
+    # Used as a multiprocessing pool initializer, so that workers never read game_config.yaml themselves
+    game_config, overrides = state
+    _game_config_file.pin(game_config)
+    _game_config_overrides.clear()
+    _game_config_overrides.update(overrides)
 
 def get_highscore():
-    try:
-        with open(os.path.join(os.path.dirname(__file__), os.path.pardir, 'saved_data.yaml'), 'r') as file:
-            return yaml.safe_load(file).get('highscore', 0)
-    except FileNotFoundError:
-        return 0
+    return _saved_data_file.load().get('highscore', 0)
+
+def set_highscore(score):
+    if score != get_highscore():
+        _saved_data_file.dump({**_saved_data_file.load(), 'highscore': score})
+
+# Latest checkpoint per directory, along with the directory's modification time when it was found
+_checkpoint_names = {}
 
 def get_checkpoint_name(path):
+    # A directory's modification time changes whenever a file is added, removed or renamed in it
+    mtime = os.stat(path).st_mtime_ns
+    cached = _checkpoint_names.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
     dirs = os.listdir(path)
     result = None
     for d in dirs:
         if d.startswith('neat-checkpoint-') and (result is None or int(d[16:]) > int(result[16:])):
             result = d
+    _checkpoint_names[path] = (mtime, result)
     return result
@@ -0,0 +1,69 @@
+import os.path
+import sys
+
+import neat
+import numpy as np
+import pytest
+
+# The modules in src import each other as top level modules, like when running from src
+SRC_PATH = os.path.join(os.path.dirname(__file__), os.path.pardir, 'src')
+sys.path.insert(0, SRC_PATH)
+
+from batch_game import DIRECTIONS, NO_ACTION
+from directions import TURNS
+from utils import set_game_config_overrides
+
+
+NEAT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), os.path.pardir, 'neat_config.txt')
+
+
+@pytest.fixture
+def small_board():
+    """Shrinks the board to 12 by 10 squares, so that games are short and snakes soon take up much of it."""
+    set_game_config_overrides(width=12 * 30, height=10 * 30, square_size=30)
+    yield
+    set_game_config_overrides()
+
+
+@pytest.fixture
+def neat_config() -> neat.Config:
+    """A config of its own for every test, unlike nn_archive.load_neat_config, so tests can change it."""
+    return neat.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        NEAT_CONFIG_PATH
+    )
+
+
+class Scripted:
+    """Controller that plays a fixed list of relative actions, STRAIGHT, RIGHT_TURN or LEFT_TURN."""
+    def __init__(self, actions):
+        self.actions = actions
+        self.i = 0
+
+    def get_response(self, game):
+        action = self.actions[self.i]
+        self.i += 1
+        return game.relative_move(action)
+
+
+def _safe_actions(batch, rng):
+    # Random relative actions that prefer free cells and food, so snakes grow and games last hundreds of moves
+    n_y = batch.shape[1]
+    heading = np.where(batch.direction == NO_ACTION, 0, batch.direction)
+    directions = (heading[:, None] + np.array(TURNS)) % len(DIRECTIONS)
+    cells = batch.head[:, None] + DIRECTIONS[directions, 0] * n_y + DIRECTIONS[directions, 1]
+    cells = np.clip(cells, 0, batch.shape[0] * n_y - 1)
+    wanted = batch.is_free(cells) + (cells == batch.food_cell[:, None])
+    return np.argmax(wanted + rng.random(cells.shape), axis=1)
+
+
+def play(batch, rng):
+    """Plays every board to the end, returning the relative actions taken, one row per board."""
+    actions = []
+    while batch.running.any():
+        actions.append(_safe_actions(batch, rng))
+        batch.step(batch.relative_directions(actions[-1]))
+    return np.array(actions).T
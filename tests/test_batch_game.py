@@ -0,0 +1,48 @@
+from batch_game import BatchGame
+from game_core import GameCore
+
+from conftest import Scripted, _safe_actions, play
+
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('num_obstacles, start_len', [(0, 1), (0, 20), (8, 1), (8, 5)])
+def test_boards_play_out_like_game_core(small_board, num_obstacles, start_len):
+    n = 24
+    batch = BatchGame(n, num_obstacles=num_obstacles, start_len=start_len, seeds=range(n))
+    actions = play(batch, np.random.default_rng(num_obstacles * 100 + start_len))
+
+    for b in range(n):
+        game = GameCore(Scripted(actions[b]), num_obstacles=num_obstacles, start_len=start_len, fps=np.inf, seed=b)
+        while game.running:
+            game.loop()
+        assert (batch.score[b], batch.moves[b], batch.cause_of_death[b]) == (game.score, game.moves, game.cause_of_death)
+
+
+def test_reset_replays_the_same_boards(small_board):
+    n = 8
+    batch = BatchGame(n, num_obstacles=4, seeds=range(n))
+    obstacles, food = batch.obstacles.copy(), batch.food_cell.copy()
+    actions = play(batch, np.random.default_rng(0))
+    score, moves = batch.score.copy(), batch.moves.copy()
+
+    batch.reset(range(n))
+    assert np.array_equal(batch.obstacles, obstacles)
+    assert np.array_equal(batch.food_cell, food)
+    for step in range(actions.shape[1]):
+        batch.step(batch.relative_directions(actions[:, step]))
+    assert not batch.running.any()
+    assert np.array_equal(batch.score, score)
+    assert np.array_equal(batch.moves, moves)
+
+
+def test_head_is_never_free(small_board):
+    # Following the tail moves the head into the cell the tail just left, which must stay taken
+    n = 24
+    batch = BatchGame(n, start_len=6, seeds=range(n))
+    rng = np.random.default_rng(1)
+    while batch.running.any():
+        batch.step(batch.relative_directions(_safe_actions(batch, rng)))
+        running = batch.running
+        assert not batch.is_free(batch.head[:, None])[running].any()
@@ -0,0 +1,84 @@
+from checkpointer import AsyncCheckpointer, read_checkpoint, restore_checkpoint
+
+import os
+import random
+
+import neat
+import pytest
+
+
+def _genes(genome):
+    nodes = sorted((key, n.bias, n.response, n.activation, n.aggregation) for key, n in genome.nodes.items())
+    connections = sorted((key, c.weight, c.enabled) for key, c in genome.connections.items())
+    return nodes, connections, genome.fitness
+
+
+def _species(species_set):
+    return {sid: (s.representative.key, sorted(s.members)) for sid, s in species_set.species.items()}
+
+
+@pytest.fixture
+def population(neat_config):
+    random.seed(0)
+    population = neat.Population(neat_config)
+    for genome in population.population.values():
+        genome.fitness = random.random()
+    return population
+
+
+def test_restore_matches_saved_population(population, tmp_path):
+    prefix = str(tmp_path / 'neat-checkpoint-')
+    with AsyncCheckpointer(None, None, prefix) as checkpointer:
+        checkpointer.save_checkpoint(population.config, population.population, population.species, 3)
+        random_state = random.getstate()
+    random.random()
+
+    restored = restore_checkpoint(f'{prefix}3')
+    assert restored.generation == 3
+    assert random.getstate() == random_state
+    assert restored.population.keys() == population.population.keys()
+    for key, genome in population.population.items():
+        assert _genes(restored.population[key]) == _genes(genome)
+    assert _species(restored.species) == _species(population.species)
+    # New genomes get keys after the restored ones
+    assert next(restored.reproduction.genome_indexer) > max(population.population)
+
+
+def test_unchanged_genomes_are_stored_once(population, tmp_path):
+    prefix = str(tmp_path / 'neat-checkpoint-')
+    with AsyncCheckpointer(None, None, prefix) as checkpointer:
+        checkpointer.save_checkpoint(population.config, population.population, population.species, 1)
+        checkpointer.flush()
+        stored = set(os.listdir(tmp_path / 'genomes'))
+
+        # Fitness is kept in the manifest, so re-evaluated survivors are not stored again
+        for genome in population.population.values():
+            genome.fitness = random.random()
+        checkpointer.save_checkpoint(population.config, population.population, population.species, 2)
+
+    assert set(os.listdir(tmp_path / 'genomes')) == stored
+    generation, config, genomes, species_set, random_state = read_checkpoint(f'{prefix}2')
+    for key, genome in population.population.items():
+        assert _genes(genomes[key]) == _genes(genome)
+
+
+def test_reads_neat_checkpoints(population, tmp_path):
+    prefix = str(tmp_path / 'neat-checkpoint-')
+    neat.Checkpointer(filename_prefix=prefix).save_checkpoint(
+        population.config, population.population, population.species, 5
+    )
+
+    restored = restore_checkpoint(f'{prefix}5')
+    assert restored.generation == 5
+    for key, genome in population.population.items():
+        assert _genes(restored.population[key]) == _genes(genome)
+
+
+def test_write_errors_are_raised(population, tmp_path):
+    # The genomes directory cannot be created inside a file
+    (tmp_path / 'run').write_text('')
+    checkpointer = AsyncCheckpointer(None, None, str(tmp_path / 'run' / 'neat-checkpoint-'))
+    checkpointer.save_checkpoint(population.config, population.population, population.species, 1)
+    with pytest.raises(RuntimeError):
+        checkpointer.flush()
+    checkpointer.close()
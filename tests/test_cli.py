@@ -0,0 +1,95 @@
+import cli
+import islands
+import train_ai
+
+import argparse
+import json
+
+import pytest
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """The (config_dir, settings) of every training run the CLI starts, without training."""
+    runs = []
+    monkeypatch.setattr(train_ai, 'run', lambda config_dir, n, settings: runs.append((config_dir, settings)))
+    monkeypatch.setattr(
+        islands, 'run_islands', lambda config_dir, n, settings, **kwargs: runs.append((config_dir, settings, kwargs))
+    )
+    return runs
+
+
+@pytest.mark.parametrize('text, seconds', [('90', 90), ('90s', 90), ('1.5m', 90), ('12h', 43200), ('2d', 172800)])
+def test_duration(text, seconds):
+    assert cli.duration(text) == seconds
+
+
+def test_invalid_duration():
+    with pytest.raises(argparse.ArgumentTypeError):
+        cli.duration('soon')
+
+
+def test_train_defaults(runs, tmp_path):
+    cli.main(['train', '--checkpoint-dir', str(tmp_path)])
+    [(config_dir, settings)] = runs
+    assert config_dir == cli.TRAINING_DEFAULTS['config_dir']
+    assert settings.num_obstacles == 100
+    assert settings.until_generation == 250
+    assert settings.multiprocess and settings.num_workers is None
+    assert not settings.use_curriculum
+    assert not settings.continue_from_checkpoint
+
+    saved = json.loads((tmp_path / cli.RUN_SETTINGS_NAME).read_text())
+    assert saved == {**cli.TRAINING_DEFAULTS, 'checkpoint_dir': str(tmp_path), 'config_dir': saved['config_dir']}
+
+
+def test_train_options(runs, tmp_path):
+    cli.main([
+        'train', '--checkpoint-dir', str(tmp_path), '--workers', '0', '--forever', '--sensors', 'rays', 'space',
+        '--obstacles', '0', '--max-time', '2h'
+    ])
+    settings = runs[0][1]
+    assert not settings.multiprocess
+    assert settings.until_generation is None
+    assert settings.sensors == ('rays', 'space')
+    assert settings.num_obstacles == 0
+    assert settings.max_time == 7200
+
+
+def test_train_refuses_to_overwrite_a_run(runs, tmp_path):
+    (tmp_path / 'neat-checkpoint-4').write_bytes(b'')
+    with pytest.raises(SystemExit):
+        cli.main(['train', '--checkpoint-dir', str(tmp_path)])
+    cli.main(['train', '--checkpoint-dir', str(tmp_path), '--continue'])
+    assert runs[0][1].continue_from_checkpoint
+
+
+def test_resume_overrides_only_given_settings(runs, tmp_path):
+    cli.main(['train', '--checkpoint-dir', str(tmp_path), '--obstacles', '7', '--seed', '3', '--episodes', '4'])
+    (tmp_path / 'neat-checkpoint-9').write_bytes(b'')
+    cli.main(['resume', '--checkpoint-dir', str(tmp_path), '--episodes', '2', '--generations', '500'])
+
+    settings = runs[1][1]
+    assert settings.continue_from_checkpoint
+    assert (settings.num_obstacles, settings.seed) == (7, 3)
+    assert (settings.episodes, settings.until_generation) == (2, 500)
+    # The overrides are saved, so the next resume keeps them
+    assert json.loads((tmp_path / cli.RUN_SETTINGS_NAME).read_text())['episodes'] == 2
+
+
+def test_resume_needs_checkpoints(runs, tmp_path):
+    with pytest.raises(SystemExit):
+        cli.main(['resume', '--checkpoint-dir', str(tmp_path)])
+    assert runs == []
+
+
+def test_islands_resume_from_island_checkpoints(runs, tmp_path):
+    cli.main(['train', '--checkpoint-dir', str(tmp_path), '--islands', '3', '--migrants', '4'])
+    config_dir, settings, kwargs = runs[0]
+    assert kwargs['num_islands'] == 3 and kwargs['num_migrants'] == 4
+    assert kwargs['checkpoint_root'] == str(tmp_path)
+
+    (tmp_path / 'island-2').mkdir()
+    (tmp_path / 'island-2' / 'neat-checkpoint-5').write_bytes(b'')
+    cli.main(['resume', '--checkpoint-dir', str(tmp_path)])
+    assert runs[1][2]['num_islands'] == 3
@@ -0,0 +1,57 @@
+from compiled_network import CompiledNetwork, CompiledNetworkBatch, ACTIVATIONS
+
+import random
+
+import neat
+import numpy as np
+import pytest
+
+
+def _genomes(config, n, mutations, seed):
+    # Genomes mutated well past the initial topology, with every activation function the compiled networks know
+    random.seed(seed)
+    genome_config = config.genome_config
+    genome_config.activation_options = list(ACTIVATIONS)
+    genome_config.activation_mutate_rate = 0.5
+    genome_config.node_add_prob = 0.5
+    genome_config.conn_add_prob = 0.5
+    genomes = []
+    for key in range(n):
+        genome = neat.DefaultGenome(key)
+        genome.configure_new(genome_config)
+        for _ in range(mutations):
+            genome.mutate(genome_config)
+        genomes.append(genome)
+    return genomes
+
+
+@pytest.mark.parametrize('mutations', [0, 10, 40])
+def test_activate_matches_feed_forward_network(neat_config, mutations):
+    rng = np.random.default_rng(mutations)
+    for genome in _genomes(neat_config, 30, mutations, seed=mutations):
+        expected_network = neat.nn.FeedForwardNetwork.create(genome, neat_config)
+        network = CompiledNetwork.create(genome, neat_config)
+        inputs = rng.normal(size=(5, network.num_inputs))
+        expected = [expected_network.activate(list(row)) for row in inputs]
+
+        for row, outputs in zip(inputs, expected):
+            assert np.allclose(network.activate(list(row)), outputs)
+        assert np.allclose(network.activate_batch(inputs), expected)
+
+
+def test_network_batch_matches_each_network(neat_config):
+    genomes = _genomes(neat_config, 20, 25, seed=1)
+    networks = [CompiledNetwork.create(genome, neat_config) for genome in genomes]
+    inputs = np.random.default_rng(1).normal(size=(len(networks), networks[0].num_inputs))
+
+    outputs = CompiledNetworkBatch(networks).activate(inputs)
+    for network, row, output in zip(networks, inputs, outputs):
+        assert np.allclose(output, network.activate(list(row)))
+
+
+def test_wrong_number_of_inputs_is_rejected(neat_config):
+    network = CompiledNetwork.create(_genomes(neat_config, 1, 0, seed=0)[0], neat_config)
+    with pytest.raises(RuntimeError):
+        network.activate([0.0] * (network.num_inputs + 1))
+    with pytest.raises(RuntimeError):
+        network.activate_batch(np.zeros((2, network.num_inputs + 1)))
@@ -0,0 +1,83 @@
+from batch_game import BatchGame
+from connectivity import region_sizes_batch
+from game_core import GameCore
+
+from conftest import Scripted, play
+
+from collections import deque
+
+import numpy as np
+
+
+def _neighbours(cell, step):
+    x, y = cell
+    return (x, y - step), (x + step, y), (x, y + step), (x - step, y)
+
+
+def _bfs_regions(free, step):
+    """The region of every cell in the set free, flooding up, down, left and right in steps of step."""
+    regions = {}
+    for start in free:
+        if start in regions:
+            continue
+        region = {start}
+        queue = deque([start])
+        while queue:
+            for neighbour in _neighbours(queue.popleft(), step):
+                if neighbour in free and neighbour not in region:
+                    region.add(neighbour)
+                    queue.append(neighbour)
+        region = frozenset(region)
+        for cell in region:
+            regions[cell] = region
+    return regions
+
+
+def test_connectivity_matches_bfs(small_board):
+    # Long snakes on a small board cut it into pieces, which exercises splits as well as merges
+    n = 8
+    batch = BatchGame(n, num_obstacles=6, start_len=30, seeds=range(n))
+    actions = play(batch, np.random.default_rng(2))
+
+    for b in range(n):
+        game = GameCore(Scripted(actions[b]), num_obstacles=6, start_len=30, fps=np.inf, seed=b)
+        connectivity = game.connectivity
+        while game.running:
+            free = set(game.empty_squares)
+            regions = _bfs_regions(free, game.square_size)
+            for cell in free:
+                assert connectivity.region_size(cell) == len(regions[cell])
+            # Before the first move the start cell still counts as free
+            head = game.snake.head
+            if head not in free:
+                around = {regions[cell] for cell in _neighbours(head, game.square_size) if cell in free}
+                assert connectivity.reachable(head) == sum(map(len, around))
+            game.loop()
+
+
+def test_region_sizes_batch_matches_bfs():
+    rng = np.random.default_rng(3)
+    free = rng.random((20, 15, 12)) < np.linspace(0.3, 0.8, 20)[:, None, None]
+    sizes = region_sizes_batch(free)
+
+    for board, board_sizes in zip(free, sizes):
+        cells = set(zip(*np.nonzero(board)))
+        regions = _bfs_regions(cells, 1)
+        expected = np.zeros_like(board_sizes)
+        for cell, region in regions.items():
+            expected[cell] = len(region)
+        assert np.array_equal(board_sizes, expected)
+
+
+def test_batch_connectivity_follows_region_sizes_batch(small_board):
+    n = 16
+    batch = BatchGame(n, num_obstacles=6, start_len=30, seeds=range(n))
+    actions = play(batch, np.random.default_rng(4))
+
+    batch.reset(range(n))
+    connectivity = batch.connectivity
+    every_cell = np.tile(np.arange(batch.shape[0] * batch.shape[1]), (n, 1))
+    for step in range(actions.shape[1]):
+        batch.step(batch.relative_directions(actions[:, step]))
+        expected = region_sizes_batch(batch.empty_squares).reshape(n, -1)
+        assert np.array_equal(connectivity.region_sizes(every_cell), expected), step
@@ -0,0 +1,106 @@
+from curriculum import Curriculum, Stage, parse_stage, read_curriculum
+from evaluation import EpisodeSchedule
+from utils import get_game_config_state, read_game_config, set_game_config_overrides
+
+import pickle
+
+import pytest
+
+
+class _Genome:
+    def __init__(self, fitness):
+        self.fitness = fitness
+
+
+def _generation(curriculum, generation, best_fitness):
+    curriculum.start_generation(generation)
+    curriculum.post_evaluate(None, {}, None, _Genome(best_fitness))
+
+
+@pytest.mark.parametrize('text, stage', [
+    ('full', Stage()),
+    ('12x10', Stage(12, 10)),
+    ('24x18 obstacles=20 start_len=3 promote=12.5', Stage(24, 18, num_obstacles=20, start_len=3, promote=12.5)),
+    ('full promote=4', Stage(promote=4)),
+])
+def test_parse_stage(text, stage):
+    assert parse_stage(text) == stage
+
+
+@pytest.mark.parametrize('text', ['12', '12xbig', '12x12 speed=3', '12x12 obstacles=many'])
+def test_parse_stage_rejects_bad_stages(text):
+    with pytest.raises(ValueError):
+        parse_stage(text)
+
+
+def test_read_curriculum(tmp_path):
+    path = tmp_path / 'neat_config.txt'
+    path.write_text('[Curriculum]\nstages =\n    8x8 promote=2\n\n    full obstacles=5\npromote_generations = 2\n')
+    curriculum = read_curriculum(path)
+    assert curriculum.stages == [Stage(8, 8, promote=2), Stage(num_obstacles=5)]
+    assert curriculum.promote_generations == 2
+
+    path.write_text('[Curriculum]\nstages =\n')
+    assert read_curriculum(path) is None
+    path.write_text('[Sensors]\nsensors = rays\n')
+    assert read_curriculum(path) is None
+
+
+def test_promotion_needs_a_streak():
+    schedule = EpisodeSchedule(episodes=2, base_seed=0)
+    schedule.threshold = 3.0
+    curriculum = Curriculum([Stage(promote=5), Stage(promote=8), Stage()], promote_generations=2, schedule=schedule)
+    with curriculum:
+        _generation(curriculum, 0, 6)
+        _generation(curriculum, 1, 4)
+        _generation(curriculum, 2, 6)
+        assert curriculum.stage_index == 0
+        assert schedule.threshold == 3.0
+
+        _generation(curriculum, 3, 5)
+        assert curriculum.stage_index == 1
+        assert curriculum.streak == 0
+        assert schedule.threshold is None
+
+        for generation in range(4, 10):
+            _generation(curriculum, generation, 100)
+        # The last stage is never left
+        assert curriculum.stage_index == 2
+        assert curriculum.history == [(3, 1), (5, 2)]
+
+
+def test_stage_board_is_applied_and_restored():
+    set_game_config_overrides(start_fps=20)
+    try:
+        curriculum = Curriculum([Stage(12, 10, promote=1), Stage()])
+        with curriculum:
+            _generation(curriculum, 0, 0)
+            width, height, square_size, fps = read_game_config()
+            assert (width, height, fps) == (12 * square_size, 10 * square_size, 20)
+
+            # The full board stage keeps only the overrides that were there before
+            _generation(curriculum, 1, 1)
+            curriculum.start_generation(2)
+            assert get_game_config_state()[1] == {'START_FPS': 20}
+            curriculum.stage_index = 0
+            curriculum.start_generation(3)
+        assert get_game_config_state()[1] == {'START_FPS': 20}
+    finally:
+        set_game_config_overrides()
+
+
+def test_resume_keeps_progress_only_for_the_same_stages():
+    stages = [Stage(8, 8, promote=1), Stage()]
+    previous = Curriculum(stages, schedule=EpisodeSchedule())
+    previous.stage_index, previous.streak, previous.history = 1, 0, [(7, 1)]
+    # Checkpoints pickle the curriculum along with the config
+    previous = pickle.loads(pickle.dumps(previous))
+    assert previous.schedule is None
+
+    resumed = Curriculum(list(stages))
+    resumed.resume(previous)
+    assert (resumed.stage_index, resumed.history) == (1, [(7, 1)])
+
+    changed = Curriculum([Stage(10, 10, promote=1), Stage()])
+    changed.resume(previous)
+    assert changed.stage_index == 0
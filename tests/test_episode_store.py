@@ -0,0 +1,96 @@
+from batch_game import CAUSES_OF_DEATH
+from episode_store import ROW_DTYPE, EpisodeStore, EpisodeStoreReporter
+import episode_store
+import train_ai
+
+from conftest import NEAT_CONFIG_PATH
+
+from types import SimpleNamespace
+import json
+import re
+
+import numpy as np
+import pytest
+
+
+def _rows(generation, count):
+    rows = np.zeros(count, dtype=ROW_DTYPE)
+    rows['generation'] = generation
+    rows['genome_id'] = np.arange(count)
+    rows['score'] = np.arange(count) * 2
+    rows['cause_of_death'] = np.arange(count) % len(CAUSES_OF_DEATH)
+    rows['fitness'] = np.linspace(0, 1, count)
+    return rows
+
+
+def test_rows_survive_reopening(tmp_path):
+    store = EpisodeStore(tmp_path / 'episodes', writable=True)
+    store.append(_rows(0, 5))
+    store.append(_rows(1, 3))
+
+    reader = EpisodeStore(tmp_path / 'episodes')
+    assert len(reader) == 8
+    assert np.array_equal(reader.column('generation'), [0] * 5 + [1] * 3)
+    assert np.array_equal(reader.column('score'), [0, 2, 4, 6, 8, 0, 2, 4])
+    assert np.allclose(reader.mean_by_generation('score'), [4, 2])
+    assert reader.causes_by_generation().sum(axis=1).tolist() == [5, 3]
+
+    # Appending again is seen by readers that are already open
+    store.append(_rows(2, 1))
+    assert len(reader) == 9
+
+
+def test_torn_append_is_cut_off_when_reopened_for_writing(tmp_path):
+    store = EpisodeStore(tmp_path, writable=True)
+    store.append(_rows(0, 4))
+    # A crash after writing only some of the columns of the next batch
+    with open(tmp_path / 'generation.bin', 'ab') as file:
+        file.write(np.zeros(2, dtype='<i4').tobytes())
+    assert len(EpisodeStore(tmp_path)) == 4
+
+    EpisodeStore(tmp_path, writable=True).append(_rows(1, 2))
+    assert np.array_equal(EpisodeStore(tmp_path).column('generation'), [0, 0, 0, 0, 1, 1])
+
+
+def test_opening(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        EpisodeStore(tmp_path / 'missing')
+    empty = EpisodeStore(tmp_path / 'empty', writable=True)
+    assert len(empty) == 0
+    assert empty.column('fitness').dtype == np.float64
+    assert empty.causes_by_generation().shape == (0, len(CAUSES_OF_DEATH))
+
+    schema = json.loads((tmp_path / 'empty' / 'schema.json').read_text())
+    schema['columns'].pop()
+    (tmp_path / 'empty' / 'schema.json').write_text(json.dumps(schema))
+    with pytest.raises(ValueError):
+        EpisodeStore(tmp_path / 'empty')
+
+
+def test_reporter_adds_generation_and_species(tmp_path):
+    species = SimpleNamespace(genome_to_species={1: 10, 2: 20})
+    with EpisodeStoreReporter(tmp_path) as reporter:
+        assert episode_store.active is reporter.log
+        reporter.start_generation(4)
+        episode_store.active.add(1, 3, 40, CAUSES_OF_DEATH[0], 1.5, 0.1)
+        episode_store.active.add(2, 5, 60, CAUSES_OF_DEATH[1], 2.5, 0.2)
+        reporter.post_evaluate(None, {}, species, None)
+    assert episode_store.active is None
+
+    columns = EpisodeStore(tmp_path).columns()
+    assert columns['generation'].tolist() == [4, 4]
+    assert columns['species'].tolist() == [10, 20]
+    assert columns['moves'].tolist() == [40, 60]
+
+
+def test_training_stores_every_episode(small_board, tmp_path):
+    text = re.sub(r'^pop_size\s*=.*$', 'pop_size = 20', open(NEAT_CONFIG_PATH).read(), flags=re.MULTILINE)
+    (tmp_path / 'neat_config.txt').write_text(text)
+    train_ai.run(
+        tmp_path, 2, draw=False, multiprocess=False, handle_sigint=False, checkpoint_freq=None, episodes=2, seed=0,
+        checkpoint_dir=str(tmp_path / 'checkpoints'), output_path=str(tmp_path / 'winner.pkl'),
+        episode_store_path=str(tmp_path / 'episodes')
+    )
+    assert episode_store.active is None
+    store = EpisodeStore(tmp_path / 'episodes')
+    assert np.bincount(store.column('generation')).tolist() == [40, 40]
@@ -0,0 +1,105 @@
+from evaluation import EpisodeSchedule, aggregate_fitness, cannot_reach, generation_seeds
+import cli
+import train_ai
+
+import itertools
+
+import numpy as np
+import pytest
+
+
+def _best_case(fitnesses, episodes, aggregation, quantile, max_fitness):
+    # The remaining episodes can do no better than max_fitness each
+    return aggregate_fitness(list(fitnesses) + [max_fitness] * (episodes - len(fitnesses)), aggregation, quantile)
+
+
+@pytest.mark.parametrize('aggregation, quantile, max_fitness', [
+    ('mean', 0.5, 3.0), ('min', 0.5, None), ('quantile', 0.25, None), ('quantile', 0.5, None), ('quantile', 0.9, None)
+])
+def test_cannot_reach_never_abandons_a_genome_that_could_reach(aggregation, quantile, max_fitness):
+    # Only abandoning when even the best case of the remaining episodes stays below the threshold, min and quantile
+    # take no bound so any large enough score stands in for an unbounded episode. The quantile check only counts the
+    # episodes below the threshold, so unlike mean and min it may keep playing a genome that is already lost
+    bound = {} if max_fitness is None else {'max_fitness': max_fitness}
+    best = 1e9 if max_fitness is None else max_fitness
+    values = (0.0, 1.0, 2.0, 3.0)
+    for episodes in range(2, 6):
+        for played in range(1, episodes):
+            for fitnesses in itertools.product(values, repeat=played):
+                for threshold in (0.5, 1.5, 2.5, 3.5):
+                    expected = _best_case(fitnesses, episodes, aggregation, quantile, best) < threshold
+                    abandoned = cannot_reach(fitnesses, episodes, threshold, aggregation, quantile, **bound)
+                    if aggregation == 'quantile':
+                        assert expected or not abandoned, (fitnesses, episodes, threshold)
+                    else:
+                        assert abandoned == expected, (fitnesses, episodes, threshold)
+
+
+def test_quantile_interpolation():
+    # The median of 4 episodes sits halfway between the 2nd and 3rd, so two low episodes are not yet enough
+    assert not cannot_reach([1.0, 1.0], 4, 2.0, 'quantile', 0.5)
+    assert not cannot_reach([1.0, 1.0, 3.0], 4, 2.0, 'quantile', 0.5)
+    assert cannot_reach([1.0, 1.0, 1.0], 4, 2.0, 'quantile', 0.5)
+    assert cannot_reach([1.0], 3, 2.0, 'min')
+
+
+def test_mean_is_only_abandoned_with_a_bound():
+    assert not cannot_reach([0.0, 0.0, 0.0], 4, 100.0, 'mean')
+    assert cannot_reach([0.0, 0.0, 0.0], 4, 100.0, 'mean', max_fitness=300.0)
+
+
+def test_invalid_aggregation():
+    with pytest.raises(ValueError):
+        aggregate_fitness([1.0], 'max')
+    with pytest.raises(ValueError):
+        cannot_reach([1.0], 2, 1.0, 'max')
+
+
+def test_generation_seeds():
+    assert generation_seeds(3, 2, None) == [None, None]
+    assert generation_seeds(3, 4, 7) == generation_seeds(3, 4, 7)
+    assert generation_seeds(3, 4, 7) != generation_seeds(4, 4, 7)
+    assert generation_seeds(3, 4, 7) != generation_seeds(3, 4, 8)
+    assert len(set(generation_seeds(0, 10, 1))) == 10
+
+
+def test_schedule_reseeds_every_interval():
+    schedule = EpisodeSchedule(episodes=3, base_seed=5, reseed_interval=3)
+    seeds = []
+    for generation in range(7):
+        schedule.start_generation(generation)
+        seeds.append(tuple(schedule.seeds))
+    assert seeds[0] == seeds[1] == seeds[2] != seeds[3] == seeds[4] == seeds[5] != seeds[6]
+
+
+class _Genome:
+    def __init__(self, fitness):
+        self.fitness = fitness
+
+
+def test_schedule_threshold():
+    population = {key: _Genome(float(key)) for key in range(11)}
+    population[11] = _Genome(None)
+    schedule = EpisodeSchedule(elite_quantile=0.8)
+    schedule.post_evaluate(None, population, None, None)
+    assert schedule.threshold == 8.0
+
+    unset = EpisodeSchedule()
+    unset.post_evaluate(None, population, None, None)
+    assert unset.threshold is None
+
+
+@pytest.mark.parametrize('kwargs', [{'episodes': 0}, {'reseed_interval': 0}])
+def test_schedule_rejects_bad_settings(kwargs):
+    with pytest.raises(ValueError):
+        EpisodeSchedule(**kwargs)
+
+
+def test_elite_quantile_needs_an_aggregation_that_abandons(tmp_path, monkeypatch):
+    with pytest.raises(ValueError):
+        train_ai.run(tmp_path, 1, elite_quantile=0.5)
+
+    monkeypatch.setattr(train_ai, 'run', lambda *args: None)
+    with pytest.raises(SystemExit):
+        cli.main(['train', '--checkpoint-dir', str(tmp_path), '--elite-quantile', '0.5'])
+    cli.main(['train', '--checkpoint-dir', str(tmp_path), '--elite-quantile', '0.5', '--aggregation', 'min'])
@@ -0,0 +1,136 @@
+from evaluation import EpisodeSchedule
+from fitness_cache import FitnessCache, genome_digest
+
+import copy
+import random
+
+import neat
+import pytest
+
+
+class _Fitness:
+    """Fitness function that scores genomes by their first connection weight and remembers which keys it played."""
+    def __init__(self):
+        self.played = []
+
+    def __call__(self, genomes, config):
+        for genome_id, genome in genomes:
+            self.played.append(genome_id)
+            genome.fitness = 10 + min(cg.weight for cg in genome.connections.values())
+
+
+@pytest.fixture
+def genomes(neat_config):
+    random.seed(0)
+    genomes = []
+    for key in range(1, 6):
+        genome = neat.DefaultGenome(key)
+        genome.configure_new(neat_config.genome_config)
+        genomes.append((key, genome))
+    return genomes
+
+
+def _clone(genome, key):
+    clone = copy.deepcopy(genome)
+    clone.key = key
+    clone.fitness = None
+    return clone
+
+
+def test_digest_ignores_keys_fitness_and_disabled_connections(genomes):
+    genome = genomes[0][1]
+    clone = _clone(genome, 99)
+    clone.fitness = 3.0
+    assert genome_digest(clone) == genome_digest(genome)
+
+    next(iter(clone.connections.values())).weight += 1
+    assert genome_digest(clone) != genome_digest(genome)
+    next(iter(clone.connections.values())).enabled = False
+    next(iter(genome.connections.values())).enabled = False
+    assert genome_digest(clone) == genome_digest(genome)
+
+
+def test_hits_skip_evaluation(genomes, neat_config):
+    cache = FitnessCache(EpisodeSchedule(episodes=2, base_seed=1))
+    fitness = _Fitness()
+    evaluate = cache.wrap(fitness)
+    evaluate(genomes, neat_config)
+    expected = {key: genome.fitness for key, genome in genomes}
+
+    # Survivors and clones of the same generation are both looked up, and clones of a miss wait for it
+    clones = [(key + 100, _clone(genome, key + 100)) for key, genome in genomes]
+    twin = _clone(genomes[0][1], 200)
+    next(iter(twin.connections.values())).weight += 5
+    twins = [(200, twin), (201, _clone(twin, 201))]
+    fitness.played.clear()
+    evaluate(clones + twins, neat_config)
+    assert fitness.played == [200]
+    assert {key - 100: genome.fitness for key, genome in clones} == expected
+    assert twins[1][1].fitness == twins[0][1].fitness
+    assert cache.last_stats['memory_hits'] == 6
+
+
+def test_new_seeds_or_context_miss(genomes, neat_config):
+    schedule = EpisodeSchedule(episodes=1, base_seed=1)
+    cache = FitnessCache(schedule, context=(0, 1))
+    fitness = _Fitness()
+    cache.evaluate(genomes, neat_config, fitness)
+
+    schedule.start_generation(1)
+    cache.evaluate(genomes, neat_config, fitness)
+    assert len(fitness.played) == 2 * len(genomes)
+
+    cache.context = (5, 1)
+    cache.evaluate(genomes, neat_config, fitness)
+    assert len(fitness.played) == 3 * len(genomes)
+
+
+def test_unseeded_episodes_are_never_cached(genomes, neat_config):
+    cache = FitnessCache(EpisodeSchedule(episodes=2))
+    fitness = _Fitness()
+    cache.evaluate(genomes, neat_config, fitness)
+    cache.evaluate(genomes, neat_config, fitness)
+    assert len(fitness.played) == 2 * len(genomes)
+    assert cache.last_stats is None
+
+
+def test_abandoned_genomes_are_not_stored(genomes, neat_config):
+    # Genomes below the threshold may have stopped early, so their fitness is not the full one
+    schedule = EpisodeSchedule(episodes=2, base_seed=1)
+    fitness = _Fitness()
+    fitness(genomes, neat_config)
+    schedule.threshold = sorted(genome.fitness for key, genome in genomes)[2]
+    below = sorted(key for key, genome in genomes if genome.fitness < schedule.threshold)
+
+    cache = FitnessCache(schedule)
+    cache.evaluate([(key, _clone(genome, key)) for key, genome in genomes], neat_config, fitness)
+    fitness.played.clear()
+    cache.evaluate([(key, _clone(genome, key)) for key, genome in genomes], neat_config, fitness)
+    assert sorted(fitness.played) == below
+
+
+def test_least_recently_used_entries_are_evicted(genomes, neat_config):
+    cache = FitnessCache(EpisodeSchedule(base_seed=1), capacity=3)
+    fitness = _Fitness()
+    cache.evaluate(genomes[:3], neat_config, fitness)
+    cache.evaluate(genomes[:1], neat_config, fitness)
+    cache.evaluate(genomes[3:4], neat_config, fitness)
+
+    fitness.played.clear()
+    cache.evaluate(genomes[:4], neat_config, fitness)
+    assert fitness.played == [2]
+
+
+def test_disk_entries_are_shared_between_caches(genomes, neat_config, tmp_path):
+    path = tmp_path / 'cache' / 'fitness.sqlite'
+    fitness = _Fitness()
+    with FitnessCache(EpisodeSchedule(base_seed=1), disk_path=str(path)) as cache:
+        cache.evaluate(genomes, neat_config, fitness)
+
+    fitness.played.clear()
+    clones = [(key, _clone(genome, key)) for key, genome in genomes]
+    with FitnessCache(EpisodeSchedule(base_seed=1), disk_path=str(path)) as cache:
+        cache.evaluate(clones, neat_config, fitness)
+        assert cache.last_stats['disk_hits'] == len(genomes)
+    assert fitness.played == []
+    assert [genome.fitness for key, genome in clones] == [genome.fitness for key, genome in genomes]
@@ -0,0 +1,57 @@
+from free_cells import FreeCells
+
+import random
+
+import pytest
+
+
+def test_matches_a_set_under_random_operations():
+    rng = random.Random(0)
+    cells = FreeCells()
+    expected = set()
+    for _ in range(5000):
+        cell = (rng.randrange(20), rng.randrange(20))
+        operation = rng.random()
+        if operation < 0.5:
+            cells.add(cell)
+            expected.add(cell)
+        elif operation < 0.8:
+            cells.discard(cell)
+            expected.discard(cell)
+        elif cell in expected:
+            cells.remove(cell)
+            expected.remove(cell)
+
+        assert len(cells) == len(expected)
+        assert (cell in cells) == (cell in expected)
+    assert set(cells) == expected
+    assert len(list(cells)) == len(expected)
+
+
+def test_remove_swaps_the_last_cell_into_the_gap():
+    cells = FreeCells('abcd')
+    cells.remove('b')
+    assert list(cells) == ['a', 'd', 'c']
+    cells.remove('c')
+    assert list(cells) == ['a', 'd']
+    cells.add('a')
+    assert list(cells) == ['a', 'd']
+
+
+def test_remove_missing_cell_raises():
+    cells = FreeCells([1, 2])
+    with pytest.raises(KeyError):
+        cells.remove(3)
+    cells.discard(3)
+    assert len(cells) == 2
+
+
+def test_choice_is_uniform_and_repeatable():
+    cells = FreeCells(range(4))
+    cells.remove(0)
+    draws = [cells.choice(random.Random(seed)) for seed in range(3000)]
+    assert set(draws) == {1, 2, 3}
+    assert all(800 < draws.count(cell) < 1200 for cell in (1, 2, 3))
+
+    first = [cells.choice(random.Random(7)) for _ in range(5)]
+    assert first == [cells.choice(random.Random(7)) for _ in range(5)]
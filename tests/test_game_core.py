@@ -0,0 +1,48 @@
+from game_core import GameCore
+from game_controllers.basic_bot_controller import BasicBotController
+
+from conftest import SRC_PATH, Scripted
+
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+
+
+def test_headless_training_never_imports_pygame():
+    # In a fresh interpreter, since the other tests may already have imported pygame into this one
+    script = textwrap.dedent('''
+        import sys
+        from game_controllers.basic_bot_controller import BasicBotController
+        import train_ai
+
+        train_ai.play_episode(BasicBotController(), num_obstacles=5, draw=False, start_len=3, seed=0)
+        print('pygame' in sys.modules)
+    ''')
+    result = subprocess.run([sys.executable, '-c', script], cwd=SRC_PATH, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
+
+
+def test_game_without_drawing_plays_like_game_core(small_board):
+    from game import Game
+
+    rng = np.random.default_rng(0)
+    for seed in range(5):
+        actions = rng.integers(0, 3, size=1000)
+        core = GameCore(Scripted(actions), num_obstacles=6, start_len=3, fps=np.inf, seed=seed)
+        game = Game(Scripted(actions), num_obstacles=6, draw=False, start_len=3, fps=np.inf, seed=seed)
+        for played in (core, game):
+            while played.running:
+                played.loop()
+        assert (game.score, game.moves, game.cause_of_death, game.obstacles) == (core.score, core.moves, core.cause_of_death, core.obstacles)
+        assert list(game.snake.blocks) == list(core.snake.blocks)
+
+
+def test_basic_bot_fills_a_small_board(small_board):
+    # The bot's fixed cycle covers every cell, so its game only ends once the snake fills the 10 by 8 inside
+    game = GameCore(BasicBotController(), fps=np.inf, seed=0)
+    while game.running:
+        game.loop()
+    assert game.cause_of_death == 'All possible squares occupied'
+    assert game.score == 10 * 8 - 2
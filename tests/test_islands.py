@@ -0,0 +1,113 @@
+from islands import FileTransport, Migration, MigrationHub, SocketTransport, merged_leaderboard, run_island
+
+from conftest import NEAT_CONFIG_PATH
+
+import re
+import time
+
+import neat
+import pytest
+
+
+def test_file_transport_delivers_each_batch_once(tmp_path):
+    transport = FileTransport(str(tmp_path))
+    assert transport.receive(1) == []
+    transport.send(0, 1, ['a', 'b'])
+    transport.send(2, 1, ['c'])
+    transport.send(1, 0, ['d'])
+    # Half-written batches keep their temporary name until they are complete
+    (tmp_path / 'island-1' / '.partial.pkl.tmp').write_bytes(b'')
+
+    assert transport.receive(1) == ['a', 'b', 'c']
+    assert transport.receive(1) == []
+    assert transport.receive(0) == ['d']
+
+
+def test_socket_transport_through_a_hub():
+    with MigrationHub(('127.0.0.1', 0), authkey=b'secret') as hub:
+        sender = SocketTransport(hub.address, authkey=b'secret')
+        receiver = SocketTransport(hub.address, authkey=b'secret')
+        sender.send(0, 1, [1, 2])
+        sender.send(0, 1, [3])
+        # The hub serves each connection on its own thread, so the migrants may take a moment to arrive
+        migrants = []
+        deadline = time.monotonic() + 10
+        while len(migrants) < 3 and time.monotonic() < deadline:
+            migrants += receiver.receive(1)
+        assert migrants == [1, 2, 3]
+        assert receiver.receive(1) == []
+        sender.close()
+        receiver.close()
+
+
+class _Outbox:
+    def __init__(self, inbox=()):
+        self.sent = []
+        self.inbox = list(inbox)
+
+    def send(self, source, destination, genomes):
+        self.sent.append((source, destination, genomes))
+
+    def receive(self, destination):
+        inbox, self.inbox = self.inbox, []
+        return inbox
+
+
+def test_fittest_are_sent_to_the_next_island_every_interval(neat_config):
+    population = neat.Population(neat_config)
+    for i, genome in enumerate(population.population.values()):
+        genome.fitness = float(i)
+    outbox = _Outbox()
+    migration = Migration(outbox, island=2, num_islands=3, interval=5, num_migrants=3)
+
+    for generation in range(10):
+        migration.start_generation(generation)
+        migration.post_evaluate(neat_config, population.population, population.species, None)
+    assert [(source, destination) for source, destination, genomes in outbox.sent] == [(2, 0), (2, 0)]
+    top = neat_config.pop_size - 1
+    assert [genome.fitness for genome in outbox.sent[0][2]] == [top, top - 1, top - 2]
+
+
+def test_migrants_replace_offspring_with_fresh_keys(neat_config):
+    home, away = neat.Population(neat_config), neat.Population(neat_config)
+    for genome in away.population.values():
+        genome.mutate(neat_config.genome_config)
+        genome.fitness = 1.0
+    evaluated = list(home.population)[:100]
+    for key in evaluated:
+        home.population[key].fitness = 0.0
+    migrants = list(away.population.values())[:4]
+    highest_node = max(key for genome in migrants for key in genome.nodes)
+
+    migration = Migration(_Outbox(migrants), island=0, num_islands=2, interval=1, num_migrants=3)
+    migration.attach(home)
+    migration.start_generation(1)
+
+    assert len(home.population) == neat_config.pop_size
+    assert set(evaluated) <= home.population.keys()
+    arrived = [genome for genome in home.population.values() if genome in migrants]
+    assert len(arrived) == migration.received == 3
+    assert all(genome.key > max(evaluated) and genome.fitness is None for genome in arrived)
+    assert all(genome.key in home.species.genome_to_species for genome in arrived)
+    assert next(neat_config.genome_config.node_indexer) > highest_node
+
+
+def test_leaderboard_merges_the_islands(small_board, tmp_path):
+    text = re.sub(r'^pop_size\s*=.*$', 'pop_size = 20', open(NEAT_CONFIG_PATH).read(), flags=re.MULTILINE)
+    (tmp_path / 'neat_config.txt').write_text(text)
+    transport = FileTransport(str(tmp_path / 'migration'))
+    for island in range(2):
+        run_island(
+            island, tmp_path, 2, transport, 2, migration_interval=1, num_migrants=2, checkpoint_root=str(tmp_path),
+            draw=False, multiprocess=False, handle_sigint=False, checkpoint_freq=1, seed=0
+        )
+
+    # Checkpoints hold the offspring of the next generation, of which only the elites have been evaluated
+    entries = merged_leaderboard(str(tmp_path), 2, size=50)
+    assert sorted(entry['island'] for entry in entries if entry['generation'] is None) == [0, 1]
+    assert all(entry['generation'] == 1 for entry in entries if entry['generation'] is not None)
+    assert len({(entry['island'], entry['key']) for entry in entries}) == len(entries)
+    fitnesses = [entry['fitness'] for entry in entries]
+    assert fitnesses == sorted(fitnesses, reverse=True)
+    top = merged_leaderboard(str(tmp_path), 2, size=2)
+    assert [(entry['island'], entry['key']) for entry in top] == [(entry['island'], entry['key']) for entry in entries[:2]]
@@ -0,0 +1,53 @@
+from parallel_evaluator import ChunkedParallelEvaluator, balanced_chunks, genome_size
+
+from types import SimpleNamespace
+import random
+
+import neat
+import pytest
+
+
+@pytest.mark.parametrize('count, num_chunks', [(0, 4), (1, 4), (7, 3), (50, 8), (8, 50)])
+def test_balanced_chunks_split_every_genome_once(count, num_chunks):
+    rng = random.Random(count)
+    costs = [rng.randint(1, 100) for _ in range(count)]
+    chunks = balanced_chunks(costs, num_chunks, cost=lambda c: c)
+
+    assert sorted(i for chunk in chunks for i in chunk) == list(range(count))
+    assert len(chunks) == min(num_chunks, count)
+    if chunks:
+        # Greedy assignment keeps every chunk within the largest single cost of the others
+        totals = [sum(costs[i] for i in chunk) for chunk in chunks]
+        assert max(totals) - min(totals) <= max(costs)
+
+
+def _fitness(genome, config, seeds=(None,), threshold=None):
+    # Module level, so that the workers can unpickle it
+    return genome_size(genome) * len(seeds) + (threshold or 0)
+
+
+def test_chunks_come_back_to_the_right_genomes(neat_config):
+    population = neat.Population(neat_config)
+    for genome in list(population.population.values())[::3]:
+        genome.mutate(neat_config.genome_config)
+    genomes = list(population.population.items())
+    schedule = SimpleNamespace(seeds=[1, 2, 3], threshold=0.5)
+
+    with ChunkedParallelEvaluator(2, _fitness, neat_config, schedule=schedule) as evaluator:
+        evaluator.evaluate(genomes, neat_config)
+        assert [genome.fitness for _, genome in genomes] == [_fitness(genome, neat_config, [1, 2, 3], 0.5) for _, genome in genomes]
+        assert evaluator.last_stats['genomes'] == len(genomes)
+        assert evaluator.last_stats['chunks'] == 8
+
+        evaluator.chunk_size = 7
+        evaluator.evaluate(genomes, neat_config)
+        assert evaluator.last_stats['chunks'] == -(-len(genomes) // 7)
+    assert evaluator.pool is None
+
+
+def test_collected_evaluator_terminates_its_pool(neat_config):
+    evaluator = ChunkedParallelEvaluator(1, _fitness, neat_config)
+    pool = evaluator.pool
+    del evaluator
+    # Pool._state is RUN until the pool is closed or terminated
+    assert pool._state != 'RUN'
@@ -0,0 +1,31 @@
+from profiling import ProfilingReporter
+import profiling
+
+import json
+
+
+def test_reporter_profiles_until_closed(tmp_path):
+    path = tmp_path / 'profile.jsonl'
+    with ProfilingReporter(show=False, dump_path=path) as reporter:
+        assert profiling.active is reporter.profiler
+        reporter.start_generation(0)
+        profiling.active.add('controller', 3.0)
+        profiling.active.add('nn_activation', 1.0)
+        profiling.active.count('steps', 7)
+        reporter.post_evaluate(None, {}, None, None)
+        reporter.end_generation(None, {}, None)
+    assert profiling.active is None
+
+    breakdown = json.loads(path.read_text())
+    assert breakdown['generation'] == 0
+    assert breakdown['times']['sensing'] == 2.0
+    assert breakdown['counters'] == {'steps': 7}
+    assert {'evaluation', 'reproduction'} <= breakdown['times'].keys()
+
+
+def test_each_generation_starts_from_zero():
+    with ProfilingReporter(show=False) as reporter:
+        reporter.start_generation(0)
+        profiling.active.count('games')
+        reporter.start_generation(1)
+        assert reporter.breakdown(1.0)['counters'] == {}
@@ -0,0 +1,90 @@
+from batch_game import BatchGame
+from directions import STRAIGHT
+from game_core import GameCore
+from recording import EpisodeRecorder, Recording, Replayer
+
+from conftest import Scripted, play
+
+import numpy as np
+import pytest
+
+
+class _PressingScripted(Scripted):
+    """Scripted, but every third straight move counts as a change of direction, like holding an arrow key does."""
+    def get_response(self, game):
+        action = self.actions[self.i]
+        dx, dy, changed_direction = super().get_response(game)
+        return dx, dy, changed_direction or (action == STRAIGHT and self.i % 3 == 0)
+
+
+def _snapshot(state):
+    return list(state.snake.blocks), state.food, state.score, state.moves, state.remaining_blocks
+
+
+def _record(actions, seed, keyframe_interval):
+    """Plays a recorded game, returning the recording and the state after every move."""
+    controller = _PressingScripted(actions)
+    recorder = EpisodeRecorder(keyframe_interval)
+    game = GameCore(controller, num_obstacles=5, start_len=4, fps=np.inf, seed=seed, recorder=recorder)
+    states = [_snapshot(game)]
+    while game.running:
+        game.loop()
+        # Loops that end the game without a move leave the state as it was
+        if controller.i == len(states):
+            states.append(_snapshot(game))
+    return recorder.recording(), states, game
+
+
+@pytest.fixture
+def games(small_board):
+    n = 6
+    batch = BatchGame(n, num_obstacles=5, start_len=4, seeds=range(n))
+    actions = play(batch, np.random.default_rng(5))
+    return [_record(actions[b], seed=b, keyframe_interval=16) for b in range(n)]
+
+
+def test_bytes_round_trip(games, tmp_path):
+    for b, (recording, states, game) in enumerate(games):
+        path = tmp_path / f'{b}.rec'
+        recording.save(path)
+        loaded = Recording.load(path)
+        assert vars(loaded) == vars(recording)
+
+
+def test_replay_follows_the_game(games):
+    for recording, states, game in games:
+        replayer = Replayer(Recording.from_bytes(recording.to_bytes()))
+        assert len(replayer) == len(states) - 1
+        assert len(recording.keyframes) > 1
+
+        # Seeking lands on the same state as replaying from the start, whichever keyframe it starts from
+        for step in range(len(states)):
+            assert _snapshot(replayer.state_at(step)) == states[step]
+        for step, state in enumerate(replayer.states()):
+            assert _snapshot(state) == states[step]
+
+        final = replayer.state_at(len(replayer))
+        assert final.game_over
+        assert final.cause_of_death == game.cause_of_death
+        assert final.score == game.score
+
+
+def test_boards_too_large_for_cell_indices_are_rejected():
+    recording = Recording(9000, 9060, 30, 1, None, [], [], b'', 0, 0, 'None', 256, [])
+    with pytest.raises(ValueError):
+        recording.to_bytes()
+
+
+@pytest.mark.parametrize('seed', [None, 0, 2 ** 63, 2 ** 64 - 1])
+def test_seeds_round_trip(seed):
+    recording = Recording(360, 360, 30, 1, seed, [], [], b'', 0, 0, 'None', 256, [])
+    assert Recording.from_bytes(recording.to_bytes()).seed == seed
+
+
+@pytest.mark.parametrize('seed', [-1, 2 ** 64])
+def test_seeds_out_of_range_are_rejected(small_board, seed):
+    with pytest.raises(ValueError, match='seed'):
+        Recording(360, 360, 30, 1, seed, [], [], b'', 0, 0, 'None', 256, []).to_bytes()
+    # Before the game is played rather than when it is saved
+    with pytest.raises(ValueError, match='seed'):
+        GameCore(Scripted([]), fps=np.inf, seed=seed, recorder=EpisodeRecorder())
@@ -0,0 +1,29 @@
+from batch_game import BatchGame
+from game_core import GameCore
+from sensors import SensorSet, SENSORS
+
+from conftest import Scripted, play
+
+import numpy as np
+
+
+def test_sense_batch_matches_sense(small_board):
+    n = 12
+    seeds = range(100, 100 + n)
+    sensors = SensorSet(SENSORS)
+    batch = BatchGame(n, num_obstacles=5, start_len=20, seeds=seeds)
+    actions = play(batch, np.random.default_rng(1))
+    games = [
+        GameCore(Scripted(actions[b]), num_obstacles=5, start_len=20, fps=np.inf, seed=seed)
+        for b, seed in enumerate(seeds)
+    ]
+
+    batch.reset(seeds)
+    for step in range(actions.shape[1]):
+        running = np.flatnonzero(batch.running)
+        batch.step(batch.relative_directions(actions[:, step]))
+        for b in running:
+            games[b].loop()
+        inputs = sensors.sense_batch(batch)
+        for b in np.flatnonzero(batch.running):
+            assert np.allclose(inputs[b], sensors.sense(games[b])), (step, b)
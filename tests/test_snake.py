@@ -0,0 +1,53 @@
+from game_core import GameCore
+from snake import Snake
+
+import random
+
+import numpy as np
+
+
+def test_occupancy_counts_overlapping_blocks():
+    snake = Snake(0, 0)
+    snake.move((0, 0))
+    snake.move((1, 0))
+    assert len(snake) == 3
+    assert set(snake.occupied) == {(0, 0), (1, 0)}
+
+    # The cell stays occupied until its last block leaves it
+    assert snake.pop() == (0, 0)
+    assert (0, 0) in snake
+    assert snake.pop() == (0, 0)
+    assert (0, 0) not in snake
+    assert snake.head == snake.tail == (1, 0)
+
+
+class _Wanderer:
+    # Random turns, preferring cells that are neither wall, obstacle nor body, so games run long enough to grow
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def get_response(self, game):
+        moves = [game.relative_move(action) for action in range(3)]
+        self.rng.shuffle(moves)
+        for dx, dy, changed_direction in moves:
+            if (game.x + dx * game.square_size, game.y + dy * game.square_size) in game.empty_squares:
+                return dx, dy, changed_direction
+        return moves[0]
+
+
+def test_game_keeps_snake_free_cells_and_obstacles_apart(small_board):
+    for seed in range(10):
+        game = GameCore(_Wanderer(seed), num_obstacles=5, start_len=4, fps=np.inf, seed=seed)
+        cells = set(game.empty_squares) | set(game.obstacles) | set(game.snake.blocks)
+        # The start cell goes back into the free cells with the one above it once the obstacles are placed, as it
+        # always has, so it only counts as taken after the tail has left it
+        start = game.snake.tail
+        while game.running:
+            game.loop()
+            if game.running and not game._game_over:
+                blocks = list(game.snake.blocks)
+                assert len(set(blocks)) == len(blocks)
+                assert set(game.snake.occupied) == set(blocks)
+                assert not set(game.empty_squares) & set(blocks) - {start}
+                assert not set(game.empty_squares) & set(game.obstacles)
+                assert set(game.empty_squares) | set(game.obstacles) | set(blocks) == cells
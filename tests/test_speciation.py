@@ -0,0 +1,63 @@
+from speciation import VectorizedSpeciesSet
+
+import copy
+import pickle
+import random
+
+import neat
+import pytest
+
+
+@pytest.fixture
+def config(neat_config):
+    # The population of neat_config.txt stays in a single species for a long time, which compares nothing
+    neat_config.pop_size = 200
+    neat_config.species_set_config.compatibility_threshold = 2.5
+    return neat_config
+
+
+def _species(species_set):
+    return {sid: (s.representative.key, sorted(s.members)) for sid, s in species_set.species.items()}
+
+
+def _evolve(config, generations, adopt_at=1, adopt=VectorizedSpeciesSet.adopt):
+    """
+    Evolves a population with random fitness and DefaultSpeciesSet, and yields its species set after every generation
+    along with a VectorizedSpeciesSet that speciated the same offspring. The vectorized set is adopted from a copy of
+    the default one at generation adopt_at, and is None before that.
+    """
+    random.seed(0)
+    population = neat.Population(config)
+    default = population.species
+    vectorized = None
+    for generation in range(1, generations + 1):
+        if generation == adopt_at:
+            vectorized = adopt(copy.deepcopy(default))
+        for genome in population.population.values():
+            genome.fitness = random.random()
+        offspring = population.reproduction.reproduce(config, default, config.pop_size, generation)
+        if vectorized is not None:
+            # Reproduction drops stagnant species and reorders the rest by fitness, and species are speciated in
+            # that order, so the vectorized set follows along as if it had been reproduced itself
+            vectorized.species = {sid: vectorized.species[sid] for sid in default.species}
+            vectorized.speciate(config, offspring, generation)
+        default.speciate(config, offspring, generation)
+        population.population = offspring
+        yield default, vectorized
+
+
+def test_speciate_matches_default_species_set(config):
+    # The vectorized set keeps its distance cache across generations
+    for default, vectorized in _evolve(config, 10):
+        assert len(default.species) > 1
+        assert _species(vectorized) == _species(default)
+
+
+def test_unpickled_species_set_speciates_the_same(config):
+    # Checkpoints pickle the species set without its caches, which are rebuilt on the next speciation
+    def adopt(species_set):
+        return pickle.loads(pickle.dumps(VectorizedSpeciesSet.adopt(species_set)))
+
+    for default, vectorized in _evolve(config, 6, adopt_at=4, adopt=adopt):
+        if vectorized is not None:
+            assert _species(vectorized) == _species(default)
@@ -0,0 +1,78 @@
+from stopping import StopTraining, TrainingStopped
+import stopping
+import train_ai
+from utils import get_checkpoint_name
+
+from conftest import NEAT_CONFIG_PATH
+
+import re
+import signal
+import threading
+
+import pytest
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_time_limit(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(stopping.time, 'monotonic', clock)
+    with StopTraining(max_time=60, handle_sigint=False) as stopper:
+        clock.now += 59
+        stopper.end_generation(None, {}, None)
+        clock.now += 1
+        with pytest.raises(TrainingStopped, match='time limit of 60 sec'):
+            stopper.end_generation(None, {}, None)
+
+
+def test_first_reason_is_kept():
+    with StopTraining(handle_sigint=False) as stopper:
+        stopper.end_generation(None, {}, None)
+        stopper.request_stop('first')
+        stopper.request_stop('second')
+        with pytest.raises(TrainingStopped, match='first'):
+            stopper.end_generation(None, {}, None)
+
+
+def test_ctrl_c_stops_after_the_generation_then_immediately(capsys):
+    previous = signal.getsignal(signal.SIGINT)
+    with StopTraining() as stopper:
+        signal.raise_signal(signal.SIGINT)
+        assert stopper.reason == 'interrupted'
+        assert 'Press Ctrl+C again' in capsys.readouterr().out
+        with pytest.raises(KeyboardInterrupt):
+            signal.raise_signal(signal.SIGINT)
+    assert signal.getsignal(signal.SIGINT) is previous
+
+
+def test_only_the_main_thread_handles_ctrl_c():
+    previous = signal.getsignal(signal.SIGINT)
+    handlers = []
+
+    def enter():
+        with StopTraining():
+            handlers.append(signal.getsignal(signal.SIGINT))
+
+    thread = threading.Thread(target=enter)
+    thread.start()
+    thread.join()
+    assert handlers == [previous]
+
+
+def test_stopped_training_saves_a_checkpoint_and_winner(small_board, tmp_path, capsys):
+    text = re.sub(r'^pop_size\s*=.*$', 'pop_size = 20', open(NEAT_CONFIG_PATH).read(), flags=re.MULTILINE)
+    (tmp_path / 'neat_config.txt').write_text(text)
+    # A time limit of zero stops at the end of the first generation, well before the 50 asked for
+    train_ai.run(
+        tmp_path, 50, draw=False, multiprocess=False, handle_sigint=False, checkpoint_freq=None, max_time=0,
+        checkpoint_dir=str(tmp_path / 'checkpoints'), output_path=str(tmp_path / 'winner.pkl')
+    )
+    assert 'Training stopped: time limit of 0 sec reached' in capsys.readouterr().out
+    assert get_checkpoint_name(str(tmp_path / 'checkpoints')) == 'neat-checkpoint-0'
+    assert (tmp_path / 'winner.pkl').exists()
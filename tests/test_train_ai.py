@@ -0,0 +1,65 @@
+from sensors import config_sensors, genome_sensors
+from stopping import TrainingStopped
+import train_ai
+
+from conftest import NEAT_CONFIG_PATH
+
+import pickle
+import re
+
+import pytest
+
+
+def _write_config(config_dir, sensors):
+    # The repo's config with a small population, so that a generation takes a fraction of a second
+    text = open(NEAT_CONFIG_PATH).read()
+    text = re.sub(r'^pop_size\s*=.*$', 'pop_size = 20', text, flags=re.MULTILINE)
+    text = re.sub(r'^sensors\s*=.*$', f'sensors = {sensors}', text, flags=re.MULTILINE)
+    (config_dir / 'neat_config.txt').write_text(text)
+
+
+@pytest.fixture
+def run(small_board, tmp_path):
+    def run(n, **options):
+        return train_ai.run(
+            tmp_path, n, draw=False, multiprocess=False, handle_sigint=False, checkpoint_freq=1,
+            checkpoint_dir=str(tmp_path / 'checkpoints'), output_path=str(tmp_path / 'winner.pkl'), **options
+        )
+    return run
+
+
+def _winner(tmp_path):
+    with open(tmp_path / 'winner.pkl', 'rb') as file:
+        return pickle.load(file)
+
+
+def test_resume_keeps_the_sensors_of_the_checkpoint(run, tmp_path, capsys):
+    _write_config(tmp_path, 'adjacent food_angle')
+    run(2)
+    assert genome_sensors(_winner(tmp_path)) == ('adjacent', 'food_angle')
+
+    # Networks of the restored genomes have 4 inputs, so 12 input sensors would fail to evaluate them
+    _write_config(tmp_path, 'rays adjacent food_angle')
+    run(None, until_generation=4)
+    assert 'Resuming with the sensors of the checkpoint' in capsys.readouterr().out
+    assert genome_sensors(_winner(tmp_path)) == ('adjacent', 'food_angle')
+    checkpoint = train_ai.restore_checkpoint(str(tmp_path / 'checkpoints' / 'neat-checkpoint-3'))
+    assert config_sensors(checkpoint.config) == ('adjacent', 'food_angle')
+
+
+class _StopAtOnce:
+    """Stands in for an islands.Migration whose peers ended the run before this island evaluated anything."""
+    def attach(self, population):
+        pass
+
+    def start_generation(self, generation):
+        raise TrainingStopped('other islands finished')
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def test_no_winner_is_saved_when_nothing_was_evaluated(run, tmp_path):
+    _write_config(tmp_path, 'adjacent food_angle')
+    run(3, migration=_StopAtOnce())
+    assert not (tmp_path / 'winner.pkl').exists()
@@ -0,0 +1,83 @@
+import utils
+from utils import CachedYamlFile, get_checkpoint_name
+
+import os
+
+import pytest
+import yaml
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Counts how many times YAML files are parsed."""
+    calls = []
+    safe_load = yaml.safe_load
+    monkeypatch.setattr(yaml, 'safe_load', lambda file: calls.append(file.name) or safe_load(file))
+    return calls
+
+
+def _write(path, data, mtime_ns):
+    path.write_text(yaml.dump(data))
+    # Set explicitly, since writes close together can share a modification time on coarse filesystems
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class TestCachedYamlFile:
+    def test_parses_once_until_the_file_changes(self, tmp_path, parses):
+        path = tmp_path / 'config.yaml'
+        _write(path, {'a': 1}, 10 ** 18)
+        cached = CachedYamlFile(str(path))
+        assert cached.load() == cached.load() == {'a': 1}
+        assert len(parses) == 1
+
+        _write(path, {'a': 2}, 10 ** 18 + 1)
+        assert cached.load() == {'a': 2}
+        assert len(parses) == 2
+
+    def test_dump_updates_the_cache(self, tmp_path, parses):
+        cached = CachedYamlFile(str(tmp_path / 'saved.yaml'), default={})
+        cached.dump({'highscore': 3})
+        assert cached.load() == {'highscore': 3}
+        assert parses == []
+        assert CachedYamlFile(str(tmp_path / 'saved.yaml')).load() == {'highscore': 3}
+
+    def test_missing_file(self, tmp_path):
+        assert CachedYamlFile(str(tmp_path / 'missing.yaml'), default={'x': 0}).load() == {'x': 0}
+        with pytest.raises(FileNotFoundError):
+            CachedYamlFile(str(tmp_path / 'missing.yaml')).load()
+
+    def test_pinned_contents_ignore_the_file(self, tmp_path, parses):
+        path = tmp_path / 'config.yaml'
+        _write(path, {'a': 1}, 10 ** 18)
+        cached = CachedYamlFile(str(path))
+        cached.pin({'a': 'pinned'})
+        _write(path, {'a': 2}, 10 ** 18 + 1)
+        assert cached.load() == {'a': 'pinned'}
+        assert parses == []
+
+        cached.unpin()
+        assert cached.load() == {'a': 2}
+
+
+def test_highscore_is_only_written_when_it_changes(tmp_path, monkeypatch):
+    saved = CachedYamlFile(str(tmp_path / 'saved_data.yaml'), default={})
+    monkeypatch.setattr(utils, '_saved_data_file', saved)
+    assert utils.get_highscore() == 0
+
+    utils.set_highscore(0)
+    assert not (tmp_path / 'saved_data.yaml').exists()
+    utils.set_highscore(7)
+    assert utils.get_highscore() == 7
+    assert yaml.safe_load((tmp_path / 'saved_data.yaml').read_text()) == {'highscore': 7}
+
+
+def test_checkpoint_name_follows_the_directory(tmp_path):
+    assert get_checkpoint_name(str(tmp_path)) is None
+    for generation in (9, 10, 2):
+        (tmp_path / f'neat-checkpoint-{generation}').touch()
+    (tmp_path / 'other-file').touch()
+    assert get_checkpoint_name(str(tmp_path)) == 'neat-checkpoint-10'
+
+    (tmp_path / 'neat-checkpoint-10').unlink()
+    os.utime(tmp_path, ns=(10 ** 18, 10 ** 18))
+    assert get_checkpoint_name(str(tmp_path)) == 'neat-checkpoint-9'